@@ -20,6 +20,8 @@ def read_long_description():
 
 ext_modules = []
 ext_modules.append(Extension("mwlib.ext._rl_accel", ['upstream-src/src/rl_addons/rl_accel/_rl_accel.c']))
+ext_modules.append(Extension("mwlib.ext._pyHnj", ['upstream-src/src/rl_addons/rl_accel/%s' % f
+                        for f in ('pyHnjmodule.c', 'hyphen.c', 'hnjalloc.c')]))
 
 packages = ["mwlib.ext."+x for x in find_packages("upstream-src/src")]+find_packages(".")
 
@@ -33,6 +35,7 @@ setup(
     ext_modules=ext_modules,
     namespace_packages=['mwlib'],
     include_package_data = True,
+    package_data={"mwlib.ext.reportlab.lib": ["hyphen.mashed"]},
     zip_safe = False,
     url = "http://code.pediapress.com/",
     description="provide dependencies for mwlib",
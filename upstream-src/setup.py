@@ -206,6 +206,7 @@ reportlab_files= [
         'fonts/Zd______.pfb',
         'fonts/Zx______.pfb',
         'fonts/Zy______.pfb',
+        'lib/hyphen.mashed',
         ]
 
 def get_fonts(PACKAGE_DIR, reportlab_files):
@@ -262,8 +263,6 @@ def main():
         infoline( '#Attempting install of _rl_accel, sgmlop & pyHnj')
         infoline( '#extensions from %r'%RL_ACCEL)
         infoline( '################################################')
-        fn = pjoin(RL_ACCEL,'hyphen.mashed')
-        SPECIAL_PACKAGE_DATA = {fn: pjoin('lib','hyphen.mashed')}
         EXT_MODULES += [
                     Extension( '_rl_accel',
                                 [pjoin(RL_ACCEL,'_rl_accel.c')],
@@ -48,13 +48,12 @@ import copy
 def _findMinMaxValue(V, x, default, func, special=None):
     if isinstance(V[0][0],_SequenceTypes):
         if special:
-            f=lambda T,x=x,special=special,func=func: special(T,x,func)
+            V = [[special(T,x,func) for T in e] for e in V]
         else:
-            f=lambda T,x=x: T[x]
-        V=map(lambda e,f=f: map(f,e),V)
-    V = filter(len,map(lambda x: filter(lambda x: x is not None,x),V))
+            V = [[T[x] for T in e] for e in V]
+    V = [e for e in [[v for v in e if v is not None] for e in V] if e]
     if len(V)==0: return default
-    return func(map(func,V))
+    return func([func(e) for e in V])
 
 def _findMin(V, x, default,special=None):
     '''find minimum over V[i][x]'''
@@ -1332,6 +1331,21 @@ class ValueAxis(_AxisG):
             org += self._length
         return org + sf*(value - self._valueMin)
 
+    def scaleValues(self, values):
+        """Converts a sequence of numeric values to plotarea positions.
+        Gives the same list as map(self.scale,values) without a method call per value.
+        """
+        if getattr(self.scale,'im_func',None) is not ValueAxis.scale.im_func:
+            return map(self.scale,values)
+        assert self._configured, "Axis cannot scale numbers before it is configured"
+        org = (self._x, self._y)[self._dataIndex]
+        sf = self._scaleFactor
+        if self.reverseDirection:
+            sf = -sf
+            org += self._length
+        valueMin = self._valueMin
+        return [org + sf*((value or 0) - valueMin) for value in values]
+
 class XValueAxis(_XTicks,ValueAxis):
     "X/value axis"
 
@@ -94,6 +94,7 @@ class LinePlot(AbstractLineChart):
         annotations = AttrMapValue(None, desc='list of callables, will be called with self, xscale, yscale.',advancedUsage=1),
         behindAxes = AttrMapValue(isBoolean, desc='If true use separate line group.',advancedUsage=1),
         gridFirst = AttrMapValue(isBoolean, desc='If true use draw grids before axes.',advancedUsage=1),
+        decimation = AttrMapValue(isNumberOrNone, desc='If set joined lines are reduced to the points that differ when drawn at this resolution (eg 72./300 for 300dpi).',advancedUsage=1),
         )
 
     def __init__(self):
@@ -136,6 +137,7 @@ class LinePlot(AbstractLineChart):
         self.annotations = []
         self.behindAxes = 0
         self.gridFirst = 0
+        self.decimation = None
 
     def demo(self):
         """Shows basic use of a line chart."""
@@ -186,18 +188,14 @@ class LinePlot(AbstractLineChart):
         self._seriesCount = len(self.data)
         self._rowLength = max(map(len,self.data))
 
+        #whole series are scaled at once
         self._positions = []
-        for rowNo in range(len(self.data)):
-            line = []
-            for colNo in range(len(self.data[rowNo])):
-                datum = self.data[rowNo][colNo] # x,y value
-                if type(datum[0]) == type(''):
-                    x = self.xValueAxis.scale(mktime(mkTimeTuple(datum[0])))
-                else:
-                    x = self.xValueAxis.scale(datum[0])
-                y = self.yValueAxis.scale(datum[1])
-                line.append((x, y))
-            self._positions.append(line)
+        for row in self.data:
+            X = [datum[0] for datum in row]
+            for i in [i for i in xrange(len(X)) if type(X[i]) == type('')]:
+                X[i] = mktime(mkTimeTuple(X[i]))
+            self._positions.append(zip(self.xValueAxis.scaleValues(X),
+                                    self.yValueAxis.scaleValues([datum[1] for datum in row])))
 
     def _innerDrawLabel(self, rowNo, colNo, x, y):
         "Draw a label for a given item in the list."
@@ -256,6 +254,7 @@ class LinePlot(AbstractLineChart):
             inFillX1 = inFillX0 + self.xValueAxis._length
             inFillG = getattr(self,'_inFillG',g)
         lG = getattr(self,'_lineG',g)
+        decimation = getattr(self,'decimation',None)
         # Iterate over data rows.
         for rowNo in P:
             row = self._positions[rowNo]
@@ -273,7 +272,7 @@ class LinePlot(AbstractLineChart):
             # Iterate over data columns.
             if self.joinedLines:
                 points = []
-                for xy in row:
+                for xy in decimation and minMaxDecimate(row,decimation) or row:
                     points += [xy[0], xy[1]]
                 if inFill or getattr(rowStyle,'inFill',False):
                     fpoints = [inFillX0,inFillY] + points + [inFillX1,inFillY]
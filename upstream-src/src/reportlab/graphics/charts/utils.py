@@ -215,6 +215,36 @@ def pairFixNones(pairs):
         pairs = [(x[0],y) for x,y in zip(pairs,nY)]
     return pairs
 
+def minMaxDecimate(P,width):
+    """Reduce the points [(x,y),....] of a polyline for drawing at a resolution of width.
+    Each run of consecutive points lying in the same width wide column is replaced
+    by its first, lowest, highest and last points which draws the same at that resolution.
+    """
+    n = len(P)
+    if width<=0 or n<5: return P
+    R = []
+    i = 0
+    while i<n:
+        x, y = P[i][:2]
+        c = floor(x/width)
+        lo = hi = i
+        ylo = yhi = y
+        j = i+1
+        while j<n:
+            x, y = P[j][:2]
+            if floor(x/width)!=c: break
+            if y<ylo: ylo, lo = y, j
+            elif y>yhi: yhi, hi = y, j
+            j += 1
+        K = [i, lo, hi, j-1]
+        K.sort()
+        k0 = -1
+        for k in K:
+            if k!=k0: R.append(P[k])
+            k0 = k
+        i = j
+    return R
+
 def maverage(data,n=6):
     data = (n-1)*[data[0]]+data
     data = [float(sum(data[i-n:i]))/n for i in xrange(n,len(data)+1)]
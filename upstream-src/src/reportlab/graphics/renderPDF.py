@@ -26,7 +26,15 @@ from renderbase import Renderer, StateTracker, getStateDelta, renderScaledDrawin
 def draw(drawing, canvas, x, y, showBoundary=rl_config._unset_):
     """As it says"""
     R = _PDFRenderer()
-    R.draw(renderScaledDrawing(drawing), canvas, x, y, showBoundary=showBoundary)
+    #a drawing we've seen before is reused as a form xobject
+    if rl_config.formCaching and not getattr(canvas,'_formCacheDepth',1) and hasattr(drawing,'getFormKey'):
+        key = drawing.getFormKey()
+    else:
+        key = None
+    if key:
+        canvas.drawCachedForm((key,showBoundary),lambda x,y: R.draw(renderScaledDrawing(drawing), canvas, x, y, showBoundary=showBoundary),x,y)
+    else:
+        R.draw(renderScaledDrawing(drawing), canvas, x, y, showBoundary=showBoundary)
 
 class _PDFRenderer(Renderer):
     """This draws onto a PDF document.  It needs to be a class
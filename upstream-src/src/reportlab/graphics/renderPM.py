@@ -16,13 +16,17 @@ from reportlab.graphics.shapes import *
 from reportlab.graphics.renderbase import StateTracker, getStateDelta, renderScaledDrawing
 from reportlab.pdfbase.pdfmetrics import getFont, unicode2T1
 from math import sin, cos, pi, ceil
-from reportlab.lib.utils import getStringIO, open_and_read
+from reportlab.lib.utils import getStringIO, open_and_read, _forkedWorkers
 from reportlab import rl_config
 
 class RenderPMError(Exception):
     pass
 
-import string, os, sys
+import string, os, sys, time
+try:
+    from multiprocessing import Pool, cpu_count
+except ImportError:
+    Pool = None
 
 try:
     import _renderPM
@@ -656,6 +660,70 @@ def drawToString(d,fmt='GIF', dpi=72, bg=0xffffff, configPIL=None, showBoundary=
     drawToFile(d,s,fmt=fmt, dpi=dpi, bg=bg, configPIL=configPIL)
     return s.getvalue()
 
+def _batchRender(job, bg, configPIL, showBoundary):
+    '''render one drawBatch job; returns (result, seconds, error)'''
+    t = time.time()
+    try:
+        d, fmt, dpi = job[:3]
+        fn = len(job)>3 and job[3] or None
+        c = drawToPMCanvas(d, dpi=dpi, bg=bg, configPIL=configPIL and configPIL.copy(), showBoundary=showBoundary)
+        if fn:
+            c.saveToFile(fn,fmt)
+            r = fn
+        else:
+            s = getStringIO()
+            c.saveToFile(s,fmt)
+            r = s.getvalue()
+        e = None
+    except Exception:
+        r = None
+        et, ev = sys.exc_info()[:2]
+        e = '%s: %s' % (getattr(et,'__name__',et),ev)
+    return r, time.time()-t, e
+
+#the (jobs, args) of a running drawBatch; forked workers inherit it
+_batchJobs = None
+def _batchJob(i):
+    "drawBatch worker: returns (i, result, seconds, error)"
+    jobs, args = _batchJobs
+    return (i,)+_batchRender(jobs[i],*args)
+
+def drawBatch(jobs, processes=None, bg=0xffffff, configPIL=None, showBoundary=rl_config._unset_):
+    '''render many drawings using up to processes worker processes (default
+    one per cpu).
+
+    jobs is a sequence of (drawing, fmt, dpi) or (drawing, fmt, dpi, fn) tuples;
+    this is a generator which yields (index, result, seconds, error) as each
+    job finishes, not necessarily in order.  result is the image data as a
+    string or fn if one was given.  If a job fails, result is None and error
+    describes the exception; the other jobs carry on.  The workers last for
+    the whole batch so fonts are set up once per worker, not once per job.
+    The workers must be forked (see multiprocessing.set_start_method);
+    otherwise the jobs are rendered one by one in this process.'''
+    global _batchJobs
+    jobs = list(jobs)
+    args = bg, configPIL, showBoundary
+    n = len(jobs)
+    if processes is None:
+        processes = Pool and cpu_count() or 1
+    done = n*[0]
+    if Pool and processes>1 and n>1 and _forkedWorkers():
+        _batchJobs = jobs, args
+        try:
+            pool = Pool(min(processes,n))
+        finally:
+            _batchJobs = None
+        try:
+            for r in pool.imap_unordered(_batchJob,xrange(n)):
+                done[r[0]] = 1
+                yield r
+        finally:
+            pool.terminate()
+            pool.join()
+    for i in xrange(n):
+        if not done[i]:
+            yield (i,)+_batchRender(jobs[i],*args)
+
 save = drawToFile
 
 def test():
@@ -13,14 +13,12 @@ from operator import getitem
 from reportlab.pdfbase.pdfmetrics import stringWidth # for font info
 from reportlab.lib.utils import fp_str
 from reportlab.lib.colors import black
-from reportlab.graphics.renderbase import StateTracker, getStateDelta, Renderer, renderScaledDrawing
+from reportlab.graphics.renderbase import StateTracker, getStateDelta, Renderer, renderScaledDrawing, _checkShapes
 from reportlab.graphics.shapes import STATE_DEFAULTS, Path, UserNode
 from reportlab.graphics.shapes import * # (only for test0)
 from reportlab import rl_config
 from reportlab.lib.utils import getStringIO
 
-from xml.dom import getDOMImplementation
-
 ### some constants ###
 
 sin = math.sin
@@ -40,9 +38,9 @@ def drawToString(d, showBoundary=rl_config.showBoundary):
 
 def drawToFile(d, fn, showBoundary=rl_config.showBoundary):
     d = renderScaledDrawing(d)
-    c = SVGCanvas((d.width, d.height))
+    c = SVGCanvas((d.width, d.height), fn)
     draw(d, c, 0, 0, showBoundary=showBoundary)
-    c.save(fn)
+    c.save()
 
 def draw(drawing, canvas, x=0, y=0, showBoundary=rl_config.showBoundary):
     """As it says."""
@@ -62,40 +60,25 @@ def _pointsFromList(L):
 
     return P
 
-def transformNode(doc, newTag, node=None, **attrDict):
-    """Transform a DOM node into new node and copy selected attributes.
-
-    Creates a new DOM node with tag name 'newTag' for document 'doc'
-    and copies selected attributes from an existing 'node' as provided
-    in 'attrDict'. The source 'node' can be None. Attribute values will
-    be converted to strings.
-
-    E.g.
-
-        n = transformNode(doc, "node1", x="0", y="1")
-        -> DOM node for <node1 x="0" y="1"/>
-
-        n = transformNode(doc, "node1", x=0, y=1+1)
-        -> DOM node for <node1 x="0" y="2"/>
+def _xmlEscape(s):
+    "escape s for use as XML character data or an attribute value"
+    return s.replace('&','&amp;').replace('<','&lt;').replace('"','&quot;').replace('>','&gt;')
 
-        n = transformNode(doc, "node1", node0, x="x0", y="x0", zoo=bar())
-        -> DOM node for <node1 x="[node0.x0]" y="[node0.y0]" zoo="[bar()]"/>
-    """
-
-    newNode = doc.createElement(newTag)
-    for newAttr, attr in attrDict.items():
-        sattr =  str(attr)
-        if not node:
-            newNode.setAttribute(newAttr, sattr)
-        else:
-            attrVal = node.getAttribute(sattr)
-            newNode.setAttribute(newAttr, attrVal or sattr)
-
-    return newNode
+def _startTag(tag, attrDict):
+    "return the start tag (without the closing >) with sorted attributes"
+    A = attrDict.keys()
+    A.sort()
+    return '<%s%s' % (tag, ''.join([' %s="%s"' % (a, _xmlEscape(str(attrDict[a]))) for a in A]))
 
 ### classes ###
 class SVGCanvas:
-    def __init__(self, size=(300,300)):
+    """writes SVG straight to a file as the drawing is rendered; the
+    elements aren't kept so memory use doesn't grow with the drawing.
+    Without fn the output is collected and written by save.
+    """
+    _indent = '     '
+
+    def __init__(self, size=(300,300), fn=None):
         self.verbose = 0
         self.width, self.height = self.size = size
         # self.height = size[1]
@@ -106,41 +89,38 @@ class SVGCanvas:
             self._font = self._fontSize = self._lineCap = \
             self._lineJoin = self._color = None
 
-        implementation = getDOMImplementation('minidom')
+        if fn is None:
+            self._f = getStringIO()
+        elif isinstance(fn,str):
+            self._f = open(fn, 'w')
+        else:
+            self._f = fn
+        self._fn = fn
+        #the open groups as [attributes, written] pairs; a group's start tag
+        #is held back until it has content so its transform can still change
+        self._groups = []
+
         #Based on official example here http://www.w3.org/TR/SVG10/linking.html want:
         #<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 20010904//EN" 
         #  "http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd">
-        #Thus,
-        #doctype = implementation.createDocumentType("svg",
-        #          "-//W3C//DTD SVG 20010904//EN",
-        #          "http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd")
         #
         #However, putting that example through http://validator.w3.org/ recommends:
         #<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.0//EN" 
         #  "http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd">
         #So we'll use that for our SVG 1.0 output.
-        doctype = implementation.createDocumentType("svg",
-                  "-//W3C//DTD SVG 1.0//EN",
-                  "http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd")
-        self.doc = implementation.createDocument(None,"svg",doctype)
-        self.svg = self.doc.documentElement
-        self.svg.setAttribute("width", str(size[0]))
-        self.svg.setAttribute("height", str(self.height))
-
-        #these suggested by Tim Roberts, as updated by peter@maubp.freeserve.co.uk 
-        self.svg.setAttribute("xmlns", "http://www.w3.org/2000/svg")
-        self.svg.setAttribute("xmlns:xlink", "http://www.w3.org/1999/xlink")
-        self.svg.setAttribute("version", "1.0")
-        #self.svg.setAttribute("baseProfile", "full")   #disliked in V 1.0
-        title = self.doc.createElement('title')
-        text = self.doc.createTextNode('...')
-        title.appendChild(text)
-        self.svg.appendChild(title)
-
-        desc = self.doc.createElement('desc')
-        text = self.doc.createTextNode('...')
-        desc.appendChild(text)
-        self.svg.appendChild(desc)
+        I = self._indent
+        self._write('<?xml version="1.0" ?>\n'
+                "<!DOCTYPE svg\n"
+                "  PUBLIC '-//W3C//DTD SVG 1.0//EN'\n"
+                "  'http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd'>\n")
+        #xmlns attributes suggested by Tim Roberts, as updated by peter@maubp.freeserve.co.uk 
+        #baseProfile="full" is disliked in V 1.0
+        self._write(_startTag('svg', {'width': size[0], 'height': self.height,
+                    'xmlns': "http://www.w3.org/2000/svg",
+                    'xmlns:xlink': "http://www.w3.org/1999/xlink",
+                    'version': "1.0"}) + '>\n')
+        self._write(I+'<title>...</title>\n')
+        self._write(I+'<desc>...</desc>\n')
 
         self.setFont(STATE_DEFAULTS['fontName'], STATE_DEFAULTS['fontSize'])
         self.setStrokeColor(STATE_DEFAULTS['strokeColor'])
@@ -149,30 +129,50 @@ class SVGCanvas:
         self.setLineWidth(1)
 
         # Add a rectangular clipping path identical to view area.
-        clipPath = transformNode(self.doc, "clipPath", id="clip")
-        clipRect = transformNode(self.doc, "rect", x=0, y=0,
-            width=self.width, height=self.height)
-        clipPath.appendChild(clipRect)
-        self.svg.appendChild(clipPath)
-
-        self.groupTree = transformNode(self.doc, "g",
-            id="group",
-            transform="scale(1,-1) translate(0,-%d)" % self.height,
-            style="clip-path: url(#clip)")
-        self.svg.appendChild(self.groupTree)
-        self.currGroup = self.groupTree
+        self._write(I+_startTag('clipPath', {'id': 'clip'})+'>\n')
+        self._write(2*I+_startTag('rect', dict(x=0, y=0, width=self.width, height=self.height))+'/>\n')
+        self._write(I+'</clipPath>\n')
 
-    def save(self, fn=None):
-        if isinstance(fn,str):
-            f = open(fn, 'w')
-        else:
-            f = fn
+        self._write(I+_startTag('g', {'id': 'group',
+            'transform': "scale(1,-1) translate(0,-%d)" % self.height,
+            'style': "clip-path: url(#clip)"})+'>\n')
 
-        f.write(self.doc.toprettyxml(indent="     "))
-
-        if f is not fn:
+    def save(self, fn=None):
+        """close the document; when the output is being collected (no fn
+        was given to the constructor) it's written to fn here"""
+        while self._groups:
+            self.endGroup(None)
+        self._write(self._indent+'</g>\n</svg>\n')
+        f = self._f
+        if self._fn is None:
+            if isinstance(fn,str):
+                open(fn, 'w').write(f.getvalue())
+            elif fn is not None:
+                fn.write(f.getvalue())
+        elif f is not self._fn:
             f.close()
 
+    def _write(self, s):
+        if isinstance(s,unicode): s = s.encode('utf8')
+        self._f.write(s)
+
+    def _element(self, tag, attrDict, text=None, link_info=None):
+        "write an element (wrapped in a link if link_info is given) into the current group"
+        groups = self._groups
+        for i in xrange(len(groups)):
+            if not groups[i][1]:
+                self._write((i+2)*self._indent+_startTag('g',groups[i][0])+'>\n')
+                groups[i][1] = 1
+        indent = (len(groups)+2)*self._indent
+        e = _startTag(tag, attrDict)
+        if text is None:
+            e = e + '/>'
+        else:
+            e = '%s>%s</%s>' % (e, _xmlEscape(text), tag)
+        if link_info:
+            e = '%s>\n%s%s%s\n%s</a>' % (_startTag('a', link_info), indent, self._indent, e, indent)
+        self._write(indent+e+'\n')
+
     ### helpers ###
     def NOTUSED_stringWidth(self, s, font=None, fontSize=None):
         """Return the logical width of the string if it were drawn
@@ -229,11 +229,7 @@ class SVGCanvas:
         return codeline % data
 
     def _fillAndStroke(self, code, clip=0, link_info=None,styles=AREA_STYLES):
-        path = transformNode(self.doc, "path",
-            d=self.path, style=self._formatStyle(styles))
-        if link_info :
-            path = self._add_link(path, link_info)
-        self.currGroup.appendChild(path)
+        self._element("path", dict(d=self.path, style=self._formatStyle(styles)), link_info=link_info)
         self.path = ''
 
 
@@ -292,12 +288,6 @@ class SVGCanvas:
             self.style['font-family'] = font
             self.style['font-size'] = '%spx' % fontSize
 
-    def _add_link(self, dom_object, link_info) :
-        assert isinstance(link_info, dict)
-        link = transformNode(self.doc, "a", **link_info)
-        link.appendChild(dom_object)
-        return link
-
     ### shapes ###
     def rect(self, x1,y1, x2,y2, rx=8, ry=8, link_info=None):
         "Draw a rectangle between x1,y1 and x2,y2."
@@ -306,14 +296,8 @@ class SVGCanvas:
 
         x = min(x1,x2)
         y = min(y1,y2)
-        rect = transformNode(self.doc, "rect",
-            x=x, y=y, width=max(x1,x2)-x, height=max(y1,y2)-y,
-            style=self._formatStyle(AREA_STYLES))
-
-        if link_info :
-            rect = self._add_link(rect, link_info)
-
-        self.currGroup.appendChild(rect)
+        self._element("rect", dict(x=x, y=y, width=max(x1,x2)-x, height=max(y1,y2)-y,
+            style=self._formatStyle(AREA_STYLES)), link_info=link_info)
 
     def roundRect(self, x1,y1, x2,y2, rx=8, ry=8, link_info=None):
         """Draw a rounded rectangle between x1,y1 and x2,y2.
@@ -322,14 +306,8 @@ class SVGCanvas:
         These should have x1<x2, y1<y2, rx>0, and ry>0.
         """
 
-        rect = transformNode(self.doc, "rect",
-            x=x1, y=y1, width=x2-x1, height=y2-y1, rx=rx, ry=ry,
-            style=self._formatStyle(AREA_STYLES))
-
-        if link_info :
-            rect = self._add_link(rect, link_info)
-
-        self.currGroup.appendChild(rect)
+        self._element("rect", dict(x=x1, y=y1, width=x2-x1, height=y2-y1, rx=rx, ry=ry,
+            style=self._formatStyle(AREA_STYLES)), link_info=link_info)
 
     def drawString(self, s, x, y, angle=0, link_info=None):
         if self.verbose: print "+++ SVGCanvas.drawString"
@@ -341,16 +319,8 @@ class SVGCanvas:
             if angle != 0:
                st = st + " rotate(%f %f %f);" % (angle, x, y)
             st = st + " fill: %s;" % self.style['fill']
-            text = transformNode(self.doc, "text",
-                x=x, y=y, style=st,
-                transform="translate(0,%d) scale(1,-1)" % (2*y))
-            content = self.doc.createTextNode(s)
-            text.appendChild(content)
-
-            if link_info:
-                text = self._add_link(text, link_info)
-    
-            self.currGroup.appendChild(text)
+            self._element("text", dict(x=x, y=y, style=st,
+                transform="translate(0,%d) scale(1,-1)" % (2*y)), s, link_info=link_info)
 
     def drawCentredString(self, s, x, y, angle=0, text_anchor='middle', link_info=None):
         if self.verbose: print "+++ SVGCanvas.drawCentredString"
@@ -374,8 +344,7 @@ class SVGCanvas:
     def comment(self, data):
         "Add a comment."
 
-        comment = self.doc.createComment(data)
-        # self.currGroup.appendChild(comment)
+        pass
 
     def drawImage(self, image, x1, y1, x2=None, y2=None):
         pass
@@ -383,14 +352,10 @@ class SVGCanvas:
     def line(self, x1, y1, x2, y2):
         if self._strokeColor != None:
             if 0: # something is wrong with line in my SVG viewer...
-                line = transformNode(self.doc, "line",
-                    x=x1, y=y1, x2=x2, y2=y2,
-                    style=self._formatStyle(LINE_STYLES))
-                self.currGroup.appendChild(line)
-            path = transformNode(self.doc, "path",
-                d="M %f,%f L %f,%f Z" % (x1,y1,x2,y2),
-                style=self._formatStyle(LINE_STYLES))
-            self.currGroup.appendChild(path)
+                self._element("line", dict(x=x1, y=y1, x2=x2, y2=y2,
+                    style=self._formatStyle(LINE_STYLES)))
+            self._element("path", dict(d="M %f,%f L %f,%f Z" % (x1,y1,x2,y2),
+                style=self._formatStyle(LINE_STYLES)))
 
     def ellipse(self, x1, y1, x2, y2, link_info=None):
         """Draw an orthogonal ellipse inscribed within the rectangle x1,y1,x2,y2.
@@ -398,24 +363,12 @@ class SVGCanvas:
         These should have x1<x2 and y1<y2.
         """
 
-        ellipse = transformNode(self.doc, "ellipse",
-            cx=(x1+x2)/2.0, cy=(y1+y2)/2.0, rx=(x2-x1)/2.0, ry=(y2-y1)/2.0,
-            style=self._formatStyle(AREA_STYLES))
-
-        if link_info:
-            ellipse = self._add_link(ellipse, link_info)
-            
-        self.currGroup.appendChild(ellipse)
+        self._element("ellipse", dict(cx=(x1+x2)/2.0, cy=(y1+y2)/2.0, rx=(x2-x1)/2.0, ry=(y2-y1)/2.0,
+            style=self._formatStyle(AREA_STYLES)), link_info=link_info)
 
     def circle(self, xc, yc, r, link_info=None):
-        circle = transformNode(self.doc, "circle",
-            cx=xc, cy=yc, r=r,
-            style=self._formatStyle(AREA_STYLES))
-
-        if link_info:
-            circle = self._add_link(circle, link_info)
-        
-        self.currGroup.appendChild(circle)
+        self._element("circle", dict(cx=xc, cy=yc, r=r,
+            style=self._formatStyle(AREA_STYLES)), link_info=link_info)
 
     def drawCurve(self, x1, y1, x2, y2, x3, y3, x4, y4, closed=0):
         pass
@@ -461,9 +414,7 @@ class SVGCanvas:
         if fromcenter:
             str = str + "L %f, %f Z " % (cx, cy)
 
-        path = transformNode(self.doc, "path",
-            d=str, style=self._formatStyle())
-        self.currGroup.appendChild(path)
+        self._element("path", dict(d=str, style=self._formatStyle()))
 
     def polygon(self, points, closed=0, link_info=None):
         assert len(points) >= 2, 'Polygon must have 2 or more points'
@@ -474,13 +425,8 @@ class SVGCanvas:
             for i in xrange(len(points)):
                 pairs.append("%f %f" % (points[i]))
             pts = ', '.join(pairs)
-            polyline = transformNode(self.doc, "polygon",
-                points=pts, style=self._formatStyle(AREA_STYLES))
-
-            if link_info:
-                polyline = self._add_link(polyline, link_info)
-
-            self.currGroup.appendChild(polyline)
+            self._element("polygon", dict(points=pts, style=self._formatStyle(AREA_STYLES)),
+                link_info=link_info)
 
         # self._fillAndStroke(polyCode)
 
@@ -503,30 +449,33 @@ class SVGCanvas:
             for i in xrange(len(points)):
                 pairs.append("%f %f" % (points[i]))
             pts = ', '.join(pairs)
-            polyline = transformNode(self.doc, "polyline",
-                points=pts, style=self._formatStyle(AREA_STYLES,fill=None))
-            self.currGroup.appendChild(polyline)
+            self._element("polyline", dict(points=pts, style=self._formatStyle(AREA_STYLES,fill=None)))
 
     ### groups ###
     def startGroup(self):
         if self.verbose: print "+++ begin SVGCanvas.startGroup"
-        currGroup, group = self.currGroup, transformNode(self.doc, "g", transform="")
-        currGroup.appendChild(group)
-        self.currGroup = group
+        currGroup = len(self._groups)
+        self._groups.append([{'transform': ''}, 0])
         if self.verbose: print "+++ end SVGCanvas.startGroup"
         return currGroup
 
     def endGroup(self,currGroup):
         if self.verbose: print "+++ begin SVGCanvas.endGroup"
-        self.currGroup = currGroup
+        attrDict, written = self._groups.pop()
+        if written:
+            self._write((len(self._groups)+2)*self._indent+'</g>\n')
+        else:
+            self._element('g', attrDict)
         if self.verbose: print "+++ end SVGCanvas.endGroup"
 
     def transform(self, a, b, c, d, e, f):
+        "transform the current group; must come before the group's content"
         if self.verbose: print "!!! begin SVGCanvas.transform", a, b, c, d, e, f
-        tr = self.currGroup.getAttribute("transform")
+        attrDict, written = self._groups[-1]
+        assert not written, 'SVGCanvas.transform called after the group content was written'
         t = 'matrix(%f, %f, %f, %f, %f, %f)' % (a,b,c,d,e,f)
         if (a, b, c, d, e, f) != (1, 0, 0, 1, 0, 0):
-            self.currGroup.setAttribute("transform", "%s %s" % (tr, t))
+            attrDict["transform"] = "%s %s" % (attrDict["transform"], t)
 
     def translate(self, x, y):
         # probably never used
@@ -647,13 +596,14 @@ class _SVGRenderer(Renderer):
 
         currGroup = self._canvas.startGroup()
         a, b, c, d, e, f = self._tracker.getState()['transform']
+        self._canvas.transform(a, b, c, d, e, f)
         for childNode in group.getContents():
             if isinstance(childNode, UserNode):
                 node2 = childNode.provideNode()
+                _checkShapes(node2)
             else:
                 node2 = childNode
             self.drawNode(node2)
-        self._canvas.transform(a, b, c, d, e, f)
         self._canvas.endGroup(currGroup)
 
         if self.verbose: print "### end _SVGRenderer.drawGroup"
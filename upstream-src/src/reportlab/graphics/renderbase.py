@@ -6,6 +6,7 @@ __version__=''' $Id $ '''
 __doc__='''Superclass for renderers to factor out common functionality and default implementations.'''
 
 from reportlab.graphics.shapes import *
+from reportlab.graphics.shapes import validateShapes
 from reportlab.lib.validators import DerivedValue
 from reportlab import rl_config
 
@@ -149,6 +150,12 @@ def testStateTracker():
         print 'state:  ',st.getState(),'\n'
 
 
+def _checkShapes(node):
+    '''with rl_config.shapeChecking>1 check the tree we're about to draw;
+    user nodes are checked when they're expanded'''
+    if rl_config.shapeChecking>1 and node is not None:
+        validateShapes(node)
+
 def _expandUserNode(node,canvas):
     if isinstance(node, UserNode):
         try:
@@ -161,6 +168,7 @@ def _expandUserNode(node,canvas):
             node = node.provideNode()
         finally:
             if not ocanvas: del onode._canvas
+        _checkShapes(node)
     return node
 
 def renderScaledDrawing(d):
@@ -189,6 +197,7 @@ class Renderer:
         #stash references for ease of  communication
         if showBoundary is rl_config._unset_: showBoundary=rl_config.showBoundary
         self._canvas = canvas
+        _checkShapes(drawing)
         canvas.__dict__['_drawing'] = self._drawing = drawing
         drawing._parent = None
         try:
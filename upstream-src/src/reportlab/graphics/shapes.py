@@ -7,7 +7,7 @@ __doc__='''Core of the graphics library - defines Drawing and Shapes'''
 
 import string, os, sys
 from math import pi, cos, sin, tan
-from types import FloatType, IntType, ListType, TupleType, StringType, InstanceType
+from types import FloatType, IntType, ListType, TupleType, StringType, InstanceType, FunctionType, ClassType, MethodType
 from pprint import pprint
 
 from reportlab.platypus import Flowable
@@ -17,7 +17,8 @@ from reportlab.lib import colors
 from reportlab.lib.validators import *
 isOpacity = NoneOr(isNumberInRange(0,1))
 from reportlab.lib.attrmap import *
-from reportlab.lib.utils import fp_str
+from reportlab.lib.attrmap import _privateAttrMap
+from reportlab.lib.utils import fp_str, _digester
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.fonts import tt2ps
 _baseGFontNameB = tt2ps(_baseGFontName,1,0)
@@ -254,7 +255,7 @@ class Shape(_SetKeyWordArgs,_DrawTimeResizeable):
         #basic nodes have no children so this is easy.
         #for more complex objects like widgets you
         #may need to override this.
-        props = {}
+        props = _classDefaults(self.__class__)
         for key, value in self.__dict__.items():
             if key[0:1] != '_':
                 props[key] = value
@@ -323,17 +324,15 @@ class Group(Shape):
         fillOverprint = AttrMapValue(isBoolean,desc='Turn on fill overprinting',advancedUsage=1),
         overprintMask = AttrMapValue(isBoolean,desc='overprinting for ordinary CMYK',advancedUsage=1),
         )
+    transform = (1,0,0,1,0,0)
 
     def __init__(self, *elements, **keywords):
         """Initial lists of elements may be provided to allow
         compact definitions in literal Python code.  May or
         may not be useful."""
 
-        # Groups need _attrMap to be an instance rather than
-        # a class attribute, as it may be extended at run time.
-        self._attrMap = self._attrMap.clone()
-        self.contents = []
-        self.transform = (1,0,0,1,0,0)
+        # the class _attrMap is shared until a named node extends it
+        self.__dict__['contents'] = []
         for elt in elements:
             self.add(elt)
         # this just applies keywords; do it at the end so they
@@ -344,6 +343,7 @@ class Group(Shape):
         'if name is not None add an attribute pointing to node and add to the attrMap'
         if name:
             if name not in self._attrMap.keys():
+                _privateAttrMap(self)
                 self._attrMap[name] = AttrMapValue(isValidChild)
             setattr(self, name, node)
 
@@ -376,7 +376,7 @@ class Group(Shape):
 
         # many limitations - shared nodes become multiple ones,
         obj = isinstance(self,Drawing) and Drawing(self.width,self.height) or Group()
-        obj._attrMap = self._attrMap.clone()
+        if obj._attrMap is not self._attrMap: obj._attrMap = self._attrMap.clone()
         if hasattr(obj,'transform'): obj.transform = self.transform[:]
 
         self_contents = self.contents
@@ -430,7 +430,7 @@ class Group(Shape):
 
     def _copy(self,obj):
         """copies to obj"""
-        obj._attrMap = self._attrMap.clone()
+        if obj._attrMap is not self._attrMap: obj._attrMap = self._attrMap.clone()
         self._copyContents(obj)
         self._copyNamedContents(obj)
         return obj
@@ -464,6 +464,7 @@ class Group(Shape):
         """ Convenience function to make a drawing from a group
             After calling this the instance will be a drawing!
         """
+        _privateAttrMap(self)
         self.__class__ = Drawing
         self._attrMap.update(self._xtraAttrMap)
         self.width = width
@@ -498,6 +499,38 @@ class Group(Shape):
             #to handle None as an allowed return value everywhere.
             return None
 
+_classDefaultsCache = {}
+def _classDefaults(klass):
+    '''return a new dictionary of the attributes in klass's _attrMap
+    which have defaults set on the class rather than on each instance'''
+    try:
+        D = _classDefaultsCache[klass]
+    except KeyError:
+        D = {}
+        A = getattr(klass,'_attrMap',None)
+        if A:
+            for k in A.keys():
+                if k[0:1]!='_' and hasattr(klass,k):
+                    v = getattr(klass,k)
+                    if type(v) not in (MethodType,FunctionType): D[k] = v
+        _classDefaultsCache[klass] = D
+    return D.copy()
+
+def validateShapes(node):
+    '''check the attributes of node and everything it contains'''
+    P = [node]
+    while P:
+        n = P.pop()
+        if isinstance(n,Group):
+            #contents may hold UserNodes which are checked when they're drawn
+            validateAttrs(n,('contents',))
+            for c in n.contents:
+                if not isValidChild(c):
+                    raise AttributeError("Illegal child %r in class %s" % (c, n.__class__.__name__))
+            P.extend(n.contents)
+        elif isinstance(n,Shape):
+            validateAttrs(n)
+
 def _addObjImport(obj,I,n=None):
     '''add an import of obj's class to a dictionary of imports''' #'
     from inspect import getmodule
@@ -569,6 +602,61 @@ def _extraKW(self,pfx,**kw):
             R[k[n:]] = kw[k]
     return R
 
+#the canvas, parents and what layout sets on a flowable where it's placed
+_formKeyIgnore = ('canv','_canvas','_parent','_attrMap','_frame','_postponed','_atTop',
+                    '_debug','_traceInfo','_spaceBefore')
+_formKeyMaxParts = 20000    #bigger drawings (eg charts of long series) aren't worth describing
+def _formKey(obj):
+    '''return a digest of everything reachable from obj or None if
+    that includes something we can't describe or that may draw differently
+    each time (draw time callbacks, derived values) or is too big'''
+    seen = {}
+    S = []
+    a = S.append
+    def walk(v):
+        t = type(v)
+        if v is None or t in (str,unicode,int,long,float,bool):
+            a(repr(v))
+        elif t in (list,tuple):
+            if len(S)+len(v)>_formKeyMaxParts: raise ValueError
+            a(t is list and '[' or '(')
+            for x in v: walk(x)
+            a(']')
+        elif t is dict:
+            a('{')
+            for k in sorted(v.keys()):
+                walk(k)
+                walk(v[k])
+            a('}')
+        elif t in (FunctionType,ClassType,type):
+            if v.__name__=='<lambda>' or getattr(v,'func_closure',None): raise ValueError
+            a('%s.%s' % (v.__module__,v.__name__))
+        elif t is MethodType:
+            a('M')
+            walk(v.im_func)
+            walk(v.im_self)
+        elif hasattr(v,'__dict__') and not isinstance(v,DerivedValue):
+            i = id(v)
+            if i in seen:
+                a('@%d' % seen[i])
+                return
+            seen[i] = len(seen)
+            D = v.__dict__
+            if '_drawTimeCallback' in D: raise ValueError
+            a('<%s.%s' % (v.__class__.__module__,v.__class__.__name__))
+            for k in sorted(D.keys()):
+                if k not in _formKeyIgnore:
+                    a(k)
+                    walk(D[k])
+            a('>')
+        else:
+            raise ValueError
+    try:
+        walk(obj)
+    except (ValueError,RuntimeError):  #RuntimeError for too deep recursion
+        return None
+    return _digester(''.join(S))
+
 class Drawing(Group, Flowable):
     """Outermost container; the thing a renderer works on.
     This has no properties except a height, width and list
@@ -624,6 +712,10 @@ class Drawing(Group, Flowable):
         import renderPDF
         renderPDF.draw(self, self.canv, 0, 0, showBoundary=showBoundary)
 
+    def getFormKey(self):
+        """a digest of the drawing's content so repeats can be drawn as a form"""
+        return _formKey(self)
+
     def wrap(self, availWidth, availHeight):
         width = self.width
         height = self.height
@@ -848,15 +940,18 @@ class LineShape(Shape):
         strokeOverprint = AttrMapValue(isBoolean,desc='Turn on stroke overprinting'),
         overprintMask = AttrMapValue(isBoolean,desc='overprinting for ordinary CMYK',advancedUsage=1),
         )
+    #constant defaults are shared by the class; those from STATE_DEFAULTS
+    #(which may be changed at run time) are set on each instance
+    strokeWidth = 1
+    strokeLineCap = 0
+    strokeLineJoin = 0
+    strokeMiterLimit = 0
+    strokeDashArray = None
+    strokeOpacity = None
 
     def __init__(self, kw):
-        self.strokeColor = STATE_DEFAULTS['strokeColor']
-        self.strokeWidth = 1
-        self.strokeLineCap = 0
-        self.strokeLineJoin = 0
-        self.strokeMiterLimit = 0
-        self.strokeDashArray = None
-        self.strokeOpacity = None
+        #the defaults are known to be good so don't check them
+        self.__dict__['strokeColor'] = STATE_DEFAULTS['strokeColor']
         self.setProperties(kw)
 
 
@@ -888,10 +983,10 @@ class SolidShape(LineShape):
         fillOverprint = AttrMapValue(isBoolean,desc='Turn on fill overprinting'),
         overprintMask = AttrMapValue(isBoolean,desc='overprinting for ordinary CMYK',advancedUsage=1),
         )
+    fillOpacity = None
 
     def __init__(self, kw):
-        self.fillColor = STATE_DEFAULTS['fillColor']
-        self.fillOpacity = None
+        self.__dict__['fillColor'] = STATE_DEFAULTS['fillColor']
         # do this at the end so keywords overwrite
         #the above settings
         LineShape.__init__(self, kw)
@@ -1298,15 +1393,14 @@ class String(Shape):
         encoding = AttrMapValue(isString),
         )
     encoding = 'utf8'
+    textAnchor = 'start'
 
     def __init__(self, x, y, text, **kw):
         self.x = x
         self.y = y
         self.text = text
-        self.textAnchor = 'start'
-        self.fontName = STATE_DEFAULTS['fontName']
-        self.fontSize = STATE_DEFAULTS['fontSize']
-        self.fillColor = STATE_DEFAULTS['fillColor']
+        self.__dict__.update(fontName=STATE_DEFAULTS['fontName'],
+            fontSize=STATE_DEFAULTS['fontSize'], fillColor=STATE_DEFAULTS['fillColor'])
         self.setProperties(kw)
 
     def getEast(self):
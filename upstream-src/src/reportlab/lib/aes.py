@@ -0,0 +1,152 @@
+#copyright ReportLab Europe Limited. 2000-2006
+#see license.txt for license details
+'''
+AES-128 ciphering (encryption only) as used by PDF's AESV2 crypt filter
+'''
+__version__=''' $Id$ '''
+from struct import pack, unpack
+
+def _xtime(x):
+	x = x<<1
+	if x & 0x100: x = x ^ 0x11b
+	return x
+
+def _makeTables():
+	'''
+	return the AES sbox and the four combined SubBytes/MixColumns tables
+	'''
+	#p runs through the powers of 3 and q through the powers of its inverse
+	#the sbox is the affine transform of the inverse
+	S = 256*[0]
+	p = q = 1
+	while 1:
+		p = p ^ _xtime(p)
+		q = q ^ (q<<1)
+		q = q ^ (q<<2)
+		q = q ^ (q<<4)
+		q = q & 0xff
+		if q & 0x80: q = q ^ 0x09
+		x = q
+		for r in 1,2,3,4:
+			x = x ^ (((q<<r) | (q>>(8-r))) & 0xff)
+		S[p] = x ^ 0x63
+		if p==1: break
+	S[0] = 0x63
+	T0, T1, T2, T3 = [], [], [], []
+	for s in S:
+		s2 = _xtime(s)
+		s3 = s2 ^ s
+		T0.append((s2<<24) | (s<<16) | (s<<8) | s3)
+		T1.append((s3<<24) | (s2<<16) | (s<<8) | s)
+		T2.append((s<<24) | (s3<<16) | (s2<<8) | s)
+		T3.append((s<<24) | (s<<16) | (s3<<8) | s2)
+	return S, T0, T1, T2, T3
+
+_S, _T0, _T1, _T2, _T3 = _makeTables()
+
+class AES128:
+	'''
+	performs AES encryption with a 16 byte key; the block size is 16 bytes.
+	'''
+	def __init__(self,key):
+		if len(key)!=16: raise ValueError('AES128 key must be 16 bytes long')
+		self._key = key
+		S = _S
+		rk = list(unpack('>4L',key))
+		rcon = 1
+		for i in xrange(4,44):
+			t = rk[i-1]
+			if not i%4:
+				t = (S[(t>>16)&0xff]<<24) | (S[(t>>8)&0xff]<<16) | (S[t&0xff]<<8) | S[t>>24]
+				t = t ^ (rcon<<24)
+				rcon = _xtime(rcon)
+			rk.append(rk[i-4]^t)
+		self._rk = rk
+
+	def _encryptBlock(self, s0, s1, s2, s3):
+		'''
+		return the encryption of the block given as four 32 bit words
+		'''
+		T0, T1, T2, T3, S, rk = _T0, _T1, _T2, _T3, _S, self._rk
+		s0 = s0 ^ rk[0]
+		s1 = s1 ^ rk[1]
+		s2 = s2 ^ rk[2]
+		s3 = s3 ^ rk[3]
+		for r in xrange(4,40,4):
+			s0, s1, s2, s3 = (
+				T0[s0>>24] ^ T1[(s1>>16)&0xff] ^ T2[(s2>>8)&0xff] ^ T3[s3&0xff] ^ rk[r],
+				T0[s1>>24] ^ T1[(s2>>16)&0xff] ^ T2[(s3>>8)&0xff] ^ T3[s0&0xff] ^ rk[r+1],
+				T0[s2>>24] ^ T1[(s3>>16)&0xff] ^ T2[(s0>>8)&0xff] ^ T3[s1&0xff] ^ rk[r+2],
+				T0[s3>>24] ^ T1[(s0>>16)&0xff] ^ T2[(s1>>8)&0xff] ^ T3[s2&0xff] ^ rk[r+3],
+				)
+		return (
+			((S[s0>>24]<<24) | (S[(s1>>16)&0xff]<<16) | (S[(s2>>8)&0xff]<<8) | S[s3&0xff]) ^ rk[40],
+			((S[s1>>24]<<24) | (S[(s2>>16)&0xff]<<16) | (S[(s3>>8)&0xff]<<8) | S[s0&0xff]) ^ rk[41],
+			((S[s2>>24]<<24) | (S[(s3>>16)&0xff]<<16) | (S[(s0>>8)&0xff]<<8) | S[s1&0xff]) ^ rk[42],
+			((S[s3>>24]<<24) | (S[(s0>>16)&0xff]<<16) | (S[(s1>>8)&0xff]<<8) | S[s2&0xff]) ^ rk[43],
+			)
+
+	def encryptCBC(self, iv, text):
+		'''
+		return the CBC mode encryption of text (a multiple of 16 bytes) with
+		initialisation vector iv
+		'''
+		if len(iv)!=16 or len(text)%16:
+			raise ValueError('AES128 iv must be 16 bytes and the text a multiple of 16 bytes')
+		c0, c1, c2, c3 = unpack('>4L',iv)
+		words = unpack('>%dL' % (len(text)//4),text)
+		encrypt = self._encryptBlock
+		C = []
+		for p in xrange(0,len(words),4):
+			c0, c1, c2, c3 = encrypt(words[p]^c0,words[p+1]^c1,words[p+2]^c2,words[p+3]^c3)
+			C.extend((c0, c1, c2, c3))
+		return pack('>%dL' % len(C),*C)
+
+try:
+	from _rl_accel import aesEncryptCBC as _aesEncryptCBC
+except ImportError:
+	try:
+		from reportlab.lib._rl_accel import aesEncryptCBC as _aesEncryptCBC
+	except ImportError:
+		_aesEncryptCBC = None
+
+def pad(text):
+	"add the PKCS#5 padding AESV2 requires"
+	n = 16-len(text)%16
+	return text+n*chr(n)
+
+def encryptCBC(text, key, iv):
+	"One-line shortcut for CBC encryption of text which is a multiple of 16 bytes"
+	if _aesEncryptCBC:
+		return _aesEncryptCBC(key,iv,text)
+	return AES128(key).encryptCBC(iv,text)
+
+_TESTS=[{	#FIPS-197 appendix C.1
+		'key': "\x00\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0a\x0b\x0c\x0d\x0e\x0f",
+		'iv': 16*"\x00",
+		'input': "\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\xcc\xdd\xee\xff",
+		'output': "\x69\xc4\xe0\xd8\x6a\x7b\x04\x30\xd8\xcd\xb7\x80\x70\xb4\xc5\x5a",
+		},
+
+		{	#NIST SP 800-38A F.2.1 CBC-AES128.Encrypt
+		'key': "\x2b\x7e\x15\x16\x28\xae\xd2\xa6\xab\xf7\x15\x88\x09\xcf\x4f\x3c",
+		'iv': "\x00\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0a\x0b\x0c\x0d\x0e\x0f",
+		'input': "\x6b\xc1\xbe\xe2\x2e\x40\x9f\x96\xe9\x3d\x7e\x11\x73\x93\x17\x2a\
+\xae\x2d\x8a\x57\x1e\x03\xac\x9c\x9e\xb7\x6f\xac\x45\xaf\x8e\x51\
+\x30\xc8\x1c\x46\xa3\x5c\xe4\x11\xe5\xfb\xc1\x19\x1a\x0a\x52\xef\
+\xf6\x9f\x24\x45\xdf\x4f\x9b\x17\xad\x2b\x41\x7b\xe6\x6c\x37\x10",
+		'output': "\x76\x49\xab\xac\x81\x19\xb2\x46\xce\xe9\x8e\x9b\x12\xe9\x19\x7d\
+\x50\x86\xcb\x9b\x50\x72\x19\xee\x95\xdb\x11\x3a\x91\x76\x78\xb2\
+\x73\xbe\xd6\xb8\xe3\xc1\x74\x3b\x71\x16\xe6\x9e\x22\x22\x95\x16\
+\x3f\xf1\xca\xa1\x68\x1f\xac\x09\x12\x0e\xca\x30\x75\x86\xe1\xa7",
+		},
+	]
+
+if __name__=='__main__':
+	i = 0
+	for t in _TESTS:
+		o = AES128(t['key']).encryptCBC(t['iv'],t['input'])
+		print 'Python test %d %s!' %(i,o!=t['output'] and 'failed' or 'succeeded')
+		o = encryptCBC(t['input'],t['key'],t['iv'])
+		print 'Shortcut test %d %s!' %(i,o!=t['output'] and 'failed' or 'succeeded')
+		i += 1
@@ -195,14 +195,24 @@ _TESTS=[{
 		},
 	]
 
+try:
+	from _rl_accel import arcIV as _arcIV
+except ImportError:
+	try:
+		from reportlab.lib._rl_accel import arcIV as _arcIV
+	except ImportError:
+		_arcIV = None
+
 def encode(text, key):
 	"One-line shortcut for making an encoder object"
+	if _arcIV and type(text) is StringType and type(key) is StringType:
+		return _arcIV(key,text)
 	return ArcIV(key).encode(text)
 
 def decode(text, key):
 	"One-line shortcut for decoding"
 	# yes, encode and decode are symmetric - see docstring
-	return ArcIV(key).encode(text)
+	return encode(text, key)
 
 if __name__=='__main__':
 	i = 0
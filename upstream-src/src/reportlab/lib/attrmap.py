@@ -99,25 +99,66 @@ class AttrMap(UserDict):
         c.update(kw)
         return c
 
+def _validateAttr(obj,map,name,value):
+    #we always allow the inherited values; they cannot
+    #be checked until draw time.
+    if isinstance(value, DerivedValue):
+        #let it through
+        pass
+    else:
+        try:
+            validate = map[name].validate
+            if not validate(value):
+                raise AttributeError, "Illegal assignment of '%s' to '%s' in class %s" % (value, name, obj.__class__.__name__)
+        except KeyError:
+            raise AttributeError, "Illegal attribute '%s' in class %s" % (name, obj.__class__.__name__)
+
+#while _trusted.depth is non-zero this thread's attribute assignments
+#are trusted (see trustedCall)
+try:
+    from threading import local as _local
+except ImportError:
+    class _local:
+        pass
+_trusted = _local()
+_trusted.depth = 0
+
 def validateSetattr(obj,name,value):
     '''validate setattr(obj,name,value)'''
-    if rl_config.shapeChecking:
+    if rl_config.shapeChecking and not getattr(_trusted,'depth',0):
         map = obj._attrMap
         if map and name[0]!= '_':
-            #we always allow the inherited values; they cannot
-            #be checked until draw time.
-            if isinstance(value, DerivedValue):
-                #let it through
-                pass
-            else:            
-                try:
-                    validate = map[name].validate
-                    if not validate(value):
-                        raise AttributeError, "Illegal assignment of '%s' to '%s' in class %s" % (value, name, obj.__class__.__name__)
-                except KeyError:
-                    raise AttributeError, "Illegal attribute '%s' in class %s" % (name, obj.__class__.__name__)
+            _validateAttr(obj,map,name,value)
     obj.__dict__[name] = value
 
+def validateAttrs(obj,ignore=()):
+    '''validate the public attributes obj already has'''
+    map = obj._attrMap
+    if map:
+        for name, value in obj.__dict__.items():
+            if name[0]!='_' and name not in ignore:
+                _validateAttr(obj,map,name,value)
+
+def _callTrusting(depth,func,args,kw):
+    old = getattr(_trusted,'depth',0)
+    _trusted.depth = depth
+    try:
+        return func(*args,**kw)
+    finally:
+        _trusted.depth = old
+
+def trustedCall(func,*args,**kw):
+    '''return func(*args,**kw) with assignment checking switched off in
+    this thread. Used for library code (eg the draw methods of our own
+    widgets) which builds shapes from values that were checked when they
+    were set.'''
+    return _callTrusting(getattr(_trusted,'depth',0)+1,func,args,kw)
+
+def checkedCall(func,*args,**kw):
+    '''return func(*args,**kw) with assignment checking as usual even when
+    called from within trustedCall'''
+    return _callTrusting(0,func,args,kw)
+
 def _privateAttrMap(obj,ret=0):
     '''clone obj._attrMap if required'''
     A = obj._attrMap
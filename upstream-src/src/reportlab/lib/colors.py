@@ -14,7 +14,8 @@ These can be constructed from several popular formats.  We also include
 - various conversion and construction functions
 '''
 import math
-from reportlab.lib.utils import fp_str
+from reportlab.lib.utils import fp_str, LRUCache
+from reportlab import rl_config
 
 class Color:
     """This class is used to represent color.  Components red, green, blue
@@ -654,19 +655,11 @@ def cmykDistance(col1, col2):
             (col1.black - col2.black)**2
             )
 
-_namedColors = None
+#the named colors are collected once, here at import
+_namedColors = dict((name,value) for name,value in globals().items() if isinstance(value,Color))
 
 def getAllNamedColors():
     #returns a dictionary of all the named ones in the module
-    # uses a singleton for efficiency
-    global _namedColors
-    if _namedColors is not None: return _namedColors
-    import colors
-    _namedColors = {}
-    for (name, value) in colors.__dict__.items():
-        if isinstance(value, Color):
-            _namedColors[name] = value
-
     return _namedColors
 
 def describe(aColor,mode=0):
@@ -794,6 +787,34 @@ class cssParse:
 
 cssParse=cssParse()
 
+#string arguments resolved by toColor are remembered as (fromCss, color)
+#pairs; the colors are shared so callers must not modify them
+_colorCache = []
+def _getColorCache():
+    if not _colorCache:
+        if not rl_config.toColorCacheSize: return None
+        _colorCache.append(LRUCache(rl_config.toColorCacheSize))
+    return _colorCache[0]
+
+def toColorCacheInfo():
+    """return the toColor string cache hits, misses and size"""
+    if not _colorCache: return 0, 0, 0
+    cache = _colorCache[0]
+    return cache.hits, cache.misses, len(cache)
+
+def _nameToColor(arg):
+    '''resolve a color name, expression or hex string; return None on failure'''
+    C = _namedColors.get(arg.lower())
+    if C is not None: return C
+    try:
+        return toColor(eval(arg))
+    except:
+        pass
+    try:
+        return HexColor(arg)
+    except:
+        return None
+
 class toColor:
 
     def __init__(self):
@@ -832,16 +853,26 @@ class toColor:
             assert 0<=min(arg) and max(arg)<=1
             return len(arg)==3 and Color(arg[0],arg[1],arg[2]) or CMYKColor(arg[0],arg[1],arg[2],arg[3])
         elif isinstance(arg,basestring):
-            C = cssParse(arg)
-            if C: return C
-            if arg in self.extraColorsNS: return self.extraColorsNS[arg]
-            C = getAllNamedColors()
-            s = arg.lower()
-            if s in C: return C[s]
-            try:
-                return toColor(eval(arg))
-            except:
-                pass
+            #css forms take precedence over extraColorsNS which in turn
+            #overrides the names and expressions
+            cache = _getColorCache()
+            r = cache is not None and cache.get(arg) or None
+            if r is None:
+                C = cssParse(arg)
+                if C:
+                    r = True, C
+                elif arg in self.extraColorsNS:
+                    return self.extraColorsNS[arg]
+                else:
+                    C = _nameToColor(arg)
+                    r = C is not None and (False, C) or None
+                if r and cache is not None: cache[arg] = r
+            if r:
+                if r[0] or arg not in self.extraColorsNS: return r[1]
+                return self.extraColorsNS[arg]
+            if default is None:
+                raise ValueError('Invalid color value %r' % arg)
+            return default
 
         try:
             return HexColor(arg)
@@ -879,7 +910,7 @@ def setColors(**kw):
                 progress = 1
 
     if kw: raise ValueError("Can't convert\n%s" % str(kw))
-    getAllNamedColors()
+    if _colorCache: _colorCache[0].clear()
     for k, c in assigned.items():
         globals()[k] = c
         if isinstance(c,Color): _namedColors[k] = c
@@ -38,7 +38,7 @@ for i in range(6,31):
 # no encryption
 class StandardEncryption:
     prepared = 0
-    def __init__(self, userPassword, ownerPassword=None, canPrint=1, canModify=1, canCopy=1, canAnnotate=1, strength=40):
+    def __init__(self, userPassword, ownerPassword=None, canPrint=1, canModify=1, canCopy=1, canAnnotate=1, strength=40, aes=0):
         '''
         This class defines the encryption properties to be used while creating a pdf document.
         Once initiated, a StandardEncryption object can be applied to a Canvas or a BaseDocTemplate.
@@ -49,6 +49,8 @@ class StandardEncryption:
         If the user supplies the owner password while opening the pdf, all actions can be performed regardless
         of the flags.
         Note that the security provided by these encryption settings (and even more so for the flags) is very weak.
+        If aes is true the document content is encrypted with 128 bit AES (algorithm revision 4, the
+        AESV2 crypt filter) instead of RC4 whatever the strength; such documents need PDF 1.6 readers.
         '''
         self.ownerPassword = ownerPassword
         self.userPassword = userPassword
@@ -56,6 +58,8 @@ class StandardEncryption:
             self.revision = 2
         elif strength == 128:
             self.revision = 3
+        if aes:
+            self.revision = 4
         self.canPrint = canPrint
         self.canModify = canModify
         self.canCopy = canCopy
@@ -80,12 +84,19 @@ class StandardEncryption:
             raise ValueError, "encryption not prepared!"
         if self.objnum is None:
             raise ValueError, "not registered in PDF object"
-        return encodePDF(self.key, self.objnum, self.version, t, revision=self.revision)
+        iv = None
+        if self.revision==4 and self.invariant:
+            #derive the initialisation vector so invariant documents stay reproducible
+            iv = md5('%d %d ' % (self.objnum, self.version) + t).digest()
+        return encodePDF(self.key, self.objnum, self.version, t, revision=self.revision, iv=iv)
     def prepare(self, document, overrideID=None):
         # get ready to do encryption
         if DEBUG: print 'StandardEncryption.prepare(...) - revision %d' % self.revision
         if self.prepared:
             raise ValueError, "encryption already prepared!"
+        self.invariant = getattr(document,'invariant',0)
+        if self.revision==4 and document is not None:
+            document.ensureMinPdfVersion('aes')
         # get the unescaped string value of the document id (first array element).
         # we allow one to be passed in instead to permit reproducible tests
         # of our algorithm, but in real life overrideID will always be None
@@ -145,7 +156,16 @@ class StandardEncryptionDictionary:
                 "O": hexText(self.O), #PDFString(self.O),
                 "U": hexText(self.U), #PDFString(self.U),
                 "P": self.P}
-        if self.revision == 3:
+        if self.revision == 4:
+            dict['Length'] = 128
+            dict['R'] = 4
+            dict['V'] = 4
+            dict['CF'] = PDFDictionary({'StdCF': PDFDictionary({
+                                'AuthEvent': PDFName('DocOpen'),
+                                'CFM': PDFName('AESV2'),
+                                'Length': 16})})
+            dict['StmF'] = dict['StrF'] = PDFName('StdCF')
+        elif self.revision == 3:
             dict['Length'] = 128
             dict['R'] = 3
             dict['V'] = 2
@@ -223,7 +243,7 @@ def encryptionkey(password, OwnerKey, Permissions, FileId1, revision=2):
 
     if revision==2:
         key = md5output[:5]
-    elif revision==3:  #revision 3 algorithm - loop 50 times
+    elif revision>=3:  #revision 3 algorithm - loop 50 times
         for x in range(50):
             md5output = md5(md5output).digest()
         key = md5output[:16]
@@ -231,9 +251,9 @@ def encryptionkey(password, OwnerKey, Permissions, FileId1, revision=2):
     return key
 
 def computeO(userPassword, ownerPassword, revision):
-    from reportlab.lib.arciv import ArcIV
+    from reportlab.lib.arciv import encode
     #print 'digest of hello is %s' % md5('hello').digest()
-    assert revision in (2,3), 'Unknown algorithm revision %s' % revision
+    assert revision in (2,3,4), 'Unknown algorithm revision %s' % revision
     if ownerPassword in (None, ''):
         ownerPassword = userPassword
 
@@ -245,31 +265,31 @@ def computeO(userPassword, ownerPassword, revision):
 
     digest = md5(ownerPad).digest()
     if revision == 2:
-        O = ArcIV(digest[:5]).encode(userPad)
-    elif revision == 3:
+        O = encode(userPad,digest[:5])
+    elif revision >= 3:
         for i in range(50):
             digest = md5(digest).digest()
         digest = digest[:16]
         O = userPad
         for i in range(20):
             thisKey = xorKey(i, digest)
-            O = ArcIV(thisKey).encode(O)
+            O = encode(O,thisKey)
     if DEBUG: print 'computeO(%s,%s,%s)==>%s' % tuple(map(lambda x: hexText(str(x)),(userPassword, ownerPassword, revision,O)))
     return O
 
 def computeU(encryptionkey, encodestring=PadString,revision=2,documentId=None):
-    from reportlab.lib.arciv import ArcIV
+    from reportlab.lib.arciv import encode
     if revision == 2:
-        result = ArcIV(encryptionkey).encode(encodestring)
-    elif revision == 3:
+        result = encode(encodestring,encryptionkey)
+    elif revision >= 3:
         assert documentId is not None, "Revision 3 algorithm needs the document ID!"
         h = md5(PadString)
         h.update(documentId)
         tmp = h.digest()
-        tmp = ArcIV(encryptionkey).encode(tmp)
+        tmp = encode(tmp,encryptionkey)
         for n in range(1,20):
             thisKey = xorKey(n, encryptionkey)
-            tmp = ArcIV(thisKey).encode(tmp)
+            tmp = encode(tmp,thisKey)
         while len(tmp) < 32:
             tmp = tmp + '\000'
         result = tmp
@@ -284,8 +304,11 @@ def checkU(encryptionkey, U):
             raise ValueError, "lengths don't match! (password failed)"
         raise ValueError, "decode of U doesn't match fixed padstring (password failed)"
 
-def encodePDF(key, objectNumber, generationNumber, string, revision=2):
-    "Encodes a string or stream"
+def encodePDF(key, objectNumber, generationNumber, string, revision=2, iv=None):
+    """Encodes a string or stream
+
+    revision 4 uses AES in CBC mode; the result is prefixed by the 16 byte
+    initialisation vector iv which is random unless given."""
     #print 'encodePDF (%s, %d, %d, %s)' % (hexText(key), objectNumber, generationNumber, string)
     # extend 3 bytes of the object Number, low byte first
     newkey = key
@@ -298,13 +321,19 @@ def encodePDF(key, objectNumber, generationNumber, string, revision=2):
     for i in range(2):
         newkey = newkey + chr(n & 0xff)
         n = n>>8
-    md5output = md5(newkey).digest()
-    if revision == 2:
-        key = md5output[:10]
-    elif revision == 3:
-        key = md5output #all 16 bytes
-    from reportlab.lib.arciv import ArcIV
-    encrypted = ArcIV(key).encode(string)
+    if revision == 4:
+        from reportlab.lib import aes
+        key = md5(newkey+'sAlT').digest()
+        if iv is None: iv = os.urandom(16)
+        encrypted = iv + aes.encryptCBC(aes.pad(string),key,iv)
+    else:
+        md5output = md5(newkey).digest()
+        if revision == 2:
+            key = md5output[:10]
+        elif revision == 3:
+            key = md5output #all 16 bytes
+        from reportlab.lib.arciv import encode
+        encrypted = encode(string,key)
     #print 'encrypted=', hexText(encrypted)
     if DEBUG: print 'encodePDF(%s,%s,%s,%s,%s)==>%s' % tuple(map(lambda x: hexText(str(x)),(key, objectNumber, generationNumber, string, revision,encrypted)))
     return encrypted
@@ -340,6 +369,23 @@ def test():
     assert hexText(enc.U) == expectedU, '128 bit unexpected U value %s' % hexText(enc.U)
     assert hexText(enc.key) == expectedKey, '128 bit unexpected key value %s' % hexText(enc.key)
 
+def benchmark(pages=50, repeats=3):
+    "time saving the same document unencrypted, with 40 and 128 bit RC4 and with AES"
+    from time import time
+    def save(**kw):
+        canv = Canvas(getStringIO(), invariant=1)
+        if kw: encryptCanvas(canv, 'userpass', 'ownerpass', **kw)
+        for p in xrange(pages):
+            for i in xrange(60):
+                canv.drawString(72, 72+10*i, 'page %d line %d: the quick brown fox jumps over the lazy dog' % (p, i))
+            canv.showPage()
+        canv.save()
+    for name, kw in (('plain', {}), ('RC4 40', dict(strength=40)),
+                    ('RC4 128', dict(strength=128)), ('AES 128', dict(strength=128, aes=1))):
+        t = time()
+        for i in xrange(repeats): save(**kw)
+        print '%-8s %.3f seconds per document' % (name, (time()-t)/repeats)
+
     ######################################################################
     #
     #  These represent the higher level API functions
@@ -349,12 +395,12 @@ def test():
 def encryptCanvas(canvas,
                   userPassword, ownerPassword=None,
                   canPrint=1, canModify=1, canCopy=1, canAnnotate=1,
-                  strength=40):
+                  strength=40, aes=0):
     "Applies encryption to the document being generated"
 
     enc = StandardEncryption(userPassword, ownerPassword,
                              canPrint, canModify, canCopy, canAnnotate,
-                             strength=strength)
+                             strength=strength, aes=aes)
     canvas._doc.encrypt = enc
 
 # Platypus stuff needs work, sadly.  I wanted to do it without affecting
@@ -625,4 +671,5 @@ if __name__=="__main__": #NO RUNTESTS
         sys.argv = filter(lambda x: x[:7]!='--debug',sys.argv)
         DEBUG = len(a)
     if '--test' in sys.argv: test()
+    elif '--benchmark' in sys.argv: benchmark()
     else: main()
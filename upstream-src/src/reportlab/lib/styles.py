@@ -109,6 +109,7 @@ class ParagraphStyle(PropertySet):
         'allowWidows': 1,
         'allowOrphans': 0,
         'textTransform':None,   #uppercase lowercase (captitalize not yet) or None or absent
+        'hyphenationLang':None, #eg 'en' to hyphenate words which overflow a line
         }
 
 class LineStyle(PropertySet):
@@ -96,6 +96,20 @@ def makeSuiteForClasses(*classes):
         suite.addTest(loader.loadTestsFromTestCase(C))
     return suite
 
+def skipUnless(condition, reason):
+    '''decorator for a test method which can only run if condition is true;
+    otherwise the test is reported as skipped (on unittests without skipping
+    it passes after saying why on stderr)'''
+    def decorator(func):
+        if condition: return func
+        def skipped(self):
+            if hasattr(self,'skipTest'): self.skipTest(reason)
+            sys.stderr.write('\n%s.%s skipped: %s\n' % (self.__class__.__name__,func.__name__,reason))
+        skipped.__name__ = func.__name__
+        skipped.__doc__ = func.__doc__
+        return skipped
+    return decorator
+
 def getCVSEntries(folder, files=1, folders=0):
     """Returns a list of filenames as listed in the CVS/Entries file.
 
@@ -16,6 +16,9 @@ from types import StringType, UnicodeType
 import unicodedata
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.rl_config import _FUZZ
+from reportlab.lib.utils import LRUCache, getLanguageHyphenater
+from reportlab import rl_config
+import re
 
 CANNOT_START_LINE = [
     #strongly prohibited e.g. end brackets, stop, exclamation...
@@ -183,10 +186,183 @@ def kinsokuShoriSplit(word, widths, availWidth):
                 pass
     #to be completed
 
+#pattern based hyphenation (pyHnj); a word may carry leading/trailing punctuation
+#and the pattern matcher sees its letters as latin-1
+LEFT_HYPHEN_MIN = 2     #fewest letters before a hyphen
+RIGHT_HYPHEN_MIN = 3    #fewest letters after it
+_hyphenatable = re.compile(r'^(\W*)(\w+)\W*$',re.UNICODE)
+_hyphenations = LRUCache(rl_config.hyphenationCacheSize)
+def _reset():
+    _hyphenations.clear()
+    _hyphenations.maxSize = rl_config.hyphenationCacheSize
+from reportlab.rl_config import register_reset
+register_reset(_reset)
+del register_reset
+
+def hyphenationPoints(word, lang):
+    """Returns the positions in unicode word at which it may be hyphenated
+    for language lang (an empty tuple if none or there are no patterns for lang).
+    The results are memoized per (lang, word).
+
+    >>> hyphenationPoints(u'(hyphenation)','en') in ((), (3, 7))
+    True
+    """
+    key = lang, word
+    P = _hyphenations.get(key)
+    if P is None:
+        P = ()
+        m = _hyphenatable.match(word)
+        if m:
+            h = getLanguageHyphenater(lang)
+            if h:
+                lead, core = m.group(1,2)
+                try:
+                    codes = h.getCodes(core.encode('latin-1'))
+                except UnicodeEncodeError:
+                    codes = None
+                if codes:
+                    n = len(lead)+1
+                    P = tuple([n+i for i in xrange(LEFT_HYPHEN_MIN-1,len(core)-RIGHT_HYPHEN_MIN) if int(codes[i])&1])
+        _hyphenations[key] = P
+    return P
+
+#Knuth-Plass line breaking (Breaking Paragraphs into Lines, Software Practice and Experience 11, 1981).
+#A paragraph is a list of items: Box (unbreakable material), Glue (breakable space that can
+#stretch and shrink) and Penalty (a possible break costing penalty; INFINITY_PENALTY never
+#breaks, -INFINITY_PENALTY always does).  A break may be at a glue after a box or at a penalty.
+INFINITY_PENALTY = 10000
+
+class _KPItem:
+    is_box = is_glue = is_penalty = 0
+    character = None
+    stretch = shrink = penalty = 0
+    flagged = 0
+    def compute_width(self,r):
+        if self.is_glue: return self.width+r*(r<0 and self.shrink or self.stretch)
+        return self.width
+
+class _py_Box(_KPItem):
+    is_box = 1
+    def __init__(self,width,character=None):
+        self.width = float(width)
+        self.character = character
+
+class _py_Glue(_KPItem):
+    is_glue = 1
+    def __init__(self,width,stretch,shrink):
+        self.width = float(width)
+        self.stretch = float(stretch)
+        self.shrink = float(shrink)
+
+class _py_Penalty(_KPItem):
+    is_penalty = 1
+    def __init__(self,width,penalty,flagged=0):
+        self.width = float(width)
+        self.penalty = float(penalty)
+        self.flagged = int(flagged)
+
+def _py_kpBreaks(items,lineWidths,linePenalty=10,adjDemerits=10000,flaggedDemerits=3000):
+    '''return the item positions of a Knuth-Plass total fit breaking of items
+    into lines of lineWidths (the last width is used for all later lines).
+    A line which can't fit is made as short as possible.
+
+    >>> B, G, P = _py_Box, _py_Glue, _py_Penalty
+    >>> items = [B(10),G(5,3,1),B(10),G(5,3,1),B(20),G(5,3,1),B(10)]
+    >>> _py_kpBreaks(items+[P(0,INFINITY_PENALTY),G(0,1e5,0),P(0,-INFINITY_PENALTY)],[40])
+    [3, 9]
+    '''
+    INF = INFINITY_PENALTY
+    nLW = len(lineWidths)
+    if not nLW: raise ValueError('kpBreaks: lineWidths must not be empty')
+    n = len(items)
+    #totals of width, stretch and shrink for items[:i]
+    T = [(0,0,0)]
+    tw = ty = tz = 0
+    for x in items:
+        if x.is_glue:
+            tw += x.width
+            ty += x.stretch
+            tz += x.shrink
+        elif x.is_box:
+            tw += x.width
+        T.append((tw,ty,tz))
+    #node = [pos, line, fitness, demerits, totals, from]
+    active = [[-1,0,1,0,T[0],None]]
+    for b in xrange(n):
+        x = items[b]
+        if x.is_box: continue
+        if x.is_glue:
+            if not b or not items[b-1].is_box: continue
+            p = 0
+        else:
+            p = x.penalty
+            if p>=INF: continue
+        tw, ty, tz = T[b]
+        if x.is_penalty: tw += x.width
+        best = {}
+        last = None
+        keep = []
+        for node in active:
+            pos, line, fitness, demerits, t, fr = node
+            w = tw-t[0]
+            L = lineWidths[min(line,nLW-1)]
+            if w<L:
+                y = ty-t[1]
+                r = y>0 and min((L-w)/y,1000.) or 1000.
+            elif w>L:
+                z = tz-t[2]
+                r = z>0 and (L-w)/z or -1000.
+            else:
+                r = 0
+            if r<-1:
+                if last is None or pos>last[0]: last = node
+                continue
+            if p>-INF: keep.append(node)
+            d = (linePenalty + 100*abs(r*r*r))**2
+            if p>0: d += p*p
+            elif p>-INF: d -= p*p
+            if x.is_penalty and x.flagged and pos>=0 and items[pos].is_penalty and items[pos].flagged:
+                d += flaggedDemerits
+            if r<-0.5: f = 0
+            elif r<=0.5: f = 1
+            elif r<=1: f = 2
+            else: f = 3
+            if abs(f-fitness)>1: d += adjDemerits
+            d += demerits
+            if f not in best or d<best[f][0]: best[f] = d, node
+        if not keep and not best and last is not None:
+            #nothing fits so the latest break gets an overfull line
+            best[1] = last[3]+INF*INF, last
+        s = b+1
+        while s<n and not items[s].is_box and not (items[s].is_penalty and items[s].penalty<=-INF): s += 1
+        #the new nodes go in front, the loosest first, in the order _rl_accel uses
+        active = keep
+        for f in (0,1,2,3):
+            if f in best:
+                d, node = best[f]
+                active.insert(0,[b,node[1]+1,f,d,T[s],node])
+        if not active: break
+    node = None
+    for a in active:
+        if node is None or a[0]>node[0] or (a[0]==node[0] and a[3]<node[3]): node = a
+    R = []
+    while node and node[0]>=0:
+        R.append(node[0])
+        node = node[5]
+    R.reverse()
+    return R
+
+try:
+    from _rl_accel import Box, Glue, Penalty, kpBreaks
+except ImportError:
+    try:
+        from reportlab.lib._rl_accel import Box, Glue, Penalty, kpBreaks
+    except ImportError:
+        Box, Glue, Penalty, kpBreaks = _py_Box, _py_Glue, _py_Penalty, _py_kpBreaks
+
 # This recipe refers:
 #
 #  http://aspn.activestate.com/ASPN/Cookbook/Python/Recipe/148061
-import re
 rx=re.compile(u"([\u2e80-\uffff])", re.UNICODE)
 def cjkwrap(text, width, encoding="utf8"):
      return reduce(lambda line, word, width=width: '%s%s%s' %
@@ -255,6 +255,23 @@ if ',' in fp_str(0.25):
     def fp_str(*a):
         return _FP_STR(*a).replace(',','.')
 
+class _py_ContentStream(list):
+    '''the operator strings of a PDF content stream (pdfgen's _code)'''
+    def op(self,name,*a):
+        '''add the numeric operands a (or a single sequence of them) and the operator name'''
+        self.append(a and ('%s %s' % (fp_str(*a),name)) or name)
+
+    def join(self,sep):
+        return sep.join(self)
+
+try:
+    from _rl_accel import ContentStream
+except ImportError:
+    try:
+        from reportlab.lib._rl_accel import ContentStream
+    except ImportError:
+        ContentStream = _py_ContentStream
+
 def recursiveImport(modulename, baseDir=None, noCWD=0, debug=0):
     """Dynamically imports possible packagized module, or raises ImportError"""
     normalize = lambda x: os.path.normcase(os.path.abspath(os.path.normpath(x)))
@@ -402,14 +419,114 @@ def getArgvDict(**kw):
 
     return R
 
+class LRUCache:
+    '''a mapping holding at most maxSize items; when it overflows the least
+    recently used quarter is discarded. hits and misses count the lookups.'''
+    def __init__(self,maxSize=1000):
+        self.maxSize = maxSize
+        self.clear()
+
+    def clear(self):
+        self._data = {}
+        self._tick = 0
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self,key):
+        return key in self._data
+
+    def get(self,key,default=None):
+        try:
+            e = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._tick = e[1] = self._tick+1
+        return e[0]
+
+    def __setitem__(self,key,value):
+        self._tick += 1
+        self._data[key] = [value,self._tick]
+        if len(self._data)>self.maxSize: self._prune()
+
+    def _prune(self):
+        L = [(e[1],k) for k,e in self._data.iteritems()]
+        L.sort()
+        for t,k in L[:len(L)-3*self.maxSize//4]:
+            del self._data[k]
+
+def _importHyphen():
+    try:
+        from _pyHnj import Hyphen
+    except ImportError:
+        try:
+            from reportlab.lib._pyHnj import Hyphen
+        except ImportError, errMsg:
+            if str(errMsg)!='No module named _pyHnj': raise
+            return None
+    return Hyphen
+
+_hyphenaters = {}
 def getHyphenater(hDict=None):
+    '''return a pyHnj Hyphen for the pattern file hDict (by default the
+    English hyphen.mashed) or None if pyHnj isn't available. The loaded
+    pattern dictionaries are shared.'''
+    Hyphen = _importHyphen()
+    if Hyphen is None: return None
+    if hDict is None:
+        from reportlab.rl_config import HyphenationSearchPath
+        hDict = findInPaths('hyphen.mashed',[os.path.dirname(__file__)]+HyphenationSearchPath)
+    hDict = os.path.abspath(hDict)
+    h = _hyphenaters.get(hDict,None)
+    if h is None:
+        if not _hyphenaters:
+            from reportlab.rl_config import register_reset
+            register_reset(_reset_hyphenaters)
+        h = _hyphenaters[hDict] = Hyphen(hDict)
+    return h
+
+_langHyphenaters = {}
+def getLanguageHyphenater(lang):
+    '''return the Hyphen for language lang (eg 'en' or 'de_DE') or None if there
+    are no patterns for it. We look on rl_config.HyphenationSearchPath for
+    hyph_<lang>.mashed then hyph_<base language>.mashed; English also uses
+    the distributed hyphen.mashed.'''
     try:
-        from reportlab.lib.pyHnj import Hyphen
-        if hDict is None: hDict=os.path.join(os.path.dirname(__file__),'hyphen.mashed')
-        return Hyphen(hDict)
-    except ImportError, errMsg:
-        if str(errMsg)!='No module named pyHnj': raise
-        return None
+        return _langHyphenaters[lang]
+    except KeyError:
+        pass
+    h = None
+    if _importHyphen():
+        from reportlab.rl_config import HyphenationSearchPath
+        base = lang.replace('-','_').split('_')[0]
+        names = ['hyph_%s.mashed' % lang, 'hyph_%s.mashed' % base]
+        if base=='en': names.append('hyphen.mashed')
+        for fn in names:
+            fn = findInPaths(fn,HyphenationSearchPath)
+            if os.path.isfile(fn):
+                h = getHyphenater(fn)
+                break
+    if not _langHyphenaters:
+        from reportlab.rl_config import register_reset
+        register_reset(_reset_hyphenaters)
+    _langHyphenaters[lang] = h
+    return h
+
+def _reset_hyphenaters():
+    _hyphenaters.clear()
+    _langHyphenaters.clear()
+
+def _forkedWorkers():
+    '''true if multiprocessing starts its workers by forking us; then they
+    inherit module globals set up for them in the parent'''
+    try:
+        from multiprocessing import get_start_method
+    except ImportError:
+        return sys.platform!='win32'
+    return get_start_method()=='fork'
 
 def _className(self):
     '''Return a shortened class name'''
@@ -524,6 +641,44 @@ def _isPILImage(im):
     
 from mwlib import lrucache
 
+_imageSourceKeys = {}   #(abspath, size, mtime) --> md5 of the file
+def _reset_imageSourceKeys():
+    _imageSourceKeys.clear()
+
+def imageSourceKey(src):
+    '''return an md5 hexdigest of the (still encoded) bytes of an image file
+    name or file like object or None if there aren't any. The digests of
+    files are remembered while their size and modification time don't change.'''
+    if isinstance(src,basestring):
+        try:
+            st = os.stat(src)
+        except (OSError,TypeError,ValueError):
+            return None
+        fk = os.path.abspath(src), st.st_size, st.st_mtime
+        key = _imageSourceKeys.get(fk,None)
+        if key is None:
+            f = open(src,'rb')
+            try:
+                key = md5(f.read()).hexdigest()
+            finally:
+                f.close()
+            if not _imageSourceKeys:
+                from reportlab.rl_config import register_reset
+                register_reset(_reset_imageSourceKeys)
+            _imageSourceKeys[fk] = key
+        return key
+    if hasattr(src,'read') and hasattr(src,'seek'):
+        try:
+            pos = src.tell()
+            src.seek(0)
+            try:
+                return md5(src.read()).hexdigest()
+            finally:
+                src.seek(pos)
+        except:
+            pass
+    return None
+
 class ImageReader(object):
     "Wraps up either PIL or Java to get data from bitmaps"
     _cache={}
@@ -543,6 +698,7 @@ class ImageReader(object):
         self._transparent = None
         self._data = None
         if _isPILImage(fileName):
+            self._sourceKey = None  #only the decoded pixels identify it
             self._image = fileName
             self.fp = getattr(fileName,'fp',None)
             try:
@@ -553,6 +709,9 @@ class ImageReader(object):
             try:
                 from reportlab.rl_config import imageReaderFlags
                 self.fp = open_for_read(fileName,'b')
+                if not isinstance(fileName,basestring):
+                    #identify file like objects while we can still read them
+                    self.getSourceKey()
                 if isinstance(self.fp,_StringIOKlass):  imageReaderFlags=0 #avoid messing with already internal files
                 if imageReaderFlags>0:  #interning
                     data = self.fp.read()
@@ -583,7 +742,9 @@ class ImageReader(object):
                     #detect which library we are using and open the image
                     if not self._image:
                         self._image = self._read_image(self.fp)
-                    if getattr(self._image,'format',None)=='JPEG': self.jpeg_fh = self._jpeg_fh
+                    format = getattr(self._image,'format',None)
+                    if format=='JPEG': self.jpeg_fh = self._jpeg_fh
+                    elif format=='PNG': self.png_fh = self._jpeg_fh
                 else:
                     from reportlab.pdfbase.pdfutils import readJPEGInfo
                     try:
@@ -605,6 +766,20 @@ class ImageReader(object):
         ident = self._ident
         return '[%s@%s%s%s]' % (self.__class__.__name__,hex(id(self)),ident and (' ident=%r' % ident) or '',fn and (' filename=%r' % fn) or '')
 
+    def getSourceKey(self):
+        '''return a key identifying the image by its encoded bytes (see imageSourceKey)
+        or None if that's not possible; nothing is decoded.'''
+        try:
+            return self._sourceKey
+        except AttributeError:
+            pass
+        key = imageSourceKey(self.fileName)
+        if key is None:
+            #urls, archive members and file like objects
+            key = imageSourceKey(getattr(self,'fp',None))
+        self._sourceKey = key
+        return key
+
     def _read_image(self, fp):
         if sys.platform[0:4] == 'java':
             from javax.imageio import ImageIO
@@ -620,6 +795,9 @@ class ImageReader(object):
     def jpeg_fh(self):
         return None
 
+    def png_fh(self):
+        return None
+
     def getSize(self):
         if (self._width is None or self._height is None):
             if sys.platform[0:4] == 'java':
@@ -659,11 +837,14 @@ class ImageReader(object):
             else:
                 im = self._image
                 mode = self.mode = im.mode
-                if mode=='RGBA':
+                if mode in ('RGBA','LA'):
                     im.load()
-                    self._dataA = ImageReader(im.split()[3])
-                    im = im.convert('RGB')
-                    self.mode = 'RGB'
+                    alpha = im.split()[-1]
+                    if alpha.getextrema()!=(255,255):
+                        #only needed if something isn't opaque
+                        self._dataA = ImageReader(alpha)
+                    self.mode = mode[:-1]
+                    im = im.convert(self.mode)
                 elif mode not in ('L','RGB','CMYK'):
                     im = im.convert('RGB')
                     self.mode = 'RGB'
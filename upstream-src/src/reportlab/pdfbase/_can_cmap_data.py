@@ -37,7 +37,7 @@ def run():
         font = UnicodeCIDFont(fontName)
 
         widthsByCID = font.face._explicitWidths
-        cmap = font.encoding._cmap
+        cmap = font.encoding.getCMap()
         nonStandardWidthsByUnichar = {}
         for (codePoint, cid) in cmap.items():
             width = widthsByCID.get(cid, 1000)
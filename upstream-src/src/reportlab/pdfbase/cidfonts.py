@@ -8,24 +8,26 @@ __doc__="""CID (Asian multi-byte) font support.
 This defines classes to represent CID fonts.  They know how to calculate
 their own width and how to write themselves into PDF files."""
 
-import os
+import os, sys
 from types import ListType, TupleType, DictType
 from string import find, split, strip
 import marshal
-import time
+from array import array
+from bisect import bisect_right
+from itertools import imap, izip, repeat
 try:
     from hashlib import md5
 except ImportError:
     from md5 import md5
 
 import reportlab
+from reportlab import rl_config
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase._cidfontdata import allowedTypeFaces, allowedEncodings, CIDFontInfo, \
      defaultUnicodeEncodings, widthsByUnichar
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.pdfbase import pdfdoc
 from reportlab.pdfbase.pdfutils import _escape
-from reportlab.rl_config import CMapSearchPath
 
 
 #quick hackery for 2.0 release.  Now we always do unicode, and have built in
@@ -35,7 +37,7 @@ DISABLE_CMAP = True
 
 def findCMapFile(name):
     "Returns full filename, or raises error"
-    for dirname in CMapSearchPath:
+    for dirname in rl_config.CMapSearchPath:
         cmapfile = dirname + os.sep + name
         if os.path.isfile(cmapfile):
             #print "found", cmapfile
@@ -57,44 +59,106 @@ def structToPDF(structure):
     else:
         return structure
 
+#bump this when the layout of the files CIDEncoding.fastSave writes changes
+_cmapCacheVersion = 1
+
+#the tables of each CMap loaded so far; they're shared by all the
+#CIDEncodings of the same name
+_cmapTables = {}
+
+_emptyTable = (array('l'), array('l'), array('l'))
+
+def _addRange(R, S, start, end, value):
+    '''insert (start, end, value) into the ranges R which are sorted and
+    don't overlap; S holds their starts.  The parts of existing ranges
+    the new one covers are dropped'''
+    i = bisect_right(S, start)
+    if i and R[i-1][1]>=start: i -= 1
+    j = i
+    n = len(R)
+    while j<n and R[j][0]<=end: j += 1
+    new = [(start, end, value)]
+    if i<j:
+        s, e, v = R[i]
+        if s<start: new.insert(0,(s,start-1,v))
+        s, e, v = R[j-1]
+        if e>end: new.append((end+1,e,v))
+    R[i:j] = new
+    S[i:j] = [r[0] for r in new]
+
+def _rangeTable(ranges):
+    '''return ranges (start, end, value) as three arrays (starts, ends, values)
+    sorted by start; where ranges overlap the later one wins'''
+    R = []
+    S = []
+    for start, end, value in ranges:
+        _addRange(R, S, start, end, value)
+    return (array('l',S), array('l',[r[1] for r in R]), array('l',[r[2] for r in R]))
+
 class CIDEncoding(pdfmetrics.Encoding):
     """Multi-byte encoding.  These are loaded from CMAP files.
 
     A CMAP file is like a mini-codec.  It defines the correspondence
     between code points in the (multi-byte) input data and Character
-    IDs. """
+    IDs.
+
+    The CMAP is only read when first needed.  Its cid and notdef ranges
+    are kept as sorted range tables rather than a dictionary of codes and
+    if useCache (default rl_config.cmapCaching) is true they're saved in a
+    temporary folder so other processes needn't parse the file again."""
     # aims to do similar things to Brian Hooper's CMap class,
     # but I could not get it working and had to rewrite.
     # also, we should really rearrange our current encoding
     # into a SingleByteEncoding since many of its methods
     # should not apply here.
 
-    def __init__(self, name, useCache=1):
+    def __init__(self, name, useCache=None):
         self.name = name
         self._mapFileHash = None
         self._codeSpaceRanges = []
         self._notDefRanges = []
-        self._cmap = {}
+        self._cidRanges = []
+        self._sources = []
+        self._cidTable = self._notDefTable = None
         self.source = None
-        if not DISABLE_CMAP:
-            if useCache:
-                from reportlab.lib.utils import get_rl_tempdir
-                fontmapdir = get_rl_tempdir('FastCMAPS')
-                if os.path.isfile(fontmapdir + os.sep + name + '.fastmap'):
-                    self.fastLoad(fontmapdir)
-                    self.source = fontmapdir + os.sep + name + '.fastmap'
-                else:
-                    self.parseCMAPFile(name)
-                    self.source = 'CMAP: ' + name
-                    self.fastSave(fontmapdir)
-            else:
-                self.parseCMAPFile(name)
+        if useCache is None: useCache = rl_config.cmapCaching
+        self._useCache = useCache
 
     def _hash(self, text):
         hasher = md5()
         hasher.update(text)
         return hasher.digest()
 
+    def _load(self):
+        "read our CMAP tables from the process or file caches or else parse them"
+        name = self.name
+        if DISABLE_CMAP:
+            self._cidTable = self._notDefTable = _emptyTable
+        elif not self._useCache:
+            self.parseCMAPFile(name)
+            self.source = 'CMAP: ' + name
+        elif name in _cmapTables:
+            self.__dict__.update(_cmapTables[name])
+            return
+        else:
+            from reportlab.lib.utils import get_rl_tempdir
+            fontmapdir = get_rl_tempdir('FastCMAPS')
+            if self.fastLoad(fontmapdir):
+                self.source = os.path.join(fontmapdir, name + '.fastcmap')
+            else:
+                self.parseCMAPFile(name)
+                self.source = 'CMAP: ' + name
+                self.fastSave(fontmapdir)
+        #the single bytes which are whole codes and the CIDs translate has
+        #found; there are at most 64K codes of one or two bytes
+        self._singleByteCodes = set([b for b in xrange(256)
+                for low, high in self._codeSpaceRanges if low <= b <= high])
+        self._cidCache = {}
+        if self._useCache and not DISABLE_CMAP:
+            _cmapTables[name] = dict([(a,getattr(self,a)) for a in ('_mapFileHash',
+                    '_codeSpaceRanges', '_notDefRanges', '_cidRanges', '_sources',
+                    '_cidTable', '_notDefTable', 'source', '_singleByteCodes', '_cidCache')])
+
     def parseCMAPFile(self, name):
         """This is a tricky one as CMAP files are Postscript
         ones.  Some refer to others with a 'usecmap'
@@ -103,6 +167,8 @@ class CIDEncoding(pdfmetrics.Encoding):
         cmapfile = findCMapFile(name)
         # this will CRAWL with the unicode encodings...
         rawdata = open(cmapfile, 'r').read()
+        st = os.stat(cmapfile)
+        self._sources.append((cmapfile, st.st_size, st.st_mtime))
 
         self._mapFileHash = self._hash(rawdata)
         #if it contains the token 'usecmap', parse the other
@@ -148,81 +214,140 @@ class CIDEncoding(pdfmetrics.Encoding):
                     value = int(strValue)
                     # this means that 'start' corresponds to 'value',
                     # start+1 corresponds to value+1 and so on up
-                    # to end
-                    offset = 0
-                    while start + offset <= end:
-                        self._cmap[start + offset] = value + offset
-                        offset = offset + 1
+                    # to end; we keep the offset value-start which
+                    # holds for every code in the range
+                    self._cidRanges.append((start, end, value - start),)
                     words = words[3:]
 
             else:
                 words = words[1:]
+        self._cidTable = _rangeTable(self._cidRanges)
+        self._notDefTable = _rangeTable(self._notDefRanges)
         #finished = time.clock()
         #print 'parsed CMAP %s in %0.4f seconds' % (self.name, finished - started)
 
+    def _lookup(self, num):
+        "return the CID of code num"
+        starts, ends, offsets = self._cidTable
+        i = bisect_right(starts, num)
+        if i and num <= ends[i-1]:
+            return num + offsets[i-1]
+        #not defined.  Try to find the appropriate
+        # notdef character, or failing that return
+        # zero
+        starts, ends, notdefs = self._notDefTable
+        i = bisect_right(starts, num)
+        if i and num <= ends[i-1]:
+            return notdefs[i-1]
+        return 0
+
     def translate(self, text):
         "Convert a string into a list of CIDs"
-        output = []
-        cmap = self._cmap
-        lastChar = ''
-        for char in text:
-            if lastChar != '':
-                #print 'convert character pair "%s"' % (lastChar + char)
-                num = ord(lastChar) * 256 + ord(char)
-            else:
-                #print 'convert character "%s"' % char
-                num = ord(char)
-            lastChar = char
-            found = 0
-            for low, high in self._codeSpaceRanges:
-                if low < num < high:
-                    try:
-                        cid = cmap[num]
-                        #print '%d -> %d' % (num, cid)
-                    except KeyError:
-                        #not defined.  Try to find the appropriate
-                        # notdef character, or failing that return
-                        # zero
-                        cid = 0
-                        for low2, high2, notdef in self._notDefRanges:
-                            if low2 < num < high2:
-                                cid = notdef
-                                break
-                    output.append(cid)
-                    found = 1
-                    break
-            if found:
-                lastChar = ''
+        if self._cidTable is None: self._load()
+        #first split text into codes
+        codes = []
+        lastNum = None
+        singleByteCodes = self._singleByteCodes
+        codeSpaceRanges = self._codeSpaceRanges
+        for byte in map(ord, text):
+            if lastNum is None:
+                if byte in singleByteCodes:
+                    codes.append(byte)
+                else:
+                    lastNum = byte
             else:
-                lastChar = char
+                num = lastNum * 256 + byte
+                for low, high in codeSpaceRanges:
+                    if low <= num <= high:
+                        codes.append(num)
+                        lastNum = None
+                        break
+                else:
+                    lastNum = byte
+
+        #then look them all up at once; only codes we haven't met
+        #before need a search of the ranges
+        cidCache = self._cidCache
+        output = map(cidCache.get, codes)
+        if None in output:
+            lookup = self._lookup
+            for i in xrange(len(output)):
+                if output[i] is None:
+                    num = codes[i]
+                    output[i] = cidCache[num] = lookup(num)
         return output
 
     def fastSave(self, directory):
-        f = open(os.path.join(directory, self.name + '.fastmap'), 'wb')
-        marshal.dump(self._mapFileHash, f)
-        marshal.dump(self._codeSpaceRanges, f)
-        marshal.dump(self._notDefRanges, f)
-        marshal.dump(self._cmap, f)
-        f.close()
+        '''save our parsed tables in directory; the file is written under
+        another name and then renamed so other processes never see it
+        incomplete'''
+        fn = os.path.join(directory, self.name + '.fastcmap')
+        tfn = '%s.%d' % (fn,os.getpid())
+        try:
+            f = open(tfn, 'wb')
+            try:
+                marshal.dump((_cmapCacheVersion, sys.byteorder, self._sources), f)
+                marshal.dump(self._mapFileHash, f)
+                marshal.dump(self._codeSpaceRanges, f)
+                marshal.dump(self._notDefRanges, f)
+                marshal.dump(self._cidRanges, f)
+                marshal.dump([a.tostring() for a in self._cidTable+self._notDefTable], f)
+            finally:
+                f.close()
+            if os.path.exists(fn): os.remove(fn)
+            os.rename(tfn, fn)
+        except:
+            try:
+                os.remove(tfn)
+            except:
+                pass
 
     def fastLoad(self, directory):
-        started = time.clock()
-        f = open(os.path.join(directory, self.name + '.fastmap'), 'rb')
-        self._mapFileHash = marshal.load(f)
-        self._codeSpaceRanges = marshal.load(f)
-        self._notDefRanges = marshal.load(f)
-        self._cmap = marshal.load(f)
-        f.close()
-        finished = time.clock()
-        #print 'loaded %s in %0.4f seconds' % (self.name, finished - started)
+        '''load the tables fastSave wrote in directory; return true if they
+        could be used ie the CMAP files they came from haven't changed'''
+        try:
+            f = open(os.path.join(directory, self.name + '.fastcmap'), 'rb')
+            try:
+                version, byteorder, sources = marshal.load(f)
+                if version!=_cmapCacheVersion or byteorder!=sys.byteorder: return 0
+                for fn, size, mtime in sources:
+                    st = os.stat(fn)
+                    if (st.st_size, st.st_mtime)!=(size, mtime): return 0
+                self._sources = sources
+                self._mapFileHash = marshal.load(f)
+                self._codeSpaceRanges = marshal.load(f)
+                self._notDefRanges = marshal.load(f)
+                self._cidRanges = marshal.load(f)
+                T = []
+                for s in marshal.load(f):
+                    a = array('l')
+                    a.fromstring(s)
+                    T.append(a)
+            finally:
+                f.close()
+        except:
+            return 0
+        self._cidTable = tuple(T[:3])
+        self._notDefTable = tuple(T[3:])
+        return 1
+
+    def getCMap(self):
+        "return a dictionary mapping each code of our cid ranges to its CID"
+        if self._cidTable is None: self._load()
+        cmap = {}
+        for start, end, offset in izip(*self._cidTable):
+            for num in xrange(start, end + 1):
+                cmap[num] = num + offset
+        return cmap
 
     def getData(self):
         """Simple persistence helper.  Return a dict with all that matters."""
+        if self._cidTable is None: self._load()
         return {
             'mapFileHash': self._mapFileHash,
             'codeSpaceRanges': self._codeSpaceRanges,
             'notDefRanges': self._notDefRanges,
-            'cmap': self._cmap,
+            'cmap': self.getCMap(),
             }
 
 class CIDTypeFace(pdfmetrics.TypeFace):
@@ -330,9 +455,8 @@ class CIDFont(pdfmetrics.Font):
             #assume each is 1000 ems high
             return len(cidlist) * size
         else:
-            w = 0
-            for cid in cidlist:
-                w = w + self.face.getCharWidth(cid)
+            face = self.face
+            w = sum(imap(face._explicitWidths.get, cidlist, repeat(face._defaultWidth)))
             return 0.001 * w * size
 
 
@@ -439,25 +563,30 @@ class UnicodeCIDFont(CIDFont):
         if type(text) is type(''):
             text = text.decode('utf8')
 
-        widths = self.unicodeWidths
-        return size * 0.001 * sum([widths.get(uch, 1000) for uch in text])
+        return size * 0.001 * sum(imap(self.unicodeWidths.get, text, repeat(1000)))
         #return CIDFont.stringWidth(self, text, size, encoding)
 
 
-def precalculate(cmapdir):
-    # crunches through all, making 'fastmap' files
-    import os
-    files = os.listdir(cmapdir)
-    for file in files:
-        if os.path.isfile(cmapdir + os.sep + self.name + '.fastmap'):
-            continue
-        try:
-            enc = CIDEncoding(file)
-        except:
-            print 'cannot parse %s, skipping' % enc
-            continue
-        enc.fastSave(cmapdir)
-        print 'saved %s.fastmap' % file
+def precalculate(cmapdir=None):
+    """parse the CMAP files in cmapdir (one of the directories of
+    rl_config.CMapSearchPath, default all of them) and save their tables where CIDEncoding
+    looks for them.  Running this once after installation means no
+    process need parse a CMAP file"""
+    from reportlab.lib.utils import get_rl_tempdir
+    fontmapdir = get_rl_tempdir('FastCMAPS')
+    dirs = cmapdir and [cmapdir] or rl_config.CMapSearchPath
+    for d in dirs:
+        if not os.path.isdir(d): continue
+        for name in os.listdir(d):
+            if not os.path.isfile(os.path.join(d, name)): continue
+            enc = CIDEncoding(name)
+            try:
+                enc.parseCMAPFile(name)
+            except:
+                print 'cannot parse %s, skipping' % name
+                continue
+            enc.fastSave(fontmapdir)
+            print 'saved %s.fastcmap' % name
 
 def test():
     # only works if you have cirrect encodings on your box!
@@ -14,12 +14,16 @@ The classes within this generally mirror structures in the PDF file
 and are not part of any public interface.  Instead, canvas and font
 classes are made available elsewhere for users to manipulate.
 """
-import string, types, binascii, codecs
+import string, types, binascii, codecs, struct, imp
 from reportlab.pdfbase import pdfutils
 from reportlab.pdfbase.pdfutils import LINEEND # this constant needed in both
 from reportlab import rl_config
 from reportlab.lib.utils import import_zlib, open_for_read, fp_str, _digester
 from reportlab.pdfbase import pdfmetrics
+try:
+    from multiprocessing.pool import ThreadPool
+except ImportError:
+    ThreadPool = None
 try:
     from hashlib import md5
 except ImportError:
@@ -85,6 +89,7 @@ LINEENDDICT = {"LINEEND": LINEEND, "PERCENT": "%"}
 PDF_VERSION_DEFAULT = (1, 3)
 PDF_SUPPORT_VERSION = dict(     #map keyword to min version that supports it
     transparency = (1, 4),
+    aes = (1, 6),
     )
 
 from types import InstanceType
@@ -146,6 +151,7 @@ class PDFDocument:
     defaultStreamFilters = None
     encrypt = NoEncryption() # default no encryption
     pageCounter = 1
+    _streamFile = None  # set by setStreamOutput
     def __init__(self,
                  dummyoutline=0,
                  compression=rl_config.pageCompression,
@@ -177,6 +183,9 @@ class PDFDocument:
         self.idToOffset = {}
         # number to id
         self.numberToId = {}
+        # (image source digest, mask) to image XObject name
+        self.imageRegistry = {}
+        self.formCache = {}     #see Canvas.drawCachedForm
         cat = self.Catalog = self._catalog = PDFCatalog()
         pages = self.Pages = PDFPages()
         cat.Pages = pages
@@ -196,6 +205,8 @@ class PDFDocument:
         DD.__Comment__ = "The standard fonts dictionary"
         self.Reference(DD, BasicFonts)
         self.delayedFonts = []
+        #finished objects waiting for the next page boundary (streaming only)
+        self._flushPending = []
 
     def setCompression(self, onoff):
         # XXX: maybe this should also set self.defaultStreamFilters?
@@ -224,6 +235,9 @@ class PDFDocument:
         return self._ID
 
     def SaveToFile(self, filename, canvas):
+        if self._streamFile is not None:
+            self._saveStream(filename, canvas)
+            return
         if hasattr(getattr(filename, "write",None),'__call__'):
             myfile = 0
             f = filename
@@ -242,6 +256,12 @@ class PDFDocument:
         if getattr(canvas,'_verbosity',None): print 'saved', filename
 
     def GetPDFData(self, canvas):
+        if self._streamFile is not None:
+            raise PDFError("document is being streamed to a file, use SaveToFile")
+        self._prepareToFormat(canvas)
+        return self.format()
+
+    def _prepareToFormat(self, canvas):
         # realize delayed fonts
         for fnt in self.delayedFonts:
             fnt.addObjects(self)
@@ -254,7 +274,84 @@ class PDFDocument:
         self.Reference(self.info)
         outline = self.outline
         outline.prepare(self, canvas)
-        return self.format()
+
+    def setStreamOutput(self, filename, spool=0):
+        """Write finished objects to filename (a path or a file-like object) as
+        soon as they are flushed rather than holding everything until save time.
+        With spool set the objects go to a temporary file which SaveToFile
+        copies to its destination; that suits builds which may be abandoned
+        (eg the early passes of a multiBuild)."""
+        if spool:
+            import tempfile
+            f = tempfile.TemporaryFile()
+            myfile = 1
+        elif hasattr(getattr(filename, "write",None),'__call__'):
+            f = filename
+            myfile = 0
+        else:
+            f = open(utf8str(filename), "wb")
+            myfile = 1
+        self._streamFile = PDFStreamFile(f, self._pdfVersion)
+        self._streamMode = myfile, spool
+
+    def _canFlush(self):
+        #encrypted output keys every object on the document ID, which isn't
+        #final until save time, so those documents stay in memory
+        return self._streamFile is not None and isinstance(self.encrypt,NoEncryption)
+
+    def flushObject(self, object):
+        """when streaming, write a finished object to the output file now and
+        release it; returns a reference to the object"""
+        ref = self.Reference(object)
+        if self._canFlush():
+            name = ref.name
+            if name not in self.idToOffset:
+                self._addIndirectObject(self._streamFile, name, object)
+                self.idToObject[name] = PDFFlushedObject(name, object)
+        return ref
+
+    def flushAtPageEnd(self, object):
+        "queue a finished object to be flushed when the current page is flushed"
+        if self._canFlush():
+            self._flushPending.append(object)
+
+    def flushPage(self, page):
+        """when streaming, write the content stream of a finished page and any
+        queued objects; the page dictionary itself stays in memory as it may
+        still acquire late references (annotation destinations, forms etc)"""
+        if not self._canFlush(): return
+        page.check_format(self)
+        if isinstance(page.Contents, PDFStream):
+            page.Contents = self.flushObject(page.Contents)
+            page.stream = None
+        pending = self._flushPending
+        while pending:
+            self.flushObject(pending.pop(0))
+
+    def _saveStream(self, filename, canvas):
+        self._prepareToFormat(canvas)
+        self.format()
+        File = self._streamFile
+        f = File.file
+        myfile, spool = self._streamMode
+        if spool:
+            import shutil
+            f.seek(0)
+            if hasattr(getattr(filename, "write",None),'__call__'):
+                shutil.copyfileobj(f, filename)
+            else:
+                filename = utf8str(filename)
+                out = open(filename, "wb")
+                try:
+                    shutil.copyfileobj(f, out)
+                finally:
+                    out.close()
+        if myfile:
+            f.close()
+        else:
+            f.flush()
+        self._streamFile = None
+        if getattr(canvas,'_verbosity',None): print 'saved', utf8str(getattr(filename,'name',filename))
 
     def inPage(self):
         """specify the current object as a page (enables reference binding and other page features)"""
@@ -386,7 +483,15 @@ class PDFDocument:
         # (possible infinite loop if there is a bug that continually makes new objects/refs...)
         # Prepare encryption
         self.encrypt.prepare(self)
+        if rl_config.pdfStreamThreads:
+            self._encodeStreams(rl_config.pdfStreamThreads)
         cat = self.Catalog
+        File = self._streamFile
+        if File is None:
+            File = PDFFile(self._pdfVersion) # output collector
+        elif self._pdfVersion>File.pdfVersion:
+            #the header went out before the version was raised
+            cat.Version = PDFName("%s.%s" % self._pdfVersion)
         info = self.info
         self.Reference(self.Catalog)
         self.Reference(self.info)
@@ -404,26 +509,12 @@ class PDFDocument:
         idToOf = self.idToOffset
         ### note that new entries may be "appended" DURING FORMATTING
         done = None
-        File = PDFFile(self._pdfVersion) # output collector
         while done is None:
             counter += 1 # do next object...
             if counter in numbertoid:
                 id = numbertoid[counter]
-                #printidToOb
-                obj = idToOb[id]
-                IO = PDFIndirectObject(id, obj)
-                # register object number and version
-                #encrypt.register(id,
-                IOf = IO.format(self)
-                # add a comment to the PDF output
-                if not rl_config.invariant and DoComments:
-                    try:
-                        classname = obj.__class__.__name__
-                    except:
-                        classname = repr(obj)
-                    File.add("%% %s: class %s %s" % (repr(id), classname[:50], LINEEND))
-                offset = File.add(IOf)
-                idToOf[id] = offset
+                if id not in idToOf:    #may have been streamed already
+                    self._addIndirectObject(File, id, idToOb[id])
                 ids.append(id)
             else:
                 done = 1
@@ -450,6 +541,45 @@ class PDFDocument:
         # return string format for pdf file
         return File.format(self)
 
+    def _encodeStreams(self, threads):
+        """apply the filters of all the streams waiting to be written using a
+        pool of threads; zlib releases the GIL so compression can use several
+        cpus. PDFStream.format picks up the results."""
+        S = []
+        for obj in self.idToObject.values():
+            if isinstance(obj,PDFPage):
+                #make the page content stream now
+                obj.check_format(self)
+                obj = obj.Contents
+            if isinstance(obj,PDFStream) and obj.content is not None:
+                filters = obj._filters(self)
+                if filters: S.append((obj,filters))
+        #the filters import things so the threads would wait forever if we
+        #are being run by an import
+        if len(S)<2 or ThreadPool is None or imp.lock_held(): return
+        pool = ThreadPool(min(threads,len(S)))
+        try:
+            E = pool.map(lambda (obj,filters): obj._encode(filters),S)
+        finally:
+            #don't leave threads behind to upset later forks
+            pool.close()
+            pool.join()
+        for (obj,filters),e in zip(S,E):
+            obj._encoded = obj.content, filters, e
+
+    def _addIndirectObject(self, File, id, obj):
+        "format obj as indirect object id and add it to File recording its offset"
+        IO = PDFIndirectObject(id, obj)
+        IOf = IO.format(self)
+        # add a comment to the PDF output
+        if not rl_config.invariant and DoComments:
+            try:
+                classname = obj.__class__.__name__
+            except:
+                classname = repr(obj)
+            File.add("%% %s: class %s %s" % (repr(id), classname[:50], LINEEND))
+        self.idToOffset[id] = File.add(IOf)
+
     def hasForm(self, name):
         """test for existence of named form"""
         internalname = xObjectName(name)
@@ -629,7 +759,7 @@ class PDFString:
     def __str__(self):
         return "(%s)" % pdfutils._escape(self.s)
 
-def PDFName(data,lo=chr(0x21),hi=chr(0x7e)):
+def _py_PDFName(data,lo=chr(0x21),hi=chr(0x7e)):
     # might need to change this to class for encryption
     #  NOTE: RESULT MUST ALWAYS SUPPORT MEANINGFUL COMPARISONS (EQUALITY) AND HASH
     # first convert the name
@@ -639,6 +769,14 @@ def PDFName(data,lo=chr(0x21),hi=chr(0x7e)):
             L[i] = "#"+hex(ord(c))[2:] # forget the 0x thing...
     return "/"+(''.join(L))
 
+try:
+    from _rl_accel import pdfName as PDFName
+except ImportError:
+    try:
+        from reportlab.lib._rl_accel import pdfName as PDFName
+    except ImportError:
+        PDFName = _py_PDFName
+
 class PDFDictionary:
     __PDFObject__ = True
     multiline = LongFormat
@@ -729,7 +867,7 @@ class PDFStreamFilterZCompress:
         from reportlab.lib.utils import import_zlib
         zlib = import_zlib()
         if not zlib: raise ImportError, "cannot z-compress zlib unavailable"
-        return zlib.compress(text)
+        return zlib.compress(text,rl_config.zlibCompressionLevel)
     def decode(self, encoded):
         from reportlab.lib.utils import import_zlib
         zlib = import_zlib()
@@ -771,31 +909,40 @@ class PDFStream:
         self.dictionary = dictionary
         self.content = content
         self.filters = filters
+    def _filters(self, document):
+        "the filters still to be applied to the content or None"
+        filters = self.filters
+        if filters is None:
+            filters = document.defaultStreamFilters
+        # only apply filters if they haven't been applied elsewhere
+        if filters is not None and "Filter" not in self.dictionary.dict:
+            return list(filters)
+
+    def _encode(self, filters):
+        "return the content with the filters applied in reverse order listed"
+        content = self.content
+        rf = filters[:]
+        rf.reverse()
+        for f in rf:
+            content = f.encode(content)
+        return content
+
     def format(self, document):
         dictionary = self.dictionary
         # copy it for modification
         dictionary = PDFDictionary(dictionary.dict.copy())
         content = self.content
-        filters = self.filters
         if self.content is None:
             raise ValueError, "stream content not set"
-        if filters is None:
-            filters = document.defaultStreamFilters
-        # only apply filters if they haven't been applied elsewhere
-        if filters is not None and "Filter" not in dictionary.dict:
-            # apply filters in reverse order listed
-            rf = list(filters)
-            rf.reverse()
-            fnames = []
-            for f in rf:
-                #print "*****************content:"; print repr(content[:200])
-                #print "*****************filter", f.pdfname
-                content = f.encode(content)
-                fnames.insert(0, PDFName(f.pdfname))
-            #print "*****************finally:"; print content[:200]
-            #print "****** FILTERS", fnames
-            #stop
-            dictionary["Filter"] = PDFArray(fnames)
+        filters = self._filters(document)
+        if filters is not None:
+            # the document may have done this already
+            encoded = self.__dict__.pop('_encoded',None)
+            if encoded and encoded[0] is content and encoded[1]==filters:
+                content = encoded[2]
+            else:
+                content = self._encode(filters)
+            dictionary["Filter"] = PDFArray([PDFName(f.pdfname) for f in filters])
         # "stream encoding is done after all filters have been applied"
         content = document.encrypt.encode(content)
         fc = format(content, document)
@@ -884,6 +1031,20 @@ class PDFObjectReference:
         except:
             raise KeyError, "forward reference to %s not resolved upon final formatting" % repr(self.name)
 
+# the accelerated format does dictionaries, arrays and references itself
+# and uses the python version above for everything else
+try:
+    from _rl_accel import pdfFormat as _pdfFormat, _setPDFFormat
+except ImportError:
+    try:
+        from reportlab.lib._rl_accel import pdfFormat as _pdfFormat, _setPDFFormat
+    except ImportError:
+        _pdfFormat = None
+_pyFormat = format
+if _pdfFormat:
+    _setPDFFormat(_pyFormat,PDFDictionary,PDFArray,PDFArrayCompact,PDFObjectReference,LINEEND)
+    format = _pdfFormat
+
 ### chapter 5
 # Following Ken Lunde's advice and the PDF spec, this includes
 # some high-order bytes.  I chose the characters for Tokyo
@@ -901,6 +1062,7 @@ class PDFFile:
         self.strings = []
         self.write = self.strings.append
         self.offset = 0
+        self.pdfVersion = pdfVersion
         self.add(PDFHeader % pdfVersion)
 
     def closeOrReset(self):
@@ -916,6 +1078,30 @@ class PDFFile:
         strings = map(str, self.strings) # final conversion, in case of lazy objects
         return string.join(strings, "")
 
+class PDFStreamFile(PDFFile):
+    ### writes strings straight to a file as they are added: keeps only the offset
+    def __init__(self,file,pdfVersion=PDF_VERSION_DEFAULT):
+        self.file = file
+        self.write = file.write
+        self.offset = 0
+        self.pdfVersion = pdfVersion
+        self.add(PDFHeader % pdfVersion)
+
+    def format(self, document):
+        # everything has been written already
+        return ''
+
+class PDFFlushedObject:
+    """stands in for an indirect object that has been written to a streamed
+    document; it keeps just the size of images so they can be reused"""
+    __PDFObject__ = True
+    def __init__(self, name, object):
+        self.__InternalName__ = name
+        self.width = getattr(object,'width',None)
+        self.height = getattr(object,'height',None)
+    def format(self, document):
+        raise PDFError("object %r has already been written" % self.__InternalName__)
+
 XREFFMT = '%0.10d %0.5d n'
 
 class PDFCrossReferenceSubsection:
@@ -1020,7 +1206,7 @@ class PDFCatalog:
                 }
     __NoDefault__ = string.split("""
         Dests Outlines Pages Threads AcroForm Names OpenActions PageMode URI
-        ViewerPreferences PageLabels PageLayout JavaScript StructTreeRoot SpiderInfo"""
+        ViewerPreferences PageLabels PageLayout JavaScript StructTreeRoot SpiderInfo Version"""
                                  )
     __Refs__ = __NoDefault__ # make these all into references, if present
 
@@ -1985,9 +2171,10 @@ class PDFFormXObject:
     # XXXX any resource used in a form must be propagated up to the page that (recursively) uses
     #   the form!! (not implemented yet).
     __PDFObject__ = True
-    XObjects = Annots = BBox = Matrix = Contents = stream = Resources = None
+    XObjects = Annots = BBox = Matrix = Contents = stream = Resources = ExtGState = None
     hasImages = 1 # probably should change
     compression = 0
+    _colorsUsed = {}
     def __init__(self, lowerx, lowery, upperx, uppery):
         #not done
         self.lowerx = lowerx; self.lowery=lowery; self.upperx=upperx; self.uppery=uppery
@@ -2033,6 +2220,9 @@ class PDFFormXObject:
             if self.XObjects:
                 #print "XObjects", self.XObjects.dict
                 resources.XObject = self.XObjects
+            if self.ExtGState:
+                resources.ExtGState = self.ExtGState
+            resources.setColorSpace(self._colorsUsed)
             self.Resources=resources
         if self.compression:
             self.Contents.filters = rl_config.useA85 and [PDFBase85Encode, PDFZCompress] or [PDFZCompress]
@@ -2092,11 +2282,9 @@ class PDFImageXObject:
             import os
             ext = string.lower(os.path.splitext(source)[1])
             src = open_for_read(source)
-            if not(ext in ('.jpg', '.jpeg') and self.loadImageFromJPEG(src)):
-                if rl_config.useA85:
-                    self.loadImageFromA85(src)
-                else:
-                    self.loadImageFromRaw(src)
+            if not(ext in ('.jpg', '.jpeg') and self.loadImageFromJPEG(src) or self.loadImageFromPNG(src)):
+                #image streams are binary so we never ASCII85 encode them
+                self.loadImageFromRaw(src)
 
     def loadImageFromA85(self,source):
         IMG=[]
@@ -2128,14 +2316,64 @@ class PDFImageXObject:
             self.colorSpace = 'DeviceCMYK'
             self._dotrans = 1
         self.streamContent = imageFile.read()
-        if rl_config.useA85:
-            self.streamContent = pdfutils._AsciiBase85Encode(self.streamContent)
-            self._filters = 'ASCII85Decode','DCTDecode' #'A85','DCT'
-        else:
-            self._filters = 'DCTDecode', #'DCT'
+        self._filters = 'DCTDecode', #'DCT'
         self.mask = None
         return True
 
+    def loadImageFromPNG(self,imageFile):
+        '''copy the compressed data of a PNG straight into the stream using
+        PNG predictors; returns False if the image must be decoded (interlaced,
+        16 bit, alpha channel or partially transparent palette images)'''
+        try:
+            try:
+                info = pdfutils.readPNGInfo(imageFile)
+            finally:
+                imageFile.seek(0)
+        except:
+            return False
+        if not info or info['interlace'] or info['bitDepth']>8: return False
+        colorType = info['colorType']
+        mask = self.mask
+        trns = mask=='auto' and info['trns'] or None
+        if colorType==3:
+            palette = info['palette']
+            if not palette: return False
+            if trns:
+                #a single fully transparent palette entry can be a colour key mask
+                T = [i for i,a in enumerate(map(ord,trns)) if a!=255]
+                if len(T)!=1 or trns[T[0]]!='\0': return False
+                mask = T[0], T[0]
+            elif mask not in (None,'auto'):
+                return False    #colour masks don't apply to palette indices
+            colors = 1
+            colorSpace = PDFArray([PDFName('Indexed'),PDFName('DeviceRGB'),len(palette)//3-1,PDFText(palette)])
+        elif colorType in (0,2):
+            colors = colorType and 3 or 1
+            if trns:
+                if len(trns)<2*colors: return False
+                mask = []
+                for v in struct.unpack('>%dH' % colors,trns[:2*colors]):
+                    mask += [v,v]
+            elif mask not in (None,'auto'):
+                #colour key masks are given as rgb ranges
+                if hasattr(mask,'rgb') or info['bitDepth']!=8 or len(mask)!=6: return False
+                if colors==1:
+                    #a gray v is masked if it's in all three ranges
+                    lo, hi = max(mask[0::2]), min(mask[1::2])
+                    mask = lo<=hi and [lo,hi] or None
+            colorSpace = colors==3 and 'DeviceRGB' or 'DeviceGray'
+        else:
+            return False    #the alpha channel has to be split out
+        self.width, self.height = info['width'], info['height']
+        self.bitsPerComponent = info['bitDepth']
+        self.colorSpace = colorSpace
+        self.mask = mask!='auto' and mask or None
+        self._decodeParms = PDFDictionary(dict(Predictor=15,Colors=colors,
+                        BitsPerComponent=self.bitsPerComponent,Columns=self.width))
+        self._filters = 'FlateDecode', #'Fl'
+        self.streamContent = info['idat']
+        return True
+
     def loadImageFromRaw(self,source):
         IMG=[]
         imagedata = pdfutils.makeRawImage(source,IMG=IMG)
@@ -2170,17 +2408,15 @@ class PDFImageXObject:
         if fp:
             self.loadImageFromJPEG(fp)
         else:
+            fp = im.png_fh()
+            if fp and self.loadImageFromPNG(fp): return
             zlib = import_zlib()
             if not zlib: return
             self.width, self.height = im.getSize()
             raw = im.getRGBData()
             #assert len(raw) == self.width*self.height, "Wrong amount of data for image expected %sx%s=%s got %s" % (self.width,self.height,self.width*self.height,len(raw))
             self.streamContent = zlib.compress(raw)
-            if rl_config.useA85:
-                self.streamContent = pdfutils._AsciiBase85Encode(self.streamContent)
-                self._filters = 'ASCII85Decode','FlateDecode' #'A85','Fl'
-            else:
-                self._filters = 'FlateDecode', #'Fl'
+            self._filters = 'FlateDecode', #'Fl'
             self.colorSpace= _mode2CS[im.mode]
             self.bitsPerComponent = 8
             self._checkTransparency(im)
@@ -2193,12 +2429,14 @@ class PDFImageXObject:
         dict["Width"] = self.width
         dict["Height"] = self.height
         dict["BitsPerComponent"] = self.bitsPerComponent
-        dict["ColorSpace"] = PDFName(self.colorSpace)
+        cs = self.colorSpace
+        dict["ColorSpace"] = isinstance(cs,str) and PDFName(cs) or cs
         if self.colorSpace=='DeviceCMYK' and getattr(self,'_dotrans',0):
             dict["Decode"] = PDFArray([1,0,1,0,1,0,1,0])
         elif getattr(self,'_decode',None):
             dict["Decode"] = PDFArray(self._decode)
         dict["Filter"] = PDFArray(map(PDFName,self._filters))
+        if getattr(self,'_decodeParms',None): dict["DecodeParms"] = self._decodeParms
         dict["Length"] = len(self.streamContent)
         if self.mask: dict["Mask"] = PDFArray(self.mask)
         if getattr(self,'smask',None): dict["SMask"] = self.smask
@@ -22,8 +22,9 @@ import string, os, sys
 from types import StringType, ListType, TupleType
 from reportlab.pdfbase import _fontdata
 from reportlab.lib.logger import warnOnce
-from reportlab.lib.utils import rl_isfile, rl_glob, rl_isdir, open_and_read, open_and_readlines, findInPaths
+from reportlab.lib.utils import rl_isfile, rl_glob, rl_isdir, open_and_read, open_and_readlines, findInPaths, LRUCache
 from reportlab.rl_config import defaultEncoding, T1SearchPath
+from reportlab import rl_config
 import rl_codecs
 _notdefChar = chr(110)
 
@@ -34,6 +35,7 @@ standardEncodings = _fontdata.standardEncodings
 _typefaces = {}
 _encodings = {}
 _fonts = {}
+_widthCaches = {}   #fontName --> LRUCache of text widths at 1 point
 
 def _py_unicode2T1(utext,fonts):
     '''return a list of (font,string) pairs representing the unicode text'''
@@ -618,6 +620,7 @@ def registerFont(font):
     #assert isinstance(font, Font), 'Not a Font: %s' % font
     fontName = font.fontName
     _fonts[fontName] = font
+    _widthCaches.pop(fontName,None)
     if font._multiByte:
         # CID fonts don't need to have typeface registered.
         #need to set mappings so it can go in a paragraph even if within
@@ -719,8 +722,30 @@ def getRegisteredFontNames():
 
 def stringWidth(text, fontName, fontSize, encoding='utf8'):
     """Compute width of string in points;
-    not accelerated as fast enough because of _instanceStringWidthU"""
-    return getFont(fontName).stringWidth(text, fontSize, encoding=encoding)
+    the 1 point widths of (fontName, text) are remembered in a bounded
+    cache per font (see rl_config.stringWidthCacheSize and stringWidthCacheInfo)"""
+    try:
+        cache = _widthCaches[fontName]
+    except KeyError:
+        if not rl_config.stringWidthCacheSize:
+            return getFont(fontName).stringWidth(text, fontSize, encoding=encoding)
+        cache = _widthCaches[fontName] = LRUCache(rl_config.stringWidthCacheSize)
+    if encoding!='utf8' and not isinstance(text,unicode):
+        #the key doesn't say how to decode text
+        return getFont(fontName).stringWidth(text, fontSize, encoding=encoding)
+    w = cache.get(text)
+    if w is None:
+        w = cache[text] = getFont(fontName).stringWidth(text, 1, encoding=encoding)
+    return w*fontSize
+
+def stringWidthCacheInfo():
+    """return the stringWidth cache hits, misses and size summed over the fonts"""
+    hits = misses = size = 0
+    for cache in _widthCaches.itervalues():
+        hits += cache.hits
+        misses += cache.misses
+        size += len(cache)
+    return hits, misses, size
 
 try:
     from _rl_accel import _instanceStringWidthU
@@ -806,6 +831,7 @@ def _reset(
             _typefaces = _typefaces.copy(),
             _encodings = _encodings.copy(),
             _fonts = _fonts.copy(),
+            _widthCaches = {},
             )
         ):
     for k,v in initial_dicts.iteritems():
@@ -448,6 +448,44 @@ def readJPEGInfo(image):
                 x = struct.unpack('BB', image.read(2))
                 image.seek( (x[0] << 8) + x[1] - 2, 1)
 
+_pngSignature = '\x89PNG\r\n\x1a\n'
+def readPNGInfo(image):
+    """Read the header, palette, transparency and concatenated image data
+    chunks of an open PNG file; returns None if it isn't a PNG.
+    The result is a dict with keys width, height, bitDepth, colorType,
+    interlace, palette, trns and idat."""
+
+    import struct
+    from pdfdoc import PDFError
+
+    if image.read(8)!=_pngSignature: return None
+    info = dict(palette=None,trns=None)
+    idat = []
+    while 1:
+        head = image.read(8)
+        if len(head)!=8:
+            raise PDFError('PNG file is truncated')
+        n, kind = struct.unpack('>L4s',head)
+        data = image.read(n)
+        if len(data)!=n:
+            raise PDFError('PNG %s chunk is truncated' % kind)
+        image.seek(4,1)     #skip the crc
+        if kind=='IHDR':
+            (info['width'], info['height'], info['bitDepth'], info['colorType'],
+                compression, filter, info['interlace']) = struct.unpack('>LLBBBBB',data)
+        elif kind=='PLTE':
+            info['palette'] = data
+        elif kind=='tRNS':
+            info['trns'] = data
+        elif kind=='IDAT':
+            idat.append(data)
+        elif kind=='IEND':
+            break
+    if 'width' not in info:
+        raise PDFError('PNG has no IHDR chunk')
+    info['idat'] = ''.join(idat)
+    return info
+
 class _fusc:
     def __init__(self,k, n):
         assert k, 'Argument k should be a non empty string'
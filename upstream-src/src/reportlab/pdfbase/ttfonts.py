@@ -51,7 +51,7 @@ Oh, and that 14 up there is font size.)
 Canvas and TextObject have special support for dynamic fonts.
 """
 
-import string
+import string, os, marshal
 from struct import pack, unpack, error as structError
 from reportlab.lib.utils import getStringIO
 from reportlab.pdfbase import pdfmetrics, pdfdoc
@@ -142,6 +142,11 @@ del _rl_accel
 # TrueType font handling
 #
 
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 GF_ARG_1_AND_2_ARE_WORDS        = 1 << 0
 GF_ARGS_ARE_XY_VALUES           = 1 << 1
 GF_ROUND_XY_TO_GRID             = 1 << 2
@@ -174,6 +179,20 @@ def TTFOpenFile(fn):
                     return tfn, f
         raise TTFError('Can\'t open file "%s"' % fn)
 
+def _mmapFile(f):
+    '''return a read only mmap of the real file f or None'''
+    if mmap:
+        try:
+            return mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        except:
+            pass
+
+#TTFontFile.makeSubset remembers its last _subsetCacheSize results
+_subsetCacheSize = 16
+
+#bump this when the attributes set by TTFontFile.extractInfo change
+_infoCacheVersion = 1
+
 class TTFontParser:
     "Basic TTF file parser"
     ttfVersions = (0x00010000,0x74727565,0x74746366)
@@ -262,7 +281,7 @@ class TTFontParser:
         else:
             self.filename, f = TTFOpenFile(f)
 
-        self._ttf_data = f.read()
+        self._ttf_data = _mmapFile(f) or f.read()
         self._pos = 0
 
     def checksumTables(self):
@@ -279,7 +298,7 @@ class TTFontParser:
 
     def checksumFile(self):
         # Check the checksums for the whole file
-        checksum = calcChecksum(self._ttf_data)
+        checksum = calcChecksum(self._ttf_data[:])
         if 0xB1B0AFBAL!=checksum:
             raise TTFError('TTF file "%s": invalid checksum %s (expected 0xB1B0AFBA) len: %d &3: %d' % (self.filename,hex32(checksum),len(self._ttf_data),(len(self._ttf_data)&3)))
 
@@ -387,10 +406,10 @@ class TTFontMaker:
             paddedLength = (len(data)+3)&~3
             offset = offset + paddedLength
 
-        # Table data
+        # Table data; padded without copying the (possibly large) tables
         for tag, data in tables:
-            data += "\0\0\0"
-            write(data[:len(data)&~3])
+            write(data)
+            write("\0"*(-len(data)&3))
 
         checksum = calcChecksum(stm.getvalue())
         checksum = add32(0xB1B0AFBAL, -checksum)
@@ -410,7 +429,61 @@ class TTFontFile(TTFontParser):
         the font is large.  See TTFontFile.extractInfo for more information.
         """
         TTFontParser.__init__(self, file, validate=validate,subfontIndex=subfontIndex)
-        self.extractInfo(charInfo)
+        fn = not validate and self._infoCacheFile(charInfo,subfontIndex)
+        if not (fn and self._loadInfo(fn)):
+            self.extractInfo(charInfo)
+            if fn: self._saveInfo(fn)
+
+    _infoAttrs = ('name', 'familyName', 'styleName', 'fullName', 'uniqueFontID',
+            'fontRevision', 'unitsPerEm', 'bbox', 'ascent', 'descent', 'capHeight',
+            'stemV', 'italicAngle', 'underlinePosition', 'underlineThickness', 'flags',
+            'charToGlyph', 'defaultWidth', 'charWidths', 'hmetrics', 'glyphPos')
+
+    def _infoCacheFile(self, charInfo, subfontIndex):
+        '''return the rl_config.ttfInfoCaching file for our extractInfo
+        results or None.  The file name depends on our file's path, size and
+        modification time so a changed font file is parsed again.'''
+        if not rl_config.ttfInfoCaching or self.filename=='(ttf)': return None
+        try:
+            fn = os.path.abspath(self.filename)
+            st = os.stat(fn)
+        except:
+            return None
+        from reportlab.lib.utils import _digester, get_rl_tempdir
+        key = _digester(repr((_infoCacheVersion,fn,st.st_size,st.st_mtime,subfontIndex,charInfo and 1 or 0)))
+        return os.path.join(get_rl_tempdir('TTFInfo'),key+'.ttfinfo')
+
+    def _loadInfo(self, fn):
+        try:
+            f = open(fn,'rb')
+            try:
+                D = marshal.load(f)
+            finally:
+                f.close()
+        except:
+            return 0
+        self.__dict__.update(D)
+        return 1
+
+    def _saveInfo(self, fn):
+        D = {}
+        for a in self._infoAttrs:
+            if a in self.__dict__: D[a] = self.__dict__[a]
+        #write then rename so other processes never see a partial file
+        tfn = '%s.%d' % (fn,os.getpid())
+        try:
+            f = open(tfn,'wb')
+            try:
+                marshal.dump(D,f)
+            finally:
+                f.close()
+            if os.path.exists(fn): os.remove(fn)
+            os.rename(tfn,fn)
+        except:
+            try:
+                os.remove(tfn)
+            except:
+                pass
 
     def extractInfo(self, charInfo=1):
         """
@@ -719,8 +792,74 @@ class TTFontFile(TTFontParser):
 
     # Subsetting
 
+    def _getGlyphData(self, glyph):
+        '''return the data of a glyph in the original font'''
+        glyphPos = self.glyphPos[glyph]
+        glyphLen = self.glyphPos[glyph + 1] - glyphPos
+        if glyphLen:
+            start = self.get_table_pos('glyf')[0] + glyphPos
+            return self._ttf_data[start:start+glyphLen]
+        return ''
+
+    def _getGlyph(self, glyph):
+        '''return the data of a glyph in the original font and a tuple
+        (offset, component glyph, ....) of the component glyph references
+        in data if this is a composite glyph.  The data is sliced from the
+        font each time; only the references are remembered.'''
+        data = self._getGlyphData(glyph)
+        return data, self._getGlyphRefs(glyph, data)
+
+    def _getGlyphRefs(self, glyph, data=None):
+        '''return the component glyph references (offset, component glyph,
+        ....) of a composite glyph or () for a simple one.  They're remembered
+        because the subsets of a font usually share many glyphs.'''
+        try:
+            return self._glyphRefs[glyph]
+        except KeyError:
+            pass
+        except AttributeError:
+            self._glyphRefs = {}
+        if data is None:
+            data = self._getGlyphData(glyph)
+        C = ()
+        if len(data) > 2 and unpack(">h", data[:2])[0] < 0:
+            # composite glyph
+            C = []
+            pos_in_glyph = 10
+            flags = GF_MORE_COMPONENTS
+            while flags & GF_MORE_COMPONENTS:
+                flags, glyphIdx = unpack(">HH", data[pos_in_glyph:pos_in_glyph+4])
+                C.append(pos_in_glyph + 2)
+                C.append(glyphIdx)
+                pos_in_glyph = pos_in_glyph + 4
+                if flags & GF_ARG_1_AND_2_ARE_WORDS:
+                    pos_in_glyph = pos_in_glyph + 4
+                else:
+                    pos_in_glyph = pos_in_glyph + 2
+                if flags & GF_WE_HAVE_A_SCALE:
+                    pos_in_glyph = pos_in_glyph + 2
+                elif flags & GF_WE_HAVE_AN_X_AND_Y_SCALE:
+                    pos_in_glyph = pos_in_glyph + 4
+                elif flags & GF_WE_HAVE_A_TWO_BY_TWO:
+                    pos_in_glyph = pos_in_glyph + 8
+            C = tuple(C)
+        self._glyphRefs[glyph] = C
+        return C
+
     def makeSubset(self, subset):
         """Create a subset of a TrueType font"""
+        #documents made by one process often use the same subsets
+        key = tuple(subset)
+        cache = self.__dict__.setdefault('_subsetCache',{})
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        if len(cache)>=_subsetCacheSize: cache.clear()
+        r = cache[key] = self._makeSubset(subset)
+        return r
+
+    def _makeSubset(self, subset):
         output = TTFontMaker()
 
         # Build a mapping of glyphs in the subset to glyph numbers in
@@ -742,36 +881,14 @@ class TTFontFile(TTFontParser):
             codeToGlyph[code] = glyphSet[originalGlyphIdx]
 
         # Also include glyphs that are parts of composite glyphs
-        start = self.get_table_pos('glyf')[0]
+        getGlyphRefs = self._getGlyphRefs
         n = 0
         while n < len(glyphMap):
-            originalGlyphIdx = glyphMap[n]
-            glyphPos = self.glyphPos[originalGlyphIdx]
-            glyphLen = self.glyphPos[originalGlyphIdx + 1] - glyphPos
+            for glyphIdx in getGlyphRefs(glyphMap[n])[1::2]:
+                if glyphIdx not in glyphSet:
+                    glyphSet[glyphIdx] = len(glyphMap)
+                    glyphMap.append(glyphIdx)
             n += 1
-            if not glyphLen: continue
-            self.seek(start + glyphPos)
-            numberOfContours = self.read_short()
-            if numberOfContours < 0:
-                # composite glyph
-                self.skip(8)
-                flags = GF_MORE_COMPONENTS
-                while flags & GF_MORE_COMPONENTS:
-                    flags = self.read_ushort()
-                    glyphIdx = self.read_ushort()
-                    if glyphIdx not in glyphSet:
-                        glyphSet[glyphIdx] = len(glyphMap)
-                        glyphMap.append(glyphIdx)
-                    if flags & GF_ARG_1_AND_2_ARE_WORDS:
-                        self.skip(4)
-                    else:
-                        self.skip(2)
-                    if flags & GF_WE_HAVE_A_SCALE:
-                        self.skip(2)
-                    elif flags & GF_WE_HAVE_AN_X_AND_Y_SCALE:
-                        self.skip(4)
-                    elif flags & GF_WE_HAVE_A_TWO_BY_TWO:
-                        self.skip(8)
 
         numGlyphs = n = len(glyphMap)
         while n > 1 and self.hmetrics[n][0] == self.hmetrics[n - 1][0]:
@@ -827,41 +944,29 @@ class TTFontFile(TTFontParser):
         output.add('hmtx', hmtx)
 
         # glyf - Glyph data
-        glyphData = self.get_table('glyf')
         offsets = []
         glyf = []
+        a = glyf.append
         pos = 0
+        getGlyph = self._getGlyph
         for n in xrange(numGlyphs):
             offsets.append(pos)
-            originalGlyphIdx = glyphMap[n]
-            glyphPos = self.glyphPos[originalGlyphIdx]
-            glyphLen = self.glyphPos[originalGlyphIdx + 1] - glyphPos
-            data = glyphData[glyphPos:glyphPos+glyphLen]
-            # Fix references in composite glyphs
-            if glyphLen > 2 and unpack(">h", data[:2])[0] < 0:
-                # composite glyph
-                pos_in_glyph = 10
-                flags = GF_MORE_COMPONENTS
-                while flags & GF_MORE_COMPONENTS:
-                    flags = unpack(">H", data[pos_in_glyph:pos_in_glyph+2])[0]
-                    glyphIdx = unpack(">H", data[pos_in_glyph+2:pos_in_glyph+4])[0]
-                    data = _set_ushort(data, pos_in_glyph + 2, glyphSet[glyphIdx])
-                    pos_in_glyph = pos_in_glyph + 4
-                    if flags & GF_ARG_1_AND_2_ARE_WORDS:
-                        pos_in_glyph = pos_in_glyph + 4
-                    else:
-                        pos_in_glyph = pos_in_glyph + 2
-                    if flags & GF_WE_HAVE_A_SCALE:
-                        pos_in_glyph = pos_in_glyph + 2
-                    elif flags & GF_WE_HAVE_AN_X_AND_Y_SCALE:
-                        pos_in_glyph = pos_in_glyph + 4
-                    elif flags & GF_WE_HAVE_A_TWO_BY_TWO:
-                        pos_in_glyph = pos_in_glyph + 8
-            glyf.append(data)
-            pos = pos + glyphLen
+            data, C = getGlyph(glyphMap[n])
+            if C:
+                # Fix references in composite glyphs
+                p = 0
+                for i in xrange(0,len(C),2):
+                    q = C[i]
+                    a(data[p:q])
+                    a(pack('>H',glyphSet[C[i+1]]))
+                    p = q+2
+                a(data[p:])
+            else:
+                a(data)
+            pos = pos + len(data)
             if pos % 4 != 0:
                 padding = 4 - pos % 4
-                glyf.append('\0' * padding)
+                a('\0' * padding)
                 pos = pos + padding
         offsets.append(pos)
         output.add('glyf', string.join(glyf, ""))
@@ -1138,3 +1243,33 @@ try:
     TTFont.stringWidth = new.instancemethod(_instanceStringWidthTTF,None,TTFont)
 except ImportError:
     pass
+
+def benchmark(fn='Vera.ttf', size=256, repeats=5):
+    '''time making every size character subset of a font as the first
+    document in a process does and with the remembered glyph references'''
+    from time import time
+    ttf = TTFontFile(fn)
+    codes = ttf.charToGlyph.keys()
+    codes.sort()
+    subsets = [codes[i:i+size] for i in xrange(0,len(codes),size)]
+    def cold():
+        for s in subsets:
+            ttf.__dict__.pop('_glyphRefs',None)
+            ttf.__dict__.pop('_subsetCache',None)
+            ttf.makeSubset(s)
+    def warm():
+        ttf._subsetCache.clear()
+        for s in subsets: ttf.makeSubset(s)
+    print '%s: %d subsets of %d characters' % (fn, len(subsets), size)
+    for name, func in (('cold', cold), ('remembered', warm)):
+        T = []
+        for i in xrange(repeats):
+            t = time()
+            func()
+            T.append(time()-t)
+        print '%-10s %.1fms (best of %d)' % (name, min(T)*1000, repeats)
+
+if __name__=='__main__':
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark(*[a for a in sys.argv[1:] if a!='--benchmark'])
@@ -26,7 +26,7 @@ from reportlab.pdfbase import pdfdoc
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen  import pdfgeom, pathobject, textobject
 from reportlab.lib.colors import black, _chooseEnforceColorSpace
-from reportlab.lib.utils import import_zlib, ImageReader, fp_str, _digester
+from reportlab.lib.utils import import_zlib, ImageReader, fp_str, _digester, imageSourceKey, ContentStream
 from reportlab.lib.boxstuff import aspectRatioFix
 
 digitPat = re.compile('\d')  #used in decimal alignment
@@ -118,6 +118,9 @@ class   ExtGState:
         x._c = self._c
         return x
 
+#cached forms are drawn at the origin so we don't really want them clipped
+_formCacheBBox = (-10000,-10000,10000,10000)
+
 class Canvas(textobject._PDFColorSetter):
     """This class is the programmer's interface to the PDF file format.  Methods
     are (or will be) provided here to do just about everything PDF can do.
@@ -178,6 +181,7 @@ class Canvas(textobject._PDFColorSetter):
                  cropMarks=None,
                  pdfVersion=None,
                  enforceColorSpace=None,
+                 streamOutput=None,
                  ):
         """Create a canvas of a given size. etc.
 
@@ -193,15 +197,25 @@ class Canvas(textobject._PDFColorSetter):
         if enforceColorSpace is in ('cmyk', 'rgb', 'sep','sep_black','sep_cmyk') then one of
         the standard _PDFColorSetter callables will be used to enforce appropriate color settings.
         If it is a callable then that will be used.
+
+        if streamOutput is 1 the content streams of finished pages and the
+        images they use are written to filename as each page is shown rather
+        than being kept in memory until save; 2 does the same via a temporary
+        spool file that is copied to filename on save.  The default is taken
+        from rl_config.pdfStreamOutput.  getpdfdata cannot be used when
+        streaming.
         """
         if pagesize is None: pagesize = rl_config.defaultPageSize
         if invariant is None: invariant = rl_config.invariant
+        if streamOutput is None: streamOutput = rl_config.pdfStreamOutput
         self._filename = filename
 
         self._doc = pdfdoc.PDFDocument(compression=pageCompression,
                                        invariant=invariant, filename=filename,
                                        pdfVersion=pdfVersion or pdfdoc.PDF_VERSION_DEFAULT,
                                        )
+        if streamOutput:
+            self._doc.setStreamOutput(filename, spool=streamOutput==2)
 
         self._enforceColorSpace = _chooseEnforceColorSpace(enforceColorSpace)
 
@@ -223,6 +237,7 @@ class Canvas(textobject._PDFColorSetter):
         self._pageNumber = 1   # keep a count
         # when we create a form we need to save operations not in the form
         self._codeStack = []
+        self._formCacheDepth = self._formCacheCount = 0
         self._restartAccumulators()  # restart all accumulation state (generalized, arw)
         self._annotationCount = 0
 
@@ -578,13 +593,14 @@ class Canvas(textobject._PDFColorSetter):
         if self._pageDuration is not None:
             page.Dur = self._pageDuration
 
-        strm =  self._psCommandsBeforePage + [self._preamble] + code + self._psCommandsAfterPage
+        strm =  self._psCommandsBeforePage + [self._preamble, code.join(pdfdoc.LINEEND)] + self._psCommandsAfterPage
         page.setStream(strm)
         self._setColorSpace(page)
         self._setExtGState(page)
         self._setXObjects(page)
         self._setAnnotations(page)
         self._doc.addPage(page)
+        self._doc.flushPage(page)
 
         if self._onPage: self._onPage(self._pageNumber)
         self._startPage()
@@ -743,6 +759,41 @@ class Canvas(textobject._PDFColorSetter):
         """Query whether form XObj really exists yet."""
         return self._doc.hasForm(name)
 
+    def drawCachedForm(self, key, draw, x=0, y=0):
+        """draw(x,y) some content which may be drawn many times in this document.
+
+        key must identify what draw produces (eg a digest of the content).
+        The first time a key is seen draw(x,y) is simply called; after that
+        draw(0,0) is captured once as a form XObject which is then reused
+        with doForm at x, y.  Content drawn inside another cached draw is
+        not cached separately.  See rl_config.formCaching."""
+        if self._formCacheDepth or not rl_config.formCaching:
+            return draw(x,y)
+        forms = self._doc.formCache
+        name = forms.get(key,0)
+        self._formCacheDepth += 1
+        try:
+            if name==0:
+                forms[key] = None   #seen once
+                return draw(x,y)
+            if name is None:
+                name = forms[key] = 'rlFormCache%d' % self._formCacheCount
+                self._formCacheCount += 1
+                self.beginForm(name,*_formCacheBBox)
+                try:
+                    draw(0,0)
+                finally:
+                    self.endForm()
+        finally:
+            self._formCacheDepth -= 1
+        if x or y:
+            self.saveState()
+            self.translate(x,y)
+            self.doForm(name)
+            self.restoreState()
+        else:
+            self.doForm(name)
+
     ######################################################
     #
     #   Image routines
@@ -823,10 +874,12 @@ class Canvas(textobject._PDFColorSetter):
 
         Unlike drawInlineImage, this creates 'external images' which
         are only stored once in the PDF file but can be drawn many times.
-        If you give it the same filename twice, even at different locations
-        and sizes, it will reuse the first occurrence, resulting in a saving
-        in file size and generation time.  If you use ImageReader objects,
-        it tests whether the image content has changed before deciding
+        If you give it the same image file twice, even at different locations
+        and sizes or under different names, it will reuse the first occurrence,
+        resulting in a saving in file size and generation time.  Files and
+        ImageReader objects are recognised by a digest of their encoded bytes
+        so reused images aren't decoded again; for ImageReaders wrapping PIL
+        images it tests whether the image content has changed before deciding
         whether to reuse it.
 
         In general you should use drawImage in preference to drawInlineImage
@@ -836,7 +889,18 @@ class Canvas(textobject._PDFColorSetter):
 
         # first, generate a unique name/signature for the image.  If ANYTHING
         # is different, even the mask, this should be different.
+        # Images whose encoded bytes we can identify are named and looked up
+        # in the document's image registry without being decoded.
         if isinstance(image,ImageReader):
+            key = image.getSourceKey()
+        else:
+            key = imageSourceKey(image)
+        if key is not None:
+            key = key, str(mask)
+            name = self._doc.imageRegistry.get(key,None)
+            if name is None:
+                name = self._doc.imageRegistry[key] = _digester('%s%s' % key)
+        elif isinstance(image,ImageReader):
             rawdata = image.getRGBData()
             smask = image._dataA
             if mask=='auto' and smask:
@@ -866,9 +930,11 @@ class Canvas(textobject._PDFColorSetter):
                 if not mImgObj:
                     self._setXObjects(smask)
                     imgObj.smask = self._doc.Reference(smask,mRegName)
+                    self._doc.flushAtPageEnd(smask)
                 else:
                     imgObj.smask = pdfdoc.PDFObjectReference(mRegName)
                 del imgObj._smask
+            self._doc.flushAtPageEnd(imgObj)
 
         # ensure we have a size, as PDF will make it 1x1 pixel otherwise!
         x,y,width,height,scaled = aspectRatioFix(preserveAspectRatio,anchor,x,y,width,height,imgObj.width,imgObj.height)
@@ -892,7 +958,7 @@ class Canvas(textobject._PDFColorSetter):
             del self._codeStack[-1]
             self._code, self._formsinuse, self._annotationrefs, self._formData,self._colorsUsed = saved
         else:
-            self._code = []    # ready for more...
+            self._code = ContentStream()    # ready for more...
             self._psCommandsAfterPage = []
             self._currentPageHasImages = 1 # for safety...
             self._formsinuse = []
@@ -904,7 +970,7 @@ class Canvas(textobject._PDFColorSetter):
         "when you enter a form, save accumulator info not related to the form for page (if any)"
         saved = (self._code, self._formsinuse, self._annotationrefs, self._formData, self._colorsUsed)
         self._codeStack.append(saved)
-        self._code = []    # ready for more...
+        self._code = ContentStream()    # ready for more...
         self._currentPageHasImages = 1 # for safety...
         self._formsinuse = []
         self._annotationrefs = []
@@ -946,7 +1012,9 @@ class Canvas(textobject._PDFColorSetter):
         if uppery is None: uppery=h
         form = pdfdoc.PDFFormXObject(lowerx=lowerx, lowery=lowery, upperx=upperx, uppery=uppery)
         form.compression = self._pageCompression
-        form.setStreamList([self._preamble] + self._code) # ??? minus preamble (seems to be needed!)
+        strm = [self._preamble] # ??? minus preamble (seems to be needed!)
+        if self._code: strm.append(self._code.join(pdfdoc.LINEEND))
+        form.setStreamList(strm)
         self._setColorSpace(form)
         self._setExtGState(form)
         self._setXObjects(form)
@@ -1188,7 +1256,7 @@ class Canvas(textobject._PDFColorSetter):
             s = len(L)>7 and join(L)+ ' %s cm' or '%s cm'
             self._code[-1] = s % fp_str(a0*a+c0*b,b0*a+d0*b,a0*c+c0*d,b0*c+d0*d,a0*e+c0*f+e0,b0*e+d0*f+f0)
         else:
-            self._code.append('%s cm' % fp_str(a,b,c,d,e,f))
+            self._code.op('cm', a,b,c,d,e,f)
 
     def absolutePosition(self, x, y):
         """return the absolute position of x,y in user space w.r.t. default user space"""
@@ -1326,7 +1394,7 @@ class Canvas(textobject._PDFColorSetter):
         #move to first point
         self._code.append('n %s m' % fp_str(pointList[0][:2]))
         for curve in pointList:
-            self._code.append('%s c' % fp_str(curve[2:]))
+            self._code.op('c', curve[2:])
         # stroke
         self._code.append('S')
 
@@ -1350,7 +1418,7 @@ class Canvas(textobject._PDFColorSetter):
         #move to first point
         self._code.append('n %s m' % fp_str(pointList[0][:2]))
         for curve in pointList:
-            self._code.append('%s c' % fp_str(curve[2:]))
+            self._code.op('c', curve[2:])
         #finish
         self._code.append(PATH_OPS[stroke, fill, self._fillMode])
 
@@ -1364,9 +1432,9 @@ class Canvas(textobject._PDFColorSetter):
 
         self._code.append('n %s m' % fp_str(x_cen, y_cen))
         # Move the pen to the center of the rectangle
-        self._code.append('%s l' % fp_str(pointList[0][:2]))
+        self._code.op('l', pointList[0][:2])
         for curve in pointList:
-            self._code.append('%s c' % fp_str(curve[2:]))
+            self._code.op('c', curve[2:])
         # finish the wedge
         self._code.append('%s l ' % fp_str(x_cen, y_cen))
         # final operator
@@ -1404,21 +1472,17 @@ class Canvas(textobject._PDFColorSetter):
         y5 = y0 + height
 
         self._code.append('n %s m' % fp_str(x2, y0))
-        self._code.append('%s l' % fp_str(x3, y0))  # bottom row
-        self._code.append('%s c'
-                         % fp_str(x4, y0, x5, y1, x5, y2)) # bottom right
+        self._code.op('l', x3, y0)  # bottom row
+        self._code.op('c', x4, y0, x5, y1, x5, y2) # bottom right
 
-        self._code.append('%s l' % fp_str(x5, y3))  # right edge
-        self._code.append('%s c'
-                         % fp_str(x5, y4, x4, y5, x3, y5)) # top right
+        self._code.op('l', x5, y3)  # right edge
+        self._code.op('c', x5, y4, x4, y5, x3, y5) # top right
 
-        self._code.append('%s l' % fp_str(x2, y5))  # top row
-        self._code.append('%s c'
-                         % fp_str(x1, y5, x0, y4, x0, y3)) # top left
+        self._code.op('l', x2, y5)  # top row
+        self._code.op('c', x1, y5, x0, y4, x0, y3) # top left
 
-        self._code.append('%s l' % fp_str(x0, y2))  # left edge
-        self._code.append('%s c'
-                         % fp_str(x0, y1, x1, y0, x2, y0)) # bottom left
+        self._code.op('l', x0, y2)  # left edge
+        self._code.op('c', x0, y1, x1, y0, x2, y0) # bottom left
 
         self._code.append('h')  #close off, although it should be where it started anyway
 
@@ -1567,7 +1631,7 @@ class Canvas(textobject._PDFColorSetter):
 
     def setLineWidth(self, width):
         self._lineWidth = width
-        self._code.append('%s w' % fp_str(width))
+        self._code.op('w', width)
 
     def setLineCap(self, mode):
         """0=butt,1=round,2=square"""
@@ -1583,7 +1647,7 @@ class Canvas(textobject._PDFColorSetter):
 
     def setMiterLimit(self, limit):
         self._miterLimit = limit
-        self._code.append('%s M' % fp_str(limit))
+        self._code.op('M', limit)
 
     def setDash(self, array=[], phase=0):
         """Two notations.  pass two numbers, or an array and phase"""
@@ -1733,7 +1797,7 @@ class Canvas(textobject._PDFColorSetter):
 
         This is useful in creating test cases and assertions of what
         got drawn, without necessarily saving pages to disk"""
-        return '\n'.join(self._code)
+        return self._code.join('\n')
 
     def setViewerPreference(self,pref,value):
         '''set one of the allowed enbtries in the documents viewer preferences'''
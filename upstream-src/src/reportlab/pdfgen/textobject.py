@@ -12,7 +12,7 @@ Progress Reports:
 import string
 from types import *
 from reportlab.lib.colors import Color, CMYKColor, CMYKColorSep, toColor, black, white, _CMYK_black, _CMYK_white
-from reportlab.lib.utils import fp_str
+from reportlab.lib.utils import fp_str, ContentStream
 from reportlab.pdfbase import pdfmetrics
 
 class _PDFColorSetter:
@@ -63,19 +63,19 @@ class _PDFColorSetter:
             if name:
                 self._code.append('/%s cs %s scn' % (name,fp_str(d)))
             else:
-                self._code.append('%s k' % fp_str(c, m, y, k))
+                self._code.op('k', c, m, y, k)
         elif isinstance(aColor, Color):
             rgb = (aColor.red, aColor.green, aColor.blue)
             self._fillColorObj = aColor
-            self._code.append('%s rg' % fp_str(rgb) )
+            self._code.op('rg', rgb)
         elif isinstance(aColor,(tuple,list)):
             l = len(aColor)
             if l==3:
                 self._fillColorObj = aColor
-                self._code.append('%s rg' % fp_str(aColor) )
+                self._code.op('rg', aColor)
             elif l==4:
                 self._fillColorObj = aColor
-                self._code.append('%s k' % fp_str(aColor))
+                self._code.op('k', aColor)
             else:
                 raise ValueError('Unknown color %r' % aColor)
         elif isinstance(aColor,basestring):
@@ -99,19 +99,19 @@ class _PDFColorSetter:
             if name:
                 self._code.append('/%s CS %s SCN' % (name,fp_str(d)))
             else:
-                self._code.append('%s K' % fp_str(c, m, y, k))
+                self._code.op('K', c, m, y, k)
         elif isinstance(aColor, Color):
             rgb = (aColor.red, aColor.green, aColor.blue)
             self._strokeColorObj = aColor
-            self._code.append('%s RG' % fp_str(rgb) )
+            self._code.op('RG', rgb)
         elif isinstance(aColor,(tuple,list)):
             l = len(aColor)
             if l==3:
                 self._strokeColorObj = aColor
-                self._code.append('%s RG' % fp_str(aColor) )
+                self._code.op('RG', aColor)
             elif l==4:
                 self._fillColorObj = aColor
-                self._code.append('%s K' % fp_str(aColor))
+                self._code.op('K', aColor)
             else:
                 raise ValueError('Unknown color %r' % aColor)
         elif isinstance(aColor,basestring):
@@ -126,14 +126,14 @@ class _PDFColorSetter:
     def setFillGray(self, gray, alpha=None):
         """Sets the gray level; 0.0=black, 1.0=white"""
         self._fillColorObj = (gray, gray, gray)
-        self._code.append('%s g' % fp_str(gray))
+        self._code.op('g', gray)
         if alpha is not None:
             self.setFillAlpha(alpha)
 
     def setStrokeGray(self, gray, alpha=None):
         """Sets the gray level; 0.0=black, 1.0=white"""
         self._strokeColorObj = (gray, gray, gray)
-        self._code.append('%s G' % fp_str(gray))
+        self._code.op('G', gray)
         if alpha is not None:
             self.setFillAlpha(alpha)
 
@@ -168,7 +168,7 @@ class PDFTextObject(_PDFColorSetter):
     It keeps track of x and y coordinates relative to its origin."""
 
     def __init__(self, canvas, x=0,y=0):
-        self._code = ['BT']    #no point in [] then append RGB
+        self._code = ContentStream(['BT'])    #no point in [] then append RGB
         self._canvas = canvas  #canvas sets this so it has access to size info
         self._fontname = self._canvas._fontname
         self._fontsize = self._canvas._fontsize
@@ -183,13 +183,13 @@ class PDFTextObject(_PDFColorSetter):
     def getCode(self):
         "pack onto one line; used internally"
         self._code.append('ET')
-        return string.join(self._code, ' ')
+        return self._code.join(' ')
 
     def setTextOrigin(self, x, y):
         if self._canvas.bottomup:
-            self._code.append('1 0 0 1 %s Tm' % fp_str(x, y)) #bottom up
+            self._code.op('Tm', 1, 0, 0, 1, x, y) #bottom up
         else:
-            self._code.append('1 0 0 -1 %s Tm' % fp_str(x, y))  #top down
+            self._code.op('Tm', 1, 0, 0, -1, x, y)  #top down
 
         # The current cursor position is at the text origin
         self._x0 = self._x = x
@@ -200,7 +200,7 @@ class PDFTextObject(_PDFColorSetter):
         if not self._canvas.bottomup:
             c = -c    #reverse bottom row of the 2D Transform
             d = -d
-        self._code.append('%s Tm' % fp_str(a, b, c, d, e, f))
+        self._code.op('Tm', a, b, c, d, e, f)
 
         # The current cursor position is at the text origin Note that
         # we aren't keeping track of all the transform on these
@@ -241,7 +241,7 @@ class PDFTextObject(_PDFColorSetter):
             self._y0 -= lastDy
 
         # Output the move text cursor call.
-        self._code.append('%s Td' % fp_str(dx, -dy))
+        self._code.op('Td', dx, -dy)
 
         # Keep track of the new line offsets and the cursor position
         self._x0 += dx
@@ -307,24 +307,24 @@ class PDFTextObject(_PDFColorSetter):
     def setCharSpace(self, charSpace):
          """Adjusts inter-character spacing"""
          self._charSpace = charSpace
-         self._code.append('%s Tc' % fp_str(charSpace))
+         self._code.op('Tc', charSpace)
 
     def setWordSpace(self, wordSpace):
         """Adjust inter-word spacing.  This can be used
         to flush-justify text - you get the width of the
         words, and add some space between them."""
         self._wordSpace = wordSpace
-        self._code.append('%s Tw' % fp_str(wordSpace))
+        self._code.op('Tw', wordSpace)
 
     def setHorizScale(self, horizScale):
         "Stretches text out horizontally"
         self._horizScale = 100 + horizScale
-        self._code.append('%s Tz' % fp_str(horizScale))
+        self._code.op('Tz', horizScale)
 
     def setLeading(self, leading):
         "How far to move down at the end of a line."
         self._leading = leading
-        self._code.append('%s TL' % fp_str(leading))
+        self._code.op('TL', leading)
 
     def setTextRenderMode(self, mode):
         """Set the text rendering mode.
@@ -346,29 +346,28 @@ class PDFTextObject(_PDFColorSetter):
         "Move text baseline up or down to allow superscrip/subscripts"
         self._rise = rise
         self._y = self._y - rise    # + ?  _textLineMatrix?
-        self._code.append('%s Ts' % fp_str(rise))
+        self._code.op('Ts', rise)
 
-    def _formatText(self, text):
-        "Generates PDF text output operator(s)"
+    def _textOps(self, text, A):
+        "calls A with each of the PDF text output operator(s)"
         canv = self._canvas
         font = pdfmetrics.getFont(self._fontname)
-        R = []
         if font._dynamicFont:
             #it's a truetype font and should be utf8.  If an error is raised,
             for subset, t in font.splitString(text, canv._doc):
                 if subset!=self._curSubset:
                     pdffontname = font.getSubsetInternalName(subset, canv._doc)
-                    R.append("%s %s Tf %s TL" % (pdffontname, fp_str(self._fontsize), fp_str(self._leading)))
+                    A("%s %s Tf %s TL" % (pdffontname, fp_str(self._fontsize), fp_str(self._leading)))
                     self._curSubset = subset
-                R.append("(%s) Tj" % canv._escape(t))
+                A("(%s) Tj" % canv._escape(t))
         elif font._multiByte:
             #all the fonts should really work like this - let them know more about PDF...
-            R.append("%s %s Tf %s TL" % (
+            A("%s %s Tf %s TL" % (
                 canv._doc.getInternalFontName(font.fontName),
                 fp_str(self._fontsize),
                 fp_str(self._leading)
                 ))
-            R.append("(%s) Tj" % font.formatForPdf(text))
+            A("(%s) Tj" % font.formatForPdf(text))
         else:
             #convert to T1  coding
             fc = font
@@ -379,23 +378,34 @@ class PDFTextObject(_PDFColorSetter):
                     i,j = e.args[2:4]
                     raise UnicodeDecodeError(*(e.args[:4]+('%s\n%s-->%s<--%s' % (e.args[4],text[max(i-10,0):i],text[i:j],text[j:j+10]),)))
 
+            escape = canv._escape
             for f, t in pdfmetrics.unicode2T1(text,[font]+font.substitutionFonts):
                 if f!=fc:
-                    R.append("%s %s Tf %s TL" % (canv._doc.getInternalFontName(f.fontName), fp_str(self._fontsize), fp_str(self._leading)))
+                    A("%s %s Tf %s TL" % (canv._doc.getInternalFontName(f.fontName), fp_str(self._fontsize), fp_str(self._leading)))
                     fc = f
-                R.append("(%s) Tj" % canv._escape(t))
+                A("(%s) Tj" % escape(t))
             if font!=fc:
-                R.append("%s %s Tf %s TL" % (canv._doc.getInternalFontName(self._fontname), fp_str(self._fontsize), fp_str(self._leading)))
+                A("%s %s Tf %s TL" % (canv._doc.getInternalFontName(self._fontname), fp_str(self._fontsize), fp_str(self._leading)))
+
+    def _formatText(self, text):
+        "Generates PDF text output operator(s)"
+        R = []
+        self._textOps(text,R.append)
         return ' '.join(R)
 
     def _textOut(self, text, TStar=0):
         "prints string at current point, ignores text cursor"
-        self._code.append('%s%s' % (self._formatText(text), (TStar and ' T*' or '')))
+        #the operators go straight into the code which is blank joined by getCode
+        code = self._code
+        n = len(code)
+        self._textOps(text,code.append)
+        if len(code)==n: code.append('')
+        if TStar: code.append('T*')
 
     def textOut(self, text):
         """prints string at current point, text cursor moves across."""
         self._x = self._x + self._canvas.stringWidth(text, self._fontname, self._fontsize)
-        self._code.append(self._formatText(text))
+        self._textOut(text)
 
     def textLine(self, text=''):
         """prints string at current point, text cursor moves down.
@@ -412,7 +422,7 @@ class PDFTextObject(_PDFColorSetter):
         self._y0 = self._y
 
         # Output the text followed by a PDF newline command
-        self._code.append('%s T*' % self._formatText(text))
+        self._textOut(text,1)
 
     def textLines(self, stuff, trim=1):
         """prints multi-line or newlined strings, moving down.  One
@@ -30,9 +30,10 @@ for the current frame).
 
 from reportlab.platypus.flowables import *
 from reportlab.lib.units import inch
-from reportlab.platypus.paragraph import Paragraph
+from reportlab.platypus.paragraph import Paragraph, wrapCacheInfo
 from reportlab.platypus.frames import Frame
 from reportlab.rl_config import defaultPageSize, verbose
+from reportlab import rl_config
 import reportlab.lib.sequencer
 from reportlab.pdfgen import canvas
 try:
@@ -50,6 +51,12 @@ loads = pickle.loads
 
 from types import *
 import sys
+from copy import copy, deepcopy
+from reportlab.lib.utils import getStringIO, _forkedWorkers
+try:
+    from multiprocessing import Pool, cpu_count
+except ImportError:
+    Pool = None
 import logging
 logger = logging.getLogger("reportlab.platypus")
 
@@ -74,6 +81,87 @@ def _doNothing(canvas, doc):
     "Dummy callback for onPage"
     pass
 
+#the (doc, sections, canvasmaker) of a running parallelBuild; forked workers inherit it
+_sectionJobs = None
+def _layoutSectionJob(i):
+    """parallelBuild worker: returns ('L', the pickled layout of section i),
+    ('U', None) if the layout can't be pickled or ('E', the traceback) if
+    laying out the section failed"""
+    doc, sections, canvasmaker = _sectionJobs
+    try:
+        log = doc._layoutSection(sections[i][:],canvasmaker)
+    except Exception:
+        import traceback
+        return 'E', traceback.format_exc()
+    try:
+        return 'L', dumps(log,-1)
+    except (pickle.PicklingError, TypeError):
+        #eg it holds an open file; the section is laid out in the parent
+        return 'U', None
+
+class _LayoutMarks:
+    """page checkpoints for an incremental multiBuild.  pages gets a
+    (log position, page number, first story index not yet started, state)
+    tuple for each page begun; state, if not None, lets the layout later be
+    resumed at that page."""
+    def __init__(self, story, edits, pages, resume=None):
+        self.story = story
+        self.edits = edits
+        self.pages = pages
+        self.resume = resume
+
+    def mark(self, doc, flowables, logPos):
+        story = self.story
+        t = len(flowables)
+        j = len(story)-t
+        i = 0
+        while i<t and flowables[i] is not story[j+i]:
+            i += 1
+        state = None
+        if not hasattr(doc,'_nextPageTemplateCycle'):
+            state = dict(page=doc.page,
+                    prefix=flowables[:i],
+                    template=doc.pageTemplates.index(doc.pageTemplate),
+                    nextTemplate=getattr(doc,'_nextPageTemplateIndex',None),
+                    indents=(doc._leftExtraIndent,doc._rightExtraIndent),
+                    emptyPages=doc._emptyPages,
+                    nameSpace=doc._nameSpace.copy(),
+                    lifetimes=dict([(k,set(v)) for k,v in doc._lifetimes.iteritems()]),
+                    seq=deepcopy(doc.seq),
+                    skip=t and hasattr(flowables[0],'_skipMeNextTime'),
+                    edits=len(self.edits))
+        self.pages.append((logPos,doc.page+1,j+i,state))
+
+    def restore(self, doc, flowables, log, afterFlowable):
+        "put doc and flowables back as they were at the start of the resumed page"
+        #the canvas gets what afterFlowable did to it on the kept pages eg outline levels
+        canv = doc.canv
+        doc.page = 0
+        for e in log:
+            k = e[0]
+            if k=='A':
+                afterFlowable(e[1])
+            elif k=='P':
+                doc.page += 1
+            elif k=='C':
+                canv.__dict__.update(e[1])
+        s = self.resume
+        doc.page = s['page']
+        doc.pageTemplate = doc.pageTemplates[s['template']]
+        if s['nextTemplate'] is not None:
+            doc._nextPageTemplateIndex = s['nextTemplate']
+        doc._leftExtraIndent, doc._rightExtraIndent = s['indents']
+        doc._emptyPages = s['emptyPages']
+        doc._nameSpace.clear()
+        doc._nameSpace.update(s['nameSpace'])
+        doc._lifetimes = dict([(k,set(v)) for k,v in s['lifetimes'].iteritems()])
+        doc.seq = deepcopy(s['seq'])
+        if flowables:
+            if s['skip']:
+                flowables[0]._skipMeNextTime = 1
+            elif hasattr(flowables[0],'_skipMeNextTime'):
+                del flowables[0]._skipMeNextTime
+
 class PTCycle(list):
     def __init__(self):
         self._restart = 0
@@ -421,6 +509,8 @@ class BaseDocTemplate:
       (default: 1)
     - title: Internal title for document (does not automatically display on any page)
     - author: Internal author for document (does not automatically display on any page)
+    - streamOutput: passed to the canvas (see Canvas); None means use rl_config.pdfStreamOutput.
+      multiBuild always spools so that abandoned passes never touch the output file.
     """
     _initArgs = {   'pagesize':defaultPageSize,
                     'pageTemplates':[],
@@ -443,6 +533,7 @@ class BaseDocTemplate:
                     'encrypt': None,
                     'cropMarks': None,
                     'enforceColorSpace': None,
+                    'streamOutput': None,
                     }
     _invalidInitArgs = ()
     _firstPageTemplateIndex = 0
@@ -812,15 +903,24 @@ class BaseDocTemplate:
 
     def _startBuild(self, filename=None, canvasmaker=canvas.Canvas):
         self._calc()
+        self._wrapCacheInfo = wrapCacheInfo()
 
         #each distinct pass gets a sequencer
         self.seq = reportlab.lib.sequencer.Sequencer()
 
+        kw = {}
+        streamOutput = self.streamOutput
+        if streamOutput is None:
+            streamOutput = rl_config.pdfStreamOutput
+        if streamOutput:
+            #only the final multiBuild pass is saved
+            kw['streamOutput'] = hasattr(self,'_multiBuildEdits') and 2 or streamOutput
         self.canv = canvasmaker(filename or self.filename,
                                 pagesize=self.pagesize,
                                 invariant=self.invariant,
                                 pageCompression=self.pageCompression,
                                 enforceColorSpace=self.enforceColorSpace,
+                                **kw
                                 )
  
         getattr(self.canv,'setEncrypt',lambda x: None)(self.encrypt)
@@ -847,6 +947,8 @@ class BaseDocTemplate:
 
         if getattr(self,'_doSave',1): self.canv.save()
         if self._onPage: self.canv.setPageCallBack(None)
+        #Paragraph wraps reusing/making line breaks during this build
+        self.wrapCacheInfo = tuple([b-a for a,b in zip(self._wrapCacheInfo,wrapCacheInfo())])
 
     def build(self, flowables, filename=None, canvasmaker=canvas.Canvas):
         """Build the document from a list of flowables.
@@ -929,10 +1031,20 @@ class BaseDocTemplate:
 
     def multiBuild(self, story,
                    maxPasses = 10,
+                   incremental = 0,
                    **buildKwds
                    ):
         """Makes multiple passes until all indexing flowables
         are happy.
+
+        If incremental is true each pass's layout is kept and the next pass
+        reuses it for the pages before the first indexing flowable whose
+        wrapped size has changed, laying out only the rest (every page is
+        still drawn).  Each pass reports the numbers of pages reused and laid
+        out to the progress callback as 'REUSED' and 'RELAID'.  The incremental
+        mode takes the filename and canvasmaker build arguments; any others
+        go to _preparePageTemplates (eg SimpleDocTemplate's onFirstPage and
+        onLaterPages).
         
         Returns number of passes"""
         self._indexingFlowables = []
@@ -941,6 +1053,9 @@ class BaseDocTemplate:
             if thing.isIndexing():
                 self._indexingFlowables.append(thing)
 
+        if incremental:
+            return self._incrementalMultiBuild(story, maxPasses, **buildKwds)
+
         #better fix for filename is a 'file' problem
         self._doSave = 0
         passes = 0
@@ -980,6 +1095,365 @@ class BaseDocTemplate:
         del self._multiBuildEdits
         if verbose: print 'saved'
         return passes
+
+    def _preparePageTemplates(self, **kw):
+        """called once before a multiBuild(incremental=1) or parallelBuild lays
+        anything out; a subclass whose build method makes its page templates
+        should make them here"""
+        if kw:
+            raise TypeError('unexpected build arguments %s' % ', '.join(kw.keys()))
+
+    def _incrementalMultiBuild(self, story, maxPasses, filename=None, canvasmaker=canvas.Canvas, **kw):
+        self._preparePageTemplates(**kw)
+        self._doSave = 0
+        passes = 0
+        mbe = []
+        self._multiBuildEdits = mbe.append
+        layout = None
+        try:
+            while 1:
+                passes += 1
+                if self._onProgress:
+                    self._onProgress('PASS', passes)
+                if verbose: print 'building pass '+str(passes) + '...',
+
+                for fl in self._indexingFlowables:
+                    fl.beforeBuild()
+
+                layout, reused = self._relayout(story,layout,mbe,canvasmaker)
+                self._drawLayouts([layout[0]],filename,canvasmaker)
+                relaid = len(layout[1])-reused
+                if self._onProgress:
+                    self._onProgress('REUSED', reused)
+                    self._onProgress('RELAID', relaid)
+                if verbose: print '%d pages reused, %d laid out...' % (reused, relaid),
+
+                for fl in self._indexingFlowables:
+                    fl.afterBuild()
+                if self._allSatisfied():
+                    break
+                if passes > maxPasses:
+                    raise IndexError, "Index entries not resolved after %d passes" % maxPasses
+        finally:
+            #work through any edits
+            while mbe:
+                e = mbe.pop(0)
+                e[0](*e[1:])
+            del self._multiBuildEdits, self._doSave
+
+        self.canv.save()
+        if verbose: print 'saved'
+        return passes
+
+    def _relayout(self, story, layout, edits, canvasmaker):
+        '''lay out story for an incremental multiBuild pass reusing what we can
+        of the previous pass's layout; returns the new layout and the number of
+        pages reused'''
+        mark = None
+        if layout:
+            log, pages = layout
+            dirty = self._firstChangedPage(story,log,pages)
+            if dirty is None:
+                return layout, len(pages)
+            for i,m in enumerate(pages):
+                if m[1]>dirty: break
+                if m[3]: mark = i
+        if mark is not None:
+            logPos, page, j, state = pages[mark]
+            log = log[:logPos]
+            pages = pages[:mark]
+            flowables = state['prefix']+story[j:]
+            reused = page-1
+            n = state['edits']
+        else:
+            log = []
+            pages = []
+            flowables = story[:]
+            reused = n = 0
+            state = None
+
+        #undo what was done to the flowables we're going to lay out again
+        while len(edits)>n:
+            e = edits.pop(n)
+            e[0](*e[1:])
+        marks = _LayoutMarks(story,edits,pages,state)
+        return (self._layoutSection(flowables,canvasmaker,log,marks),pages), reused
+
+    def _firstChangedPage(self, story, log, pages):
+        '''return the first page of a layout which may change on this pass or None.
+        Only indexing flowables are expected to change between passes; those
+        placed whole are rewrapped and their sizes compared, others count as
+        changed from the page on which they were started.'''
+        canv = canvas.Canvas(getStringIO())
+        dirty = None
+        whole = set()
+        page = 0
+        for e in log:
+            k = e[0]
+            if k=='P':
+                page += 1
+            elif k=='W':
+                f = e[1]
+                whole.add(id(f))
+                if dirty is None and f.wrapOn(canv,e[4],e[5])!=e[6:8]:
+                    dirty = page
+        for i,f in enumerate(story):
+            if f.isIndexing() and id(f) not in whole:
+                p = 1
+                for m in pages:
+                    if m[2]>i: break
+                    p = m[1]
+                if dirty is None or p<dirty:
+                    dirty = p
+        return dirty
+
+    def parallelBuild(self, sections, filename=None, canvasmaker=canvas.Canvas,
+                    processes=None, maxPasses=10, **kw):
+        """Build the document from a list of sections (lists of flowables) each of
+        which starts on a new page.
+
+        The sections are laid out independently, in up to processes worker
+        processes (default one per cpu), each as if it began a fresh document
+        ie with the first page template.  The layouts are then drawn in order
+        onto one canvas so page numbering, page templates, afterFlowable,
+        bookmarks, outlines and fonts come out as they would from build.
+        A section whose layout can't be pickled back (eg it holds an open file)
+        is laid out in this process; an error laying out a section in a worker
+        is raised as a LayoutError holding the worker's traceback.  The pool
+        is only used where its workers are forked (ie not on Windows).
+        Each section is laid out with the doctemplate namespace as it was at
+        the start of the build, so a DocAssign or DocExec in one section isn't
+        seen while later sections are laid out; the assignments are made in
+        order when the pages are drawn.
+        Indexing flowables are treated as in multiBuild: the passes are repeated
+        until they are satisfied.  Other keyword arguments go to
+        _preparePageTemplates (eg SimpleDocTemplate's onFirstPage and
+        onLaterPages).
+
+        Returns number of passes"""
+        self._preparePageTemplates(**kw)
+        story = []
+        for s in sections:
+            story.extend(s)
+        self._indexingFlowables = [f for f in story if f.isIndexing()]
+        if self._onProgress:
+            self._onProgress('STARTED',0)
+            self._onProgress('SIZE_EST', len(story))
+
+        self._doSave = 0
+        passes = 0
+        mbe = []
+        self._multiBuildEdits = mbe.append
+        try:
+            while 1:
+                passes += 1
+                if self._onProgress:
+                    self._onProgress('PASS', passes)
+                for fl in self._indexingFlowables:
+                    fl.beforeBuild()
+
+                self._drawLayouts(self._layoutSections(sections,canvasmaker,processes),
+                                filename,canvasmaker)
+
+                for fl in self._indexingFlowables:
+                    fl.afterBuild()
+                if self._allSatisfied():
+                    break
+                if passes > maxPasses:
+                    raise IndexError, "Index entries not resolved after %d passes" % maxPasses
+
+                #undo anything done to our flowables by in process layouts
+                while mbe:
+                    e = mbe.pop(0)
+                    e[0](*e[1:])
+        finally:
+            del self._multiBuildEdits, self._doSave
+
+        self.canv.save()
+        if self._onProgress:
+            self._onProgress('FINISHED',0)
+        return passes
+
+    def _layoutSections(self,sections,canvasmaker,processes):
+        '''return the layout logs of sections, using a process pool if we can'''
+        global _sectionJobs
+        n = len(sections)
+        L = n*[None]
+        if processes is None:
+            processes = Pool and cpu_count() or 1
+        if Pool and processes>1 and n>1 and _forkedWorkers():
+            _sectionJobs = self, sections, canvasmaker
+            try:
+                #one task per worker so every section starts from our state
+                pool = Pool(min(processes,n),maxtasksperchild=1)
+                try:
+                    L = pool.map(_layoutSectionJob,xrange(n))
+                finally:
+                    pool.terminate()
+                    pool.join()
+            finally:
+                _sectionJobs = None
+        for i in xrange(n):
+            r = L[i]
+            if r is None or r[0]=='U':
+                L[i] = self._layoutSection(sections[i][:],canvasmaker)
+            elif r[0]=='E':
+                raise LayoutError('parallelBuild section %d failed in a worker process\n%s' % (i,r[1]))
+            else:
+                L[i] = loads(r[1])
+        return L
+
+    def _layoutSection(self, flowables, canvasmaker=canvas.Canvas, log=None, marks=None):
+        '''lay out flowables as a fresh document without drawing them.
+        Returns log (a new list by default) extended with the pages begun and
+        ended, frame changes, flowable placements, afterFlowable calls and
+        canvas attributes set during layout which _mergeSection replays.
+        marks (see _LayoutMarks) records page checkpoints and may resume an
+        earlier layout.'''
+        if log is None: log = []
+        doc = self.__dict__
+        handle_documentBegin = self.handle_documentBegin
+        handle_pageBegin = self.handle_pageBegin
+        handle_pageEnd = self.handle_pageEnd
+        handle_frameBegin = self.handle_frameBegin
+        _afterFlowable = self.afterFlowable
+        inPageBegin = []
+        placed = [None,None]
+        canvKeys = []
+        canvAttrs = {}
+        log.append(('C',canvAttrs))
+
+        def documentBegin():
+            handle_documentBegin()
+            marks.restore(self,flowables,log[:-1],_afterFlowable)
+
+        def pageBegin():
+            if marks: marks.mark(self,flowables,len(log))
+            log.append(('P',self.pageTemplates.index(self.pageTemplate)))
+            inPageBegin.append(1)
+            try:
+                handle_pageBegin()
+            finally:
+                inPageBegin.pop()
+
+        def pageEnd():
+            log.append(('E',))
+            handle_pageEnd()
+
+        def frameBegin(resume=0):
+            #the page begin's own frame begin is replayed with it
+            if not inPageBegin:
+                f = self.frame
+                log.append(('F',self.pageTemplate.frames.index(f),resume,f._atTop))
+            handle_frameBegin(resume)
+
+        def afterFlowable(f):
+            if f is placed[0]: log.append(('A',placed[1]))
+            else: log.append(('A',f))
+            _afterFlowable(f)
+
+        def notify(kind,stuff):
+            #the listeners hear about it when the log is replayed
+            pass
+
+        def place(frame,f,x,y,aW,aH,w,h):
+            if frame is not self.frame:
+                #not ours eg a frame filled by a page template
+                f.drawOn(self.canv,x,y,_sW=aW-w)
+                return
+            if f.isIndexing():
+                #wrapped again when drawn as it may have changed by then
+                placed[:] = [f,f]
+                log.append(('W',f,x,y,aW,aH,w,h))
+            else:
+                #a copy as the flowable may be placed (and wrapped) again
+                c = copy(f)
+                for a in ('canv','_frame'):
+                    c.__dict__.pop(a,None)
+                placed[:] = [f,c]
+                log.append(('D',c,x,y,aW,aH,w,h))
+
+        def maker(*args,**kw):
+            canv = canvasmaker(*args,**kw)
+            canv._placeFlowable = place
+            canvKeys.append(set(canv.__dict__.keys()))
+            return canv
+
+        for a in ('_nextPageTemplateCycle','_nextPageTemplateIndex','_nextFrameIndex'):
+            doc.pop(a,None)
+        self._leftExtraIndent = self._rightExtraIndent = 0.0
+        saved = (self.streamOutput, self._onPage, self._onProgress,
+                self._nameSpace.copy(), dict([(k,set(v)) for k,v in self._lifetimes.iteritems()]))
+        hooks = dict(handle_pageBegin=pageBegin, handle_pageEnd=pageEnd,
+                    handle_frameBegin=frameBegin, afterFlowable=afterFlowable,
+                    notify=notify)
+        if marks and marks.resume:
+            hooks['handle_documentBegin'] = documentBegin
+        doc.update(hooks)
+        self.streamOutput = 0
+        self._onPage = self._onProgress = None
+        try:
+            BaseDocTemplate.build(self,flowables,getStringIO(),maker)
+            #things flowables left on the canvas during layout eg the toc's onDraw callback
+            canv = self.canv.__dict__
+            canvAttrs.update([(k,canv[k]) for k in canv if k not in canvKeys[0]])
+        finally:
+            for k in hooks:
+                del doc[k]
+            self.streamOutput, self._onPage, self._onProgress, nameSpace, self._lifetimes = saved
+            self._nameSpace.clear()
+            self._nameSpace.update(nameSpace)
+        return log
+
+    def _drawLayouts(self, logs, filename=None, canvasmaker=canvas.Canvas):
+        '''draw layout logs in order onto a new canvas'''
+        self._startBuild(filename,canvasmaker)
+        canv = self.canv
+        self._savedInfo = canv._doc.info
+        try:
+            canv._doctemplate = self
+            for log in logs:
+                self._mergeSection(log)
+        finally:
+            del canv._doctemplate
+        canv._doc.info = self._savedInfo
+        self._endBuild()
+
+    def _mergeSection(self, log):
+        '''replay a section layout log onto our canvas'''
+        canv = self.canv
+        for e in log:
+            k = e[0]
+            if k=='D' or k=='W':
+                f, x, y, aW, aH, w = e[1:7]
+                f._frame = self.frame
+                f.canv = canv
+                try:
+                    if k=='W':
+                        f.wrap(aW,aH)
+                    elif isinstance(f,DocAssign) and not isinstance(f,DocPara):
+                        f.funcWrap(aW,aH)
+                    f.drawOn(canv,x,y,_sW=aW-w)
+                finally:
+                    for a in ('canv', '_frame'):
+                        if hasattr(f,a):
+                            delattr(f,a)
+                self._curPageFlowableCount += 1
+            elif k=='A':
+                self.afterFlowable(e[1])
+            elif k=='C':
+                canv.__dict__.update(e[1])
+            elif k=='P':
+                del self._hanging[:]
+                self.pageTemplate = self.pageTemplates[e[1]]
+                self.handle_pageBegin()
+            elif k=='F':
+                self.frame = f = self.pageTemplate.frames[e[1]]
+                f._debug = self._debug
+                f._atTop = e[3]
+                self.handle_frameBegin(e[2])
+            else:
+                self.handle_pageEnd()
         
     #these are pure virtuals override in derived classes
     #NB these get called at suitable places by the base class
@@ -1106,6 +1580,11 @@ class SimpleDocTemplate(BaseDocTemplate):
                footers, etcetera. They can use external variables to vary
                the look (for example providing page numbering or section names).
         """
+        self._preparePageTemplates(onFirstPage,onLaterPages)
+        BaseDocTemplate.build(self,flowables, canvasmaker=canvasmaker)
+
+    def _preparePageTemplates(self, onFirstPage=_doNothing, onLaterPages=_doNothing):
+        "add the First and Later page templates"
         self._calc()    #in case we changed margins sizes etc
         frameT = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
         self.addPageTemplates([PageTemplate(id='First',frames=frameT, onPage=onFirstPage,pagesize=self.pagesize),
@@ -1114,7 +1593,6 @@ class SimpleDocTemplate(BaseDocTemplate):
             self.pageTemplates[0].beforeDrawPage = self.onFirstPage
         if onLaterPages is _doNothing and hasattr(self,'onLaterPages'):
             self.pageTemplates[1].beforeDrawPage = self.onLaterPages
-        BaseDocTemplate.build(self,flowables, canvasmaker=canvasmaker)
 
 def progressCB(typ, value):
     """Example prototype for progress monitoring.
@@ -1132,6 +1610,8 @@ def progressCB(typ, value):
     typ 'PASS', value = number of this rendering pass
     typ 'PROGRESS', value = number between 0 and SIZE_EST
     typ 'PAGE', value = page number of page
+    typ 'REUSED', value = pages kept from the last pass (incremental multiBuild)
+    typ 'RELAID', value = pages laid out again (incremental multiBuild)
     type 'FINISHED', value = 0
 
     The sequence is
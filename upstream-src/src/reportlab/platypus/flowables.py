@@ -86,9 +86,19 @@ class Flowable:
     def _drawOn(self,canv):
         '''ensure canv is set on and then draw'''
         self.canv = canv
-        self.draw()#this is the bit you overload
+        key = self.getFormKey()
+        if key and hasattr(canv,'drawCachedForm'):
+            canv.drawCachedForm((self.__class__,key),lambda x,y: self.draw())
+        else:
+            self.draw()#this is the bit you overload
         del self.canv
 
+    def getFormKey(self):
+        '''Flowables which draw the same thing in many places may return
+        a key which identifies what they draw; they are then drawn just
+        once per document as a form xobject (see Canvas.drawCachedForm)'''
+        return None
+
     def _hAlignAdjust(self,x,sW=0):
         if sW and hasattr(self,'hAlign'):
             a = self.hAlign
@@ -154,9 +154,9 @@ class Frame:
                 s =flowable.getSpaceBefore()
                 if self._oASpace:
                     s = max(s-self._prevASpace,0)
-            h = y - p - s
-            if h>0:
-                w, h = flowable.wrap(aW, h)
+            aH = y - p - s
+            if aH>0:
+                w, h = flowable.wrap(aW, aH)
             else:
                 return 0
 
@@ -171,7 +171,13 @@ class Frame:
                 return 0
             else:
                 #now we can draw it, and update the current point.
-                flowable.drawOn(canv, self._x + self._leftExtraIndent, y, _sW=aW-w)
+                x = self._x + self._leftExtraIndent
+                place = getattr(canv,'_placeFlowable',None)
+                if place:
+                    #a layout only pass (see BaseDocTemplate.parallelBuild)
+                    place(self, flowable, x, y, aW, aH, w, h-s)
+                else:
+                    flowable.drawOn(canv, x, y, _sW=aW-w)
                 flowable.canv=canv
                 if self._debug: logger.debug('drew %s' % flowable.identity())
                 s = flowable.getSpaceAfter()
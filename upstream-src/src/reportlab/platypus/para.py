@@ -59,7 +59,6 @@ ALSO the following additional internal paragraph markup tags are supported
 
 """
 from reportlab.pdfbase.pdfmetrics import stringWidth
-from reportlab.lib.utils import fp_str
 from reportlab.platypus.flowables import Flowable
 from reportlab.lib import colors
 from types import StringType, UnicodeType, InstanceType, TupleType, ListType, FloatType
@@ -686,7 +685,7 @@ class paragraphEngine:
                     if abs(thislineindent)>TOOSMALLSPACE:
                         #if debug: print "INDENTING", thislineindent
                         #textobject.moveCursor(thislineindent, 0)
-                        code.append('%s Td' % fp_str(thislineindent, 0))
+                        code.op('Td', thislineindent, 0)
                         self.x = self.x + thislineindent
                     for handler in self.lineOpHandlers:
                         #handler.end_at(x, y, self, canvas, textobject) # finish, eg, underlining this line
@@ -707,7 +706,7 @@ class paragraphEngine:
                 opcode = abs(opcode)
                 if opcode>TOOSMALLSPACE:
                     #textobject.moveCursor(opcode, 0)
-                    code.append('%s Td' % fp_str(opcode, 0))
+                    code.op('Td', opcode, 0)
                     self.x = self.x + opcode
             elif topcode is TupleType:
                 indicator = opcode[0]
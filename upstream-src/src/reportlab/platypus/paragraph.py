@@ -13,7 +13,8 @@ from reportlab.lib.colors import Color
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER, TA_JUSTIFY
 from reportlab.lib.utils import _className
 from reportlab.lib.geomutils import normalizeTRBL
-from reportlab.lib.textsplit import wordSplit, ALL_CANNOT_START
+from reportlab.lib.textsplit import wordSplit, ALL_CANNOT_START, Box, Glue, Penalty, kpBreaks, INFINITY_PENALTY, \
+        hyphenationPoints
 from copy import deepcopy
 from reportlab.lib.abag import ABag
 from reportlab.rl_config import platypus_link_underline 
@@ -432,6 +433,50 @@ def _getFragWords(frags,maxWidth=None):
 
     return R
 
+def _kpWordBreaks(widths, spaceWidths, maxWidths, lineBreaks=()):
+    """return the set of indices of the words which start a line in a
+    Knuth-Plass total fit breaking of words of widths.  Word i is preceded
+    by a space of spaceWidths[i] which can stretch by half (the lines are
+    never shrunk) or is glued to its predecessor if that's None; the words
+    in lineBreaks end their lines."""
+    items = []
+    starts = {}
+    a = items.append
+    end = (Penalty(0,INFINITY_PENALTY),Glue(0,1e5,0),Penalty(0,-INFINITY_PENALTY))
+    first = 1
+    for i in xrange(len(widths)):
+        if i in lineBreaks:
+            items.extend(end)
+            first = 1
+            continue
+        s = spaceWidths[i]
+        if not first and s is not None:
+            starts[len(items)] = i
+            a(Glue(s,0.5*s,0))
+        a(Box(widths[i]))
+        first = 0
+    items.extend(end)
+    return set([starts[b] for b in kpBreaks(items,maxWidths) if b in starts])
+
+def _hyphenSplit(word, lang, availWidth, fontName, fontSize, encoding='utf8'):
+    """split word at its last hyphenation point for which the head and its
+    hyphen are no wider than availWidth; returns (head,headWidth,tail,tailWidth)
+    or None"""
+    if availWidth<=0: return None
+    uword = isinstance(word,unicode) and word or word.decode(encoding)
+    P = hyphenationPoints(uword,lang)
+    for i in xrange(len(P)-1,-1,-1):
+        i = P[i]
+        head = uword[:i]+u'-'
+        headWidth = stringWidth(head,fontName,fontSize)
+        if headWidth<=availWidth:
+            tail = uword[i:]
+            if uword is not word:
+                head = head.encode(encoding)
+                tail = tail.encode(encoding)
+            return head, headWidth, tail, stringWidth(tail,fontName,fontSize)
+    return None
+
 def _split_blParaSimple(blPara,start,stop):
     f = blPara.clone()
     for a in ('lines', 'kind', 'text'):
@@ -765,6 +810,24 @@ def cjkFragSplit(frags, maxWidths, calcBounds, encoding='utf8'):
 
     return ParaLines(kind=1,lines=lines)
 
+#Paragraph.wrap remembers the breakings for its last _wrapCacheSize availWidths;
+#they're discarded when the frags (or the text, font and size of any of them)
+#or these style attributes change
+_wrapCacheSize = 8
+_wrapStyleAttrs = ('leftIndent','rightIndent','firstLineIndent','leading','autoLeading','wordWrap',
+            'hyphenationLang','bulletFontName','bulletFontSize','bulletIndent','fontName','fontSize')
+_wrapCacheCounts = [0,0]
+def wrapCacheInfo():
+    """return the number of Paragraph wraps answered from the wrap caches
+    and the number which had to break lines"""
+    return tuple(_wrapCacheCounts)
+
+def _reset():
+    _wrapCacheCounts[:] = [0,0]
+from reportlab.rl_config import register_reset
+register_reset(_reset)
+del register_reset
+
 class Paragraph(Flowable):
     """ Paragraph(text, style, bulletText=None, caseSensitive=1)
         text a string of stuff to go into the paragraph.
@@ -853,7 +916,26 @@ class Paragraph(Flowable):
         self.bulletText = bulletText
         self.debug = 0  #turn this on to see a pretty one with all the margins etc.
 
+    def _wrapStamp(self):
+        style = self.style
+        return (id(style), id(self.frags), id(self.bulletText), getattr(self,'encoding',None),
+                getattr(self,'autoLeading',None), getattr(self,'_splitpara',0),
+                tuple([(id(f),getattr(f,'text',None),getattr(f,'fontName',None),getattr(f,'fontSize',None)) for f in self.frags])
+                )+tuple([getattr(style,a,None) for a in _wrapStyleAttrs])
+
     def wrap(self, availWidth, availHeight):
+        #the lines only depend on availWidth so we remember a few breakings
+        stamp = self._wrapStamp()
+        cache = self.__dict__.get('_wrapCache',None)
+        if cache is None or cache[0]!=stamp:
+            cache = self._wrapCache = [stamp,{}]
+        cache = cache[1]
+        if availWidth in cache:
+            _wrapCacheCounts[0] += 1
+            self.blPara, self.width, self.height = cache[availWidth]
+            return self.width, self.height
+        _wrapCacheCounts[1] += 1
+
         # work out widths array for breaking
         self.width = availWidth
         style = self.style
@@ -889,6 +971,8 @@ class Paragraph(Flowable):
                 leading = blPara.ascent-blPara.descent
             height = len(blPara.lines) * leading
         self.height = height
+        if len(cache)>=_wrapCacheSize: cache.clear()
+        cache[availWidth] = blPara, self.width, height
         return self.width, height
 
     def minWidth(self):
@@ -965,6 +1049,8 @@ class Paragraph(Flowable):
                     del self.blPara #no room for adjustment; force the whole para onwards
                     return []
         func = self._get_split_blParaFunc()
+        #the split may change the lines' words
+        self.__dict__.pop('_wrapCache',None)
 
         P1=self.__class__(None,style,bulletText=self.bulletText,frags=func(blPara,0,s))
         #this is a major hack
@@ -1020,7 +1106,13 @@ class Paragraph(Flowable):
         You can supply either a single width or a list of widths; the latter will have its
         last item repeated until necessary. A 2-element list is useful when there is a
         different first line indent; a longer list could be created to facilitate custom wraps
-        around irregular objects."""
+        around irregular objects.
+
+        If style.wordWrap is 'KP' the lines are chosen together to minimise the spacing
+        variations (the Knuth-Plass total fit algorithm) rather than filled one at a time.
+
+        If style.hyphenationLang is set (eg 'en') a word which overflows a line is
+        hyphenated, if its patterns allow, to fill the line; KP breaking doesn't hyphenate."""
 
         if not isinstance(width,(tuple,list)): maxWidths = [width]
         else: maxWidths = width
@@ -1035,6 +1127,7 @@ class Paragraph(Flowable):
 
         autoLeading = getattr(self,'autoLeading',getattr(style,'autoLeading',''))
         calcBounds = autoLeading not in ('','off')
+        hyphenationLang = getattr(style,'hyphenationLang',None)
         frags = self.frags
         nFrags= len(frags)
         if nFrags==1 and not hasattr(frags[0],'cbDefn'):
@@ -1044,17 +1137,33 @@ class Paragraph(Flowable):
             ascent, descent = getAscentDescent(fontName,fontSize)
             words = hasattr(f,'text') and split(f.text, ' ') or f.words
             spaceWidth = stringWidth(' ', fontName, fontSize, self.encoding)
+            #this underscores my feeling that Unicode throughout would be easier!
+            wordWidths = [stringWidth(word, fontName, fontSize, self.encoding) for word in words]
+            if style.wordWrap=='KP':
+                breaks = _kpWordBreaks(wordWidths,len(words)*[spaceWidth],maxWidths)
+            else:
+                breaks = None
             cLine = []
             currentWidth = -spaceWidth   # hack to get around extra space for word 1
-            for word in words:
-                #this underscores my feeling that Unicode throughout would be easier!
-                wordWidth = stringWidth(word, fontName, fontSize, self.encoding)
+            for i in xrange(len(words)):
+                word = words[i]
+                wordWidth = wordWidths[i]
                 newWidth = currentWidth + spaceWidth + wordWidth
-                if newWidth <= maxWidth or not len(cLine):
+                if breaks is None:
+                    fits = newWidth <= maxWidth or not len(cLine)
+                else:
+                    fits = i not in breaks
+                if fits:
                     # fit one more on this line
                     cLine.append(word)
                     currentWidth = newWidth
                 else:
+                    if hyphenationLang and breaks is None:
+                        hs = _hyphenSplit(word,hyphenationLang,maxWidth-currentWidth-spaceWidth,fontName,fontSize,self.encoding)
+                        if hs:
+                            cLine.append(hs[0])
+                            currentWidth += spaceWidth+hs[1]
+                            word, wordWidth = hs[2:]
                     if currentWidth > self.width: self.width = currentWidth
                     #end of line
                     lines.append((maxWidth - currentWidth, cLine))
@@ -1083,7 +1192,19 @@ class Paragraph(Flowable):
                 return self.blPara
             n = 0
             words = []
-            for w in _getFragWords(frags,maxWidth):
+            fragWords = _getFragWords(frags,maxWidth)
+            if style.wordWrap=='KP':
+                breaks = _kpWordBreaks([w[0] for w in fragWords],
+                            [w[0]>0 and stringWidth(' ',w[-1][0].fontName,w[-1][0].fontSize) or None for w in fragWords],
+                            maxWidths,
+                            set([i for i in xrange(len(fragWords)) if hasattr(fragWords[i][1][0],'lineBreak')]))
+            else:
+                breaks = None
+            hyphenTail = None
+            iw = 0
+            while iw<len(fragWords):
+                w = fragWords[iw]
+                iw += 1
                 f=w[-1][0]
                 fontName = f.fontName
                 fontSize = f.fontSize
@@ -1104,7 +1225,21 @@ class Paragraph(Flowable):
                 #test to see if this frag is a line break. If it is we will only act on it
                 #if the current width is non-negative or the previous thing was a deliberate lineBreak
                 lineBreak = hasattr(f,'lineBreak')
-                endLine = (newWidth>maxWidth and n>0) or lineBreak
+                if breaks is None:
+                    endLine = (newWidth>maxWidth and n>0) or lineBreak or w is hyphenTail
+                    if (endLine and hyphenationLang and not lineBreak and w is not hyphenTail
+                            and len(w)==2 and w[1][1] and not hasattr(f,'cbDefn')):
+                        #put the word's head on this line and its tail at the start of the next
+                        hs = _hyphenSplit(w[1][1],hyphenationLang,maxWidth-currentWidth-spaceWidth,fontName,fontSize)
+                        if hs:
+                            w = [hs[1],(f,hs[0])]
+                            hyphenTail = [hs[3],(f,hs[2])]
+                            fragWords.insert(iw,hyphenTail)
+                            wordWidth = hs[1]
+                            newWidth = currentWidth + spaceWidth + wordWidth
+                            endLine = False
+                else:
+                    endLine = iw-1 in breaks or lineBreak
                 if not endLine:
                     if lineBreak: continue      #throw it away
                     nText = w[1][1]
@@ -17,7 +17,8 @@ except:
 import unicodedata
 import reportlab.lib.sequencer
 from reportlab.lib.abag import ABag
-from reportlab.lib.utils import ImageReader
+from reportlab.lib.utils import ImageReader, LRUCache
+from reportlab import rl_config
 
 from reportlab.lib import xmllib
 
@@ -476,6 +477,89 @@ greeks = {
 
     }
 
+#the paragraph markup tokens; starttags are (PT_START,tag,attrs) the rest (kind,value)
+#PT_BARE is an entity or (#digits) charref without its ;
+PT_DATA, PT_START, PT_END, PT_ENTITY, PT_CHARREF, PT_BARE, PT_CDATA = range(7)
+_ptName = '[a-zA-Z_:][-a-zA-Z0-9._:]*(?![-a-zA-Z0-9._:])'
+_ptValue = '(?:[^ \t\r\n>"\'<=/]|/(?!>))'
+_ptAttr = '[ \t\r\n]*(%s)(?:[ \t\r\n]*=[ \t\r\n]*("[^"]*"|\'[^\']*\'|%s+(?!%s)))?' % (_ptName,_ptValue,_ptValue)
+_ptAttrRe = re.compile(_ptAttr)
+_ptTokenRe = re.compile(r'''<(?P<start>%s)(?P<attrs>(?:%s)*)[ \t\r\n]*(?P<slash>/?)>|</(?P<end>%s)?[ \t\r\n]*>|<!--.*?-->|<!\[CDATA\[(?P<cdata>.*?)\]\]>|<[!?][^>]*>|&#(?P<charref>[xX][0-9a-fA-F]+|[0-9]+);?|&(?P<entity>%s)(?P<semi>;?)''' % (_ptName,_ptAttr,_ptName,_ptName),re.S)
+
+def _py_paraTokenize(text):
+    '''return the markup tokens of a paragraph text; anything
+    which isn't well formed markup is left in the data'''
+    R = []
+    i = 0
+    for m in _ptTokenRe.finditer(text):
+        j = m.start()
+        if j>i: R.append((PT_DATA,text[i:j]))
+        i = m.end()
+        start, attrs, slash, end, cdata, charref, entity, semi = m.group('start','attrs','slash','end','cdata','charref','entity','semi')
+        if start:
+            A = {}
+            for a in _ptAttrRe.finditer(attrs):
+                k, v = a.groups()
+                if v is None: v = k
+                elif v[0] in '"\'': v = v[1:-1]
+                A[str(k)] = v
+            R.append((PT_START,str(start),A))
+            if slash: R.append((PT_END,str(start)))
+        elif m.group(0)[:2]=='</':
+            R.append((PT_END,str(end or '')))
+        elif charref:
+            charref = str(charref[0]=='X' and 'x'+charref[1:] or charref)
+            if m.group(0)[-1]==';':
+                R.append((PT_CHARREF,charref))
+            else:
+                R.append((PT_BARE,'#'+charref))
+        elif entity:
+            R.append((semi and PT_ENTITY or PT_BARE,str(entity)))
+        elif cdata is not None:
+            if cdata: R.append((PT_CDATA,cdata))
+    if i<len(text): R.append((PT_DATA,text[i:]))
+    return R
+
+try:
+    from _rl_accel import paraTokenize
+except ImportError:
+    try:
+        from reportlab.lib._rl_accel import paraTokenize
+    except ImportError:
+        paraTokenize = _py_paraTokenize
+
+_ptRefRe = re.compile('&(#[0-9]+|#[xX][0-9a-fA-F]+|%s);?' % _ptName)
+def _ptRef(m):
+    r = m.group(1)
+    if r[0]=='#':
+        return unichr(r[1] in 'xX' and int(r[2:],16) or int(r[1:])).encode('utf8')
+    return xmllib.ENTITYDEFS.get(r,m.group(0))
+
+#successful ParaParser.parse results are remembered keyed on the text and
+#style identity; they're discarded when these style attributes change
+_parseStyleAttrs = ('fontName','fontSize','textColor','bulletFontName','bulletFontSize','bulletColor')
+_parseCache = []
+def _getParseCache():
+    if not _parseCache:
+        if not rl_config.paraParseCacheSize: return None
+        _parseCache.append(LRUCache(rl_config.paraParseCacheSize))
+    return _parseCache[0]
+
+def parseCacheInfo():
+    """return the ParaParser.parse cache hits, misses and size"""
+    if not _parseCache: return 0, 0, 0
+    cache = _parseCache[0]
+    return cache.hits, cache.misses, len(cache)
+
+def _copyFrags(frags):
+    return frags and [copy.copy(f) for f in frags]
+
+def _reset():
+    del _parseCache[:]
+from reportlab.rl_config import register_reset
+register_reset(_reset)
+del register_reset
+
 #------------------------------------------------------------------------
 class ParaFrag(ABag):
     """class ParaFrag contains the intermediate representation of string
@@ -501,6 +585,8 @@ def _greekConvert(data):
             else:
                 u = unichr(v).encode('utf8')
             _greek2Utf8[chr(k)] = u
+    if type(data) is UnicodeType:
+        return ''.join(map(_greek2Utf8.__getitem__,data.encode('utf8'))).decode('utf8')
     return ''.join(map(_greek2Utf8.__getitem__,data))
 
 #------------------------------------------------------------------
@@ -967,8 +1053,13 @@ class ParaParser(xmllib.XMLParser):
 
     #----------------------------------------------------------------
 
-    def __init__(self,verbose=0):
+    #if true a bare & or < is taken as data and a known entity or a charref
+    #may omit its ; otherwise those are errors as they are in xml
+    lenient = 0
+
+    def __init__(self,verbose=0,lenient=None):
         self.caseSensitive = 0
+        if lenient is not None: self.lenient = lenient
         xmllib.XMLParser.__init__(self,verbose=verbose)
 
     def _iReset(self):
@@ -977,7 +1068,8 @@ class ParaParser(xmllib.XMLParser):
 
     def _reset(self, style):
         '''reset the parser'''
-        xmllib.XMLParser.reset(self)
+        self.stack = []
+        self.lasttag = '???'
 
         # initialize list of string segments to empty
         self.errors = []
@@ -988,6 +1080,9 @@ class ParaParser(xmllib.XMLParser):
     def handle_data(self,data):
         "Creates an intermediate representation of string segments."
 
+        if self._UNI and type(data) is StringType:
+            #the handlers produce utf8
+            data = data.decode('utf8')
         frag = copy.copy(self._stack[-1])
         if hasattr(frag,'cbDefn'):
             kind = frag.cbDefn.kind
@@ -1031,31 +1126,82 @@ class ParaParser(xmllib.XMLParser):
         self._seq = reportlab.lib.sequencer.getSequencer()
         self._reset(style)  # reinitialise the parser
 
+    #starting any of these tags has side effects so the results can't be reused
+    _uncacheableTags = ('seq','seqdefault','seqreset','seqchain','seqformat')
+
+    def _feed(self, tokens):
+        "dispatch the paraTokenize tokens to the tag and data handlers"
+        uni = self._UNI
+        lenient = self.lenient
+        handle_data = self.handle_data
+        for t in tokens:
+            kind = t[0]
+            if kind==PT_DATA:
+                data = t[1]
+                if not lenient and ('<' in data or '&' in data):
+                    self._syntax_error('bogus < or &')
+                handle_data(data)
+            elif kind==PT_CDATA:
+                self.handle_cdata(t[1])
+            elif kind==PT_START:
+                tag, attrs = t[1:]
+                for k, v in attrs.items():
+                    if uni: v = v.encode('utf8')
+                    if '&' in v: v = _ptRefRe.sub(_ptRef,v)
+                    attrs[k] = v
+                if tag.lower() in self._uncacheableTags: self._cacheable = 0
+                self.finish_starttag(tag, attrs)
+            elif kind==PT_END:
+                self.finish_endtag(t[1])
+            elif kind==PT_ENTITY:
+                self.handle_entityref(t[1])
+            elif kind==PT_CHARREF:
+                self.handle_charref(t[1])
+            else:
+                name = t[1]
+                if name[0]=='#':
+                    if lenient:
+                        self.handle_charref(name[1:])
+                    else:
+                        self._syntax_error('; missing in charref')
+                elif not lenient:
+                    self._syntax_error('; missing in entityref')
+                elif name in greeks or name in self.entitydefs:
+                    #a bare &name is only an entity if we know it
+                    self.handle_entityref(name)
+                else:
+                    handle_data('&'+name)
+
     def parse(self, text, style):
         """Given a formatted string will return a list of
         ParaFrag objects with their calculated widths.
         If errors occur None will be returned and the
         self.errors holds a list of the error messages.
+        Unicode text is parsed as unicode; successful parses are
+        remembered (see rl_config.paraParseCacheSize).
         """
-        # AR 20040612 - when we feed Unicode strings in, sgmlop
-        # tries to coerce to ASCII.  Must intercept, coerce to
-        # any 8-bit encoding which defines most of 256 points,
-        # and revert at end.  Yuk.  Preliminary step prior to
-        # removal of parser altogether.
-        enc = self._enc = 'utf8' #our legacy default
         self._UNI = type(text) is UnicodeType
-        if self._UNI:
-            text = text.encode(enc)
+        cache = _getParseCache()
+        if cache is not None:
+            key = self.__class__, text, id(style), self.caseSensitive, self.lenient
+            stamp = tuple([getattr(style,a,None) for a in _parseStyleAttrs])
+            r = cache.get(key)
+            if r and r[0] is style and r[1]==stamp:
+                self.errors = []
+                return r[2], _copyFrags(r[3]), _copyFrags(r[4])
 
         self._setup_for_parse(style)
-        # the xmlparser requires that all text be surrounded by xml
+        # the handlers expect all text to be surrounded by para
         # tags, therefore we must throw some unused flags around the
         # given string
         if not(len(text)>=6 and text[0]=='<' and _re_para.match(text)):
             text = "<para>"+text+"</para>"
-        self.feed(text)
-        self.close()    # force parsing to complete
-        return self._complete_parse()
+        self._cacheable = 1
+        self._feed(paraTokenize(text))
+        r = self._complete_parse()
+        if cache is not None and self._cacheable and r[1] is not None:
+            cache[key] = (style,stamp,r[0],_copyFrags(r[1]),_copyFrags(r[2]))
+        return r
 
     def _complete_parse(self):
         del self._seq
@@ -1069,13 +1215,12 @@ class ParaParser(xmllib.XMLParser):
             fragList = bFragList = None
 
         if self._UNI:
-            #reconvert to unicode
-            if fragList:
-                for frag in fragList:
-                    frag.text = unicode(frag.text, self._enc)
-            if bFragList:
-                for frag in bFragList:
-                    frag.text = unicode(frag.text, self._enc)
+            #tt_parse data may still be utf8
+            for L in fragList, bFragList:
+                if L:
+                    for frag in L:
+                        if type(frag.text) is StringType:
+                            frag.text = frag.text.decode('utf8')
 
         return style, fragList, bFragList
 
@@ -294,6 +294,8 @@ class Table(Flowable):
         self.repeatRows = repeatRows
         self.repeatCols = repeatCols
         self.splitByRow = splitByRow
+        self._widthCache = {}
+        self._widthCacheCounts = [0,0]
 
         if style:
             self.setStyle(style)
@@ -385,6 +387,29 @@ class Table(Flowable):
                 sb0 = sb
         return w, t - sb0 - sa
 
+    def widthCacheInfo(self):
+        '''return the number of cell content widths this table has measured
+        and the number of times a measured width was reused'''
+        return tuple(self._widthCacheCounts)
+
+    def _cellWidth(self,i,j,natural=0):
+        '''the minimum (or with natural set the unwrapped) content width of
+        cell(i,j); each is measured only once per table'''
+        k = natural,i,j
+        C = self._widthCache
+        if k in C:
+            self._widthCacheCounts[1] += 1
+            return C[k]
+        self._widthCacheCounts[0] += 1
+        v = self._cellvalues[i][j]
+        if natural:
+            if isinstance(v,Flowable): v = (v,)
+            w = self._listValueWidth(v)
+        else:
+            w = self._elementWidth(v,self._cellStyles[i][j])
+        C[k] = w
+        return w
+
     def _listValueWidth(self,V,aH=72000,aW=72000):
         if not V: return 0,0
         t = 0
@@ -424,7 +449,7 @@ class Table(Flowable):
                     if ji in colSpanCells and not span: #if the current cell is part of a spanned region,
                         t = 0.0                         #assume a zero size.
                     else:#work out size
-                        t = self._elementWidth(v,s)
+                        t = self._cellWidth(i,j)
                         if t is None:
                             raise ValueError("Flowable %s in cell(%d,%d) can't have auto width\n%s" % (v.identity(30),i,j,self.identity(30)))
                         t += s.leftPadding+s.rightPadding
@@ -522,7 +547,7 @@ class Table(Flowable):
                             if ji in colSpanCells:
                                 if not span: continue
                                 w = max(colpositions[span[2]+1]-colpositions[span[0]],w)
-                            dW,t = self._listCellGeom(v,w or self._listValueWidth(v),s)
+                            dW,t = self._listCellGeom(v,w or self._cellWidth(i,j,1),s)
                             if canv: canv._fontname, canv._fontsize, canv._leading = saved
                             dW = dW + s.leftPadding + s.rightPadding
                             if not rl_config.allowTableBoundsErrors and dW>w:
@@ -562,6 +587,8 @@ class Table(Flowable):
 
     def _calc(self, availWidth, availHeight):
         #if hasattr(self,'_width'): return
+        #wrap and split are usually called with the same space
+        if getattr(self,'_calcArgs',None)==(availWidth,availHeight): return
 
         #in some cases there are unsizable things in
         #cells.  If so, apply a different algorithm
@@ -592,6 +619,7 @@ class Table(Flowable):
         if self._spanCmds:
             #now work out the actual rect for each spanned cell from the underlying grid
             self._calcSpanRects()
+        self._calcArgs = availWidth, availHeight
 
     def _hasVariWidthElements(self, upToRow=None):
         """Check for flowables in table cells and warn up front.
@@ -655,7 +683,7 @@ class Table(Flowable):
         unsizeable = []
         minimums = {}
         totalMinimum = 0
-        elementWidth = self._elementWidth
+        cellWidth = self._cellWidth
         for colNo in xrange(self._ncols):
             w = W[colNo]
             if w is None or w=='*' or _endswith(w,'%'):
@@ -664,7 +692,7 @@ class Table(Flowable):
                 for rowNo in xrange(self._nrows):
                     value = self._cellvalues[rowNo][colNo]
                     style = self._cellStyles[rowNo][colNo]
-                    new = elementWidth(value,style)+style.leftPadding+style.rightPadding
+                    new = cellWidth(rowNo,colNo)+style.leftPadding+style.rightPadding
                     final = max(current, new)
                     current = new
                     siz = siz and self._canGetWidth(value) # irrelevant now?
@@ -771,18 +799,16 @@ class Table(Flowable):
     def minWidth(self):
         W = list(self._argW)
         width = 0
-        elementWidth = self._elementWidth
+        cellWidth = self._cellWidth
         rowNos = xrange(self._nrows)
-        values = self._cellvalues
         styles = self._cellStyles
         for colNo in xrange(len(W)):
             w = W[colNo]
             if w is None or w=='*' or _endswith(w,'%'):
                 final = 0
                 for rowNo in rowNos:
-                    value = values[rowNo][colNo]
                     style = styles[rowNo][colNo]
-                    new = (elementWidth(value,style)+
+                    new = (cellWidth(rowNo,colNo)+
                            style.leftPadding+style.rightPadding)
                     final = max(final, new)
                 width += final
@@ -935,6 +961,8 @@ class Table(Flowable):
         self._hmax_spanRects = hmax
 
     def setStyle(self, tblstyle):
+        self._calcArgs = None
+        self._widthCache.clear()
         if not isinstance(tblstyle,TableStyle):
             tblstyle = TableStyle(tblstyle)
         for cmd in tblstyle.getCommands():
@@ -1155,6 +1183,23 @@ class Table(Flowable):
                 if er>=n: er = er-n
                 self._addCommand((c[0],)+((sc, sr), (ec, er))+c[3:])
 
+    def _splitRowHeights(self):
+        '''
+        The row heights to hand on to our split parts; rows we've measured
+        keep their height so the parts don't wrap their cells all over again.
+        Rows in a row span which runs past the measured rows (possible in long
+        tables) are left to be measured again.
+        '''
+        hmax = self._hmax
+        H = self._rowHeights[:hmax]+self._argH[hmax:]
+        if self._spanCmds and hmax<self._nrows:
+            argH = self._argH
+            for r in self._spanRanges.itervalues():
+                if r and r[1]<hmax<=r[3]:
+                    for y in xrange(r[1],hmax):
+                        H[y] = argH[y]
+        return H
+
     def _splitRows(self,availHeight):
         n=self._getFirstPossibleSplitRowPosition(availHeight)
         if n<=self.repeatRows: return []
@@ -1165,10 +1210,11 @@ class Table(Flowable):
         repeatCols = self.repeatCols
         splitByRow = self.splitByRow
         data = self._cellvalues
+        H = self._splitRowHeights()
 
         #we're going to split into two superRows
         #R0 = slelf.__class__( data[:n], self._argW, self._argH[:n],
-        R0 = self.__class__( data[:n], colWidths=self._colWidths, rowHeights=self._argH[:n],
+        R0 = self.__class__( data[:n], colWidths=self._colWidths, rowHeights=H[:n],
                 repeatRows=repeatRows, repeatCols=repeatCols,
                 splitByRow=splitByRow, normalizedData=1, cellStyles=self._cellStyles[:n])
 
@@ -1227,7 +1273,7 @@ class Table(Flowable):
         if repeatRows:
             #R1 = slelf.__class__(data[:repeatRows]+data[n:],self._argW,
             R1 = self.__class__(data[:repeatRows]+data[n:],colWidths=self._colWidths,
-                    rowHeights=self._argH[:repeatRows]+self._argH[n:],
+                    rowHeights=H[:repeatRows]+H[n:],
                     repeatRows=repeatRows, repeatCols=repeatCols,
                     splitByRow=splitByRow, normalizedData=1,
                     cellStyles=self._cellStyles[:repeatRows]+self._cellStyles[n:])
@@ -1237,7 +1283,7 @@ class Table(Flowable):
             R1._cr_1_1(n,repeatRows,self._nosplitCmds)
         else:
             #R1 = slelf.__class__(data[n:], self._argW, self._argH[n:],
-            R1 = self.__class__(data[n:], colWidths=self._colWidths, rowHeights=self._argH[n:],
+            R1 = self.__class__(data[n:], colWidths=self._colWidths, rowHeights=H[n:],
                     repeatRows=repeatRows, repeatCols=repeatCols,
                     splitByRow=splitByRow, normalizedData=1, cellStyles=self._cellStyles[n:])
             R1._cr_1_0(n,A)
@@ -5,7 +5,7 @@ __version__=''' $Id$ '''
 __doc__='''Configuration file.  You may edit this if you wish.'''
 
 allowTableBoundsErrors =    1 # set to 0 to die on too large elements in tables in debug (recommend 1 for production use)
-shapeChecking =             1
+shapeChecking =             1                       #0 no checks, 1 check assignments, 2 also check drawings when they're rendered
 defaultEncoding =           'WinAnsiEncoding'       # 'WinAnsi' or 'MacRoman'
 defaultGraphicsFontName=    'Times-Roman'           #initializer for STATE_DEFAULTS in shapes.py
 pageCompression =           1                       # default page compression mode
@@ -46,6 +46,18 @@ paraFontSizeHeightOffset=   0                       #if true paragraphs start at
 canvas_baseColor=           None                    #initialize the canvas fill and stroke colors if this is set
 ignoreContainerActions=     1                       #if true then action flowables in flowable _Containers will be ignored
 ttfAsciiReadable=           1                       #smaller subsets when set to 0
+pdfStreamOutput=            0                       #if 1 canvases write finished page streams and images straight to the
+                                                    #output file; 2 does the same via a temporary spool file
+hyphenationCacheSize=       20000                   #number of (language, word) hyphenations remembered
+stringWidthCacheSize=       5000                    #number of text widths remembered per font by pdfmetrics.stringWidth; 0 to disable
+paraParseCacheSize=         1000                    #number of paragraph markup parses remembered by ParaParser.parse; 0 to disable
+toColorCacheSize=           500                     #number of color strings remembered by colors.toColor; 0 to disable
+formCaching=                1                       #set to 0 to stop repeated drawings being reused as form xobjects
+ttfInfoCaching=             1                       #if true the metrics TTFontFile extracts are kept in a temporary folder
+cmapCaching=                1                       #if true the CMap tables CIDEncoding parses are kept in a temporary folder
+pdfStreamThreads=           0                       #number of threads filtering (compressing) the streams of a document
+                                                    #before it's written; 0 filters each stream as it is written
+zlibCompressionLevel=       6                       #1-9 level used by the FlateDecode stream filter
 
 # places to look for T1Font information
 T1SearchPath =  (
@@ -120,6 +132,14 @@ CMapSearchPath = (
                   '%(HOME)s/fonts/CMap',                #special
                   )
 
+# places to look for hyphenation pattern files (hyph_<lang>.mashed)
+HyphenationSearchPath = (
+                  '/usr/local/share/pyHnj',
+                  '/usr/share/pyHnj',
+                  '%(REPORTLAB_DIR)s/lib',                      #special
+                  '%(HOME)s/hyphenation',                       #special
+                  )
+
 #### Normally don't need to edit below here ####
 try:
     from local_rl_config import *
@@ -146,6 +166,7 @@ def _startUp():
     V='''T1SearchPath
 CMapSearchPath
 TTFSearchPath
+HyphenationSearchPath
 allowTableBoundsErrors
 shapeChecking
 defaultEncoding 
@@ -177,7 +198,17 @@ imageReaderFlags
 paraFontSizeHeightOffset
 canvas_baseColor
 ignoreContainerActions
-ttfAsciiReadable'''.split()
+ttfAsciiReadable
+pdfStreamOutput
+hyphenationCacheSize
+stringWidthCacheSize
+paraParseCacheSize
+toColorCacheSize
+formCaching
+ttfInfoCaching
+cmapCaching
+pdfStreamThreads
+zlibCompressionLevel'''.split()
     import os, sys
     global sys_version, _unset_
     sys_version = sys.version.split()[0]        #strip off the other garbage
@@ -200,14 +231,14 @@ ttfAsciiReadable'''.split()
         'sys_version': sys_version,
         }
 
-    for name in ('T1SearchPath','TTFSearchPath','CMapSearchPath'):
+    for name in ('T1SearchPath','TTFSearchPath','CMapSearchPath','HyphenationSearchPath'):
         P=[]
         for p in _SAVED[name]:
             d = (p % D).replace('/',os.sep)
             if rl_isdir(d): P.append(d)
         _setOpt(name,P)
 
-    for k in V[3:]:
+    for k in V[4:]:
         v = _SAVED[k]
         if isinstance(v,(int,float)): conv = type(v)
         elif k=='defaultPageSize': conv = lambda v,M=pagesizes: getattr(M,v)
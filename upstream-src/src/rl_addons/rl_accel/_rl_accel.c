@@ -29,7 +29,7 @@ static __version__=" $Id$ "
 #ifndef min
 #	define min(a,b) ((a)<(b)?(a):(b))
 #endif
-#define VERSION "0.63"
+#define VERSION "0.66"
 #define MODULE "_rl_accel"
 
 static PyObject *moduleVersion;
@@ -952,7 +952,7 @@ typedef struct {
 
 static void BoxFree(BoxObject* self)
 {
-	PyMem_DEL(self);
+	PyObject_DEL(self);
 }
 
 static int Box_set_int(char* name, int* pd, PyObject *value)
@@ -1129,6 +1129,178 @@ static BoxObject* Penalty(PyObject* module, PyObject* args, PyObject* kw)
 	self->flagged = flagged;
 	return self;
 }
+/*Knuth-Plass total fit line breaking*/
+#define KP_INF 10000.0
+#define KP_RMAX 1000.0
+typedef struct {
+	int		pos, line, fitness, from, prev, next;
+	double	demerits, tw, ty, tz;
+	} KPNode;
+
+static int _kpNewNode(KPNode **pN, int *nN, int *aN)
+{
+	if(*nN==*aN){
+		int a = *aN ? 2*(*aN) : 64;
+		KPNode *N = (KPNode*)realloc(*pN,a*sizeof(KPNode));
+		if(!N){
+			PyErr_NoMemory();
+			return -1;
+			}
+		*pN = N;
+		*aN = a;
+		}
+	return (*nN)++;
+}
+
+static PyObject* kpBreaks(PyObject* module, PyObject* args, PyObject* kw)
+{
+	char	*kwlist[] = {"items","lineWidths","linePenalty","adjDemerits","flaggedDemerits",NULL};
+	PyObject	*pItems, *pWidths, *seq=NULL, *wseq=NULL, *res=NULL, *v;
+	double	linePenalty=10, adjDemerits=10000, flaggedDemerits=3000;
+	double	*T=NULL, *LW=NULL, w, y, z, r, L, d, p, best[4];
+	int		n, nLW, i, b, a, s, f, active, next, last, k, from[4];
+	BoxObject	*B, **I;
+	KPNode	*N=NULL;
+	int		nN=0, aN=0;
+
+	if(!PyArg_ParseTupleAndKeywords(args,kw,"OO|ddd:kpBreaks",kwlist,&pItems,&pWidths,&linePenalty,&adjDemerits,&flaggedDemerits)) return NULL;
+	if(!(seq=PySequence_Fast(pItems,"kpBreaks: items must be a sequence"))) return NULL;
+	if(!(wseq=PySequence_Fast(pWidths,"kpBreaks: lineWidths must be a sequence"))) goto L_err;
+	n = PySequence_Fast_GET_SIZE(seq);
+	nLW = PySequence_Fast_GET_SIZE(wseq);
+	if(!nLW){
+		PyErr_SetString(PyExc_ValueError,"kpBreaks: lineWidths must not be empty");
+		goto L_err;
+		}
+	I = (BoxObject**)PySequence_Fast_ITEMS(seq);
+	for(i=0;i<n;i++){
+		if(I[i]->ob_type!=&BoxType){
+			PyErr_Format(PyExc_TypeError,"kpBreaks: item %d is not a Box, Glue or Penalty",i);
+			goto L_err;
+			}
+		}
+	if(!(LW=(double*)malloc(nLW*sizeof(double))) || !(T=(double*)malloc(3*(n+1)*sizeof(double)))){
+		PyErr_NoMemory();
+		goto L_err;
+		}
+	for(i=0;i<nLW;i++){
+		LW[i] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(wseq,i));
+		if(PyErr_Occurred()) goto L_err;
+		}
+
+	/*T[3*i],T[3*i+1],T[3*i+2] are the width, stretch and shrink totals of items[:i]*/
+	T[0] = T[1] = T[2] = 0;
+	for(i=0;i<n;i++){
+		B = I[i];
+		T[3*i+3] = T[3*i] + (B->is_penalty ? 0 : B->width);
+		T[3*i+4] = T[3*i+1] + (B->is_glue ? B->stretch : 0);
+		T[3*i+5] = T[3*i+2] + (B->is_glue ? B->shrink : 0);
+		}
+
+	if((active=_kpNewNode(&N,&nN,&aN))<0) goto L_err;
+	N[0].pos = N[0].from = N[0].prev = N[0].next = -1;
+	N[0].line = 0;
+	N[0].fitness = 1;
+	N[0].demerits = N[0].tw = N[0].ty = N[0].tz = 0;
+
+	for(b=0;b<n && active>=0;b++){
+		B = I[b];
+		if(B->is_box) continue;
+		if(B->is_glue){
+			if(!b || !I[b-1]->is_box) continue;
+			p = 0;
+			}
+		else {
+			p = B->penalty;
+			if(p>=KP_INF) continue;
+			}
+		for(f=0;f<4;f++) from[f] = -1;
+		last = -1;
+		for(a=active;a>=0;a=next){
+			next = N[a].next;
+			w = T[3*b] - N[a].tw;
+			y = T[3*b+1] - N[a].ty;
+			z = T[3*b+2] - N[a].tz;
+			if(B->is_penalty) w += B->width;
+			L = LW[N[a].line<nLW ? N[a].line : nLW-1];
+			if(w<L) r = y>0 ? min((L-w)/y,KP_RMAX) : KP_RMAX;
+			else if(w>L) r = z>0 ? (L-w)/z : -KP_RMAX;
+			else r = 0;
+			if(r< -1 || p<= -KP_INF){
+				/*no later line can start at a*/
+				if(N[a].prev>=0) N[N[a].prev].next = next;
+				else active = next;
+				if(next>=0) N[next].prev = N[a].prev;
+				if(r< -1){
+					if(last<0 || N[a].pos>N[last].pos) last = a;
+					continue;
+					}
+				}
+			d = linePenalty + 100*fabs(r*r*r);
+			d *= d;
+			if(p>0) d += p*p;
+			else if(p> -KP_INF) d -= p*p;
+			if(B->is_penalty && B->flagged && N[a].pos>=0 && I[N[a].pos]->is_penalty && I[N[a].pos]->flagged) d += flaggedDemerits;
+			f = r< -0.5 ? 0 : (r<=0.5 ? 1 : (r<=1 ? 2 : 3));
+			if(abs(f-N[a].fitness)>1) d += adjDemerits;
+			d += N[a].demerits;
+			if(from[f]<0 || d<best[f]){
+				from[f] = a;
+				best[f] = d;
+				}
+			}
+		if(active<0 && last>=0){
+			for(f=0;f<4 && from[f]<0;f++);
+			if(f==4){
+				/*nothing fits so the latest break gets an overfull line*/
+				from[1] = last;
+				best[1] = N[last].demerits + KP_INF*KP_INF;
+				}
+			}
+		/*the next line starts at the first box or forced break after b*/
+		for(s=b+1;s<n && !I[s]->is_box && !(I[s]->is_penalty && I[s]->penalty<= -KP_INF);s++);
+		for(f=0;f<4;f++){
+			if(from[f]<0) continue;
+			if((k=_kpNewNode(&N,&nN,&aN))<0) goto L_err;
+			N[k].pos = b;
+			N[k].line = N[from[f]].line+1;
+			N[k].fitness = f;
+			N[k].from = from[f];
+			N[k].demerits = best[f];
+			N[k].tw = T[3*s];
+			N[k].ty = T[3*s+1];
+			N[k].tz = T[3*s+2];
+			N[k].prev = -1;
+			N[k].next = active;
+			if(active>=0) N[active].prev = k;
+			active = k;
+			}
+		}
+
+	/*the best of the latest breaks ends the paragraph*/
+	for(k=-1,a=active;a>=0;a=N[a].next){
+		if(k<0 || N[a].pos>N[k].pos || (N[a].pos==N[k].pos && N[a].demerits<N[k].demerits)) k = a;
+		}
+	if(!(res=PyList_New(0))) goto L_err;
+	for(;k>=0 && N[k].pos>=0;k=N[k].from){
+		if(!(v=PyInt_FromLong(N[k].pos))) goto L_err;
+		i = PyList_Append(res,v);
+		Py_DECREF(v);
+		if(i) goto L_err;
+		}
+	if(PyList_Reverse(res)) goto L_err;
+	goto L_done;
+L_err:
+	Py_XDECREF(res);
+	res = NULL;
+L_done:
+	Py_XDECREF(seq);
+	Py_XDECREF(wseq);
+	if(T) free(T);
+	if(LW) free(LW);
+	if(N) free(N);
+	return res;
+}
 /*Box end****************/
 /* BoxList -- a list subtype */
 typedef struct {
@@ -1240,6 +1412,1116 @@ static PyTypeObject BoxList_type = {
 };
 #endif
 
+/*paraTokenize start****************/
+/* a lenient tokenizer for the platypus paragraph markup; it returns a list
+   of (kind,value) tuples, starttags are (1,tag,attrs). Anything which isn't
+   well formed markup is left in the data; ParaParser decides whether that
+   is an error. An entity or charref without its ; is PT_BARE (name or
+   #digits) and CDATA contents are PT_CDATA. */
+#define PT_DATA		0
+#define PT_START	1
+#define PT_END		2
+#define PT_ENTITY	3
+#define PT_CHARREF	4
+#define PT_BARE		5
+#define PT_CDATA	6
+typedef struct {
+	Py_UNICODE		*u;
+	unsigned char	*s;
+	int				n;
+	} PTText;
+#define PT_CH(t,i) ((t)->u ? (long)(t)->u[i] : (long)(t)->s[i])
+#define PT_ISSPACE(c) ((c)==' ' || (c)=='\t' || (c)=='\r' || (c)=='\n')
+#define PT_ISNAME0(c) (((c)>='a' && (c)<='z') || ((c)>='A' && (c)<='Z') || (c)=='_' || (c)==':')
+#define PT_ISNAME1(c) (PT_ISNAME0(c) || ((c)>='0' && (c)<='9') || (c)=='-' || (c)=='.')
+#define PT_ISDIGIT(c) ((c)>='0' && (c)<='9')
+#define PT_ISHEX(c) (PT_ISDIGIT(c) || ((c)>='a' && (c)<='f') || ((c)>='A' && (c)<='F'))
+
+static PyObject *_ptSlice(PTText *t, int i, int j)
+{
+	if(t->u) return PyUnicode_FromUnicode(t->u+i,j-i);
+	return PyString_FromStringAndSize((char *)t->s+i,j-i);
+}
+
+/* names are always ascii so we return them as plain strings */
+static PyObject *_ptName(PTText *t, int i, int j)
+{
+	PyObject	*r = PyString_FromStringAndSize(NULL,j-i);
+	char		*p;
+	if(r){
+		p = PyString_AS_STRING(r);
+		for(;i<j;i++) *p++ = (char)PT_CH(t,i);
+		}
+	return r;
+}
+
+static int _ptAdd(PyObject *L, int kind, PyObject *v, PyObject *a)
+{
+	PyObject	*r;
+	int			e;
+	if(!v){
+		Py_XDECREF(a);
+		return -1;
+		}
+	r = a ? Py_BuildValue("(iNN)",kind,v,a) : Py_BuildValue("(iN)",kind,v);
+	if(!r) return -1;
+	e = PyList_Append(L,r);
+	Py_DECREF(r);
+	return e;
+}
+
+static int _ptMatch(PTText *t, int i, char *pat)
+{
+	int	j, m = strlen(pat);
+	if(i+m>t->n) return 0;
+	for(j=0;j<m && PT_CH(t,i+j)==pat[j];j++);
+	return j==m;
+}
+
+static int _ptFind(PTText *t, int i, char *pat)
+{
+	int	j, m = strlen(pat);
+	for(;i+m<=t->n;i++){
+		for(j=0;j<m && PT_CH(t,i+j)==pat[j];j++);
+		if(j==m) return i;
+		}
+	return -1;
+}
+
+static int _ptSkipSpace(PTText *t, int i)
+{
+	while(i<t->n && PT_ISSPACE(PT_CH(t,i))) i++;
+	return i;
+}
+
+static int _ptScanName(PTText *t, int i)
+{
+	if(i>=t->n || !PT_ISNAME0(PT_CH(t,i))) return i;
+	for(i++;i<t->n && PT_ISNAME1(PT_CH(t,i));i++);
+	return i;
+}
+
+/* try to scan a start tag at i (t[i]=='<'); returns the index after it or -1 */
+static int _ptStartTag(PTText *t, int i, PyObject **pTag, PyObject **pAttrs, int *selfClosing)
+{
+	int			n=t->n, j, k, a, e, b, q;
+	long		c;
+	PyObject	*attrs=NULL, *name=NULL, *value=NULL;
+
+	j = _ptScanName(t,i+1);
+	if(j==i+1) return -1;
+	k = j;
+	for(;;){
+		k = _ptSkipSpace(t,k);
+		if(k>=n) goto L_FAIL;
+		c = PT_CH(t,k);
+		if(c=='>'){
+			k++;
+			*selfClosing = 0;
+			break;
+			}
+		if(c=='/' && k+1<n && PT_CH(t,k+1)=='>'){
+			k += 2;
+			*selfClosing = 1;
+			break;
+			}
+		a = k;
+		e = k = _ptScanName(t,k);
+		if(e==a) goto L_FAIL;
+		q = _ptSkipSpace(t,e);
+		if(q<n && PT_CH(t,q)=='='){
+			q = _ptSkipSpace(t,q+1);
+			if(q>=n) goto L_FAIL;
+			c = PT_CH(t,q);
+			if(c=='"' || c=='\''){
+				for(b=q+1;b<n && PT_CH(t,b)!=c;b++);
+				if(b>=n) goto L_FAIL;
+				value = _ptSlice(t,q+1,b);
+				k = b+1;
+				}
+			else{
+				for(b=q;b<n;b++){
+					c = PT_CH(t,b);
+					if(PT_ISSPACE(c) || c=='>' || c=='"' || c=='\'' || c=='<' || c=='=') break;
+					if(c=='/' && b+1<n && PT_CH(t,b+1)=='>') break;
+					}
+				if(b==q) goto L_FAIL;
+				value = _ptSlice(t,q,b);
+				k = b;
+				}
+			}
+		else
+			value = _ptSlice(t,a,e);
+		if(!value) goto L_ERR;
+		if(!attrs && !(attrs=PyDict_New())) goto L_ERR;
+		if(!(name=_ptName(t,a,e))) goto L_ERR;
+		if(PyDict_SetItem(attrs,name,value)) goto L_ERR;
+		Py_DECREF(name);
+		Py_DECREF(value);
+		name = value = NULL;
+		}
+	if(!attrs && !(attrs=PyDict_New())) goto L_ERR;
+	if(!(*pTag=_ptName(t,i+1,j))) goto L_ERR;
+	*pAttrs = attrs;
+	return k;
+L_FAIL:
+	Py_XDECREF(attrs);
+	Py_XDECREF(value);
+	return -1;
+L_ERR:
+	Py_XDECREF(attrs);
+	Py_XDECREF(name);
+	Py_XDECREF(value);
+	return -2;
+}
+
+static PyObject *paraTokenize(PyObject *module, PyObject *args)
+{
+	PyObject	*text, *L=NULL, *tag, *attrs;
+	PTText		T, *t=&T;
+	int			i, j, k, d, m, n, selfClosing;
+	long		c;
+
+	if(!PyArg_ParseTuple(args, "O:paraTokenize", &text)) return NULL;
+	if(PyUnicode_Check(text)){
+		t->u = PyUnicode_AS_UNICODE(text);
+		t->s = NULL;
+		t->n = PyUnicode_GET_SIZE(text);
+		}
+	else if(PyString_Check(text)){
+		t->u = NULL;
+		t->s = (unsigned char *)PyString_AS_STRING(text);
+		t->n = PyString_GET_SIZE(text);
+		}
+	else{
+		PyErr_SetString(PyExc_TypeError, "paraTokenize: argument must be a string or unicode");
+		return NULL;
+		}
+	if(!(L=PyList_New(0))) return NULL;
+	n = t->n;
+	i = d = 0;
+	while(i<n){
+		c = PT_CH(t,i);
+		if(c=='<'){
+			if(i+1>=n){
+				i++;
+				continue;
+				}
+			c = PT_CH(t,i+1);
+			if(PT_ISNAME0(c)){
+				k = _ptStartTag(t,i,&tag,&attrs,&selfClosing);
+				if(k==-2) goto L_ERR;
+				if(k<0){
+					i++;
+					continue;
+					}
+				if(d<i && _ptAdd(L,PT_DATA,_ptSlice(t,d,i),NULL)){
+					Py_DECREF(tag);
+					Py_DECREF(attrs);
+					goto L_ERR;
+					}
+				if(selfClosing) Py_INCREF(tag);
+				if(_ptAdd(L,PT_START,tag,attrs)){
+					if(selfClosing) Py_DECREF(tag);
+					goto L_ERR;
+					}
+				if(selfClosing && _ptAdd(L,PT_END,tag,NULL)) goto L_ERR;
+				i = d = k;
+				continue;
+				}
+			else if(c=='/'){
+				j = _ptScanName(t,i+2);
+				k = _ptSkipSpace(t,j);
+				if(k>=n || PT_CH(t,k)!='>'){
+					i++;
+					continue;
+					}
+				if(d<i && _ptAdd(L,PT_DATA,_ptSlice(t,d,i),NULL)) goto L_ERR;
+				if(_ptAdd(L,PT_END,_ptName(t,i+2,j),NULL)) goto L_ERR;
+				i = d = k+1;
+				continue;
+				}
+			else if(c=='!' || c=='?'){
+				j = k = -1;
+				if(_ptMatch(t,i,"<!--")){
+					if((k=_ptFind(t,i+4,"-->"))>=0) j = k+3;
+					}
+				else if(_ptMatch(t,i,"<![CDATA[")){
+					if((k=_ptFind(t,i+9,"]]>"))>=0) j = k+3;
+					}
+				if(j<0){
+					k = _ptFind(t,i,">");
+					if(k<0){
+						i++;
+						continue;
+						}
+					j = k+1;
+					k = -1;
+					}
+				if(d<i && _ptAdd(L,PT_DATA,_ptSlice(t,d,i),NULL)) goto L_ERR;
+				if(k>i+9 && PT_CH(t,i+2)=='[' && _ptAdd(L,PT_CDATA,_ptSlice(t,i+9,k),NULL)) goto L_ERR;
+				i = d = j;
+				continue;
+				}
+			i++;
+			}
+		else if(c=='&'){
+			if(i+1<n && PT_CH(t,i+1)=='#'){
+				j = i+2;
+				k = j;
+				if(k<n && (PT_CH(t,k)=='x' || PT_CH(t,k)=='X')){
+					for(k++;k<n && PT_ISHEX(PT_CH(t,k));k++);
+					if(k==j+1) k = j;
+					}
+				else
+					for(;k<n && PT_ISDIGIT(PT_CH(t,k));k++);
+				if(k==j){
+					i++;
+					continue;
+					}
+				if(d<i && _ptAdd(L,PT_DATA,_ptSlice(t,d,i),NULL)) goto L_ERR;
+				/*without the ; it's bare and keeps its #*/
+				m = k<n && PT_CH(t,k)==';' ? 0 : 1;
+				tag = _ptName(t,j-m,k);
+				if(tag && PT_CH(t,j)=='X') PyString_AS_STRING(tag)[m] = 'x';
+				if(_ptAdd(L,m ? PT_BARE : PT_CHARREF,tag,NULL)) goto L_ERR;
+				if(!m) k++;
+				i = d = k;
+				continue;
+				}
+			j = _ptScanName(t,i+1);
+			if(j==i+1){
+				i++;
+				continue;
+				}
+			if(d<i && _ptAdd(L,PT_DATA,_ptSlice(t,d,i),NULL)) goto L_ERR;
+			if(j<n && PT_CH(t,j)==';'){
+				if(_ptAdd(L,PT_ENTITY,_ptName(t,i+1,j),NULL)) goto L_ERR;
+				j++;
+				}
+			else if(_ptAdd(L,PT_BARE,_ptName(t,i+1,j),NULL)) goto L_ERR;
+			i = d = j;
+			}
+		else
+			i++;
+		}
+	if(d<n && _ptAdd(L,PT_DATA,_ptSlice(t,d,n),NULL)) goto L_ERR;
+	return L;
+L_ERR:
+	Py_XDECREF(L);
+	return NULL;
+}
+/*paraTokenize end****************/
+
+/*pdfFormat start****************/
+/* formats the common pdfdoc objects (exact PDFDictionary, PDFArray,
+   PDFArrayCompact, PDFObjectReference instances, strings and numbers) without
+   going through python; anything else is handed to the python fallback which
+   pdfdoc registers with _setPDFFormat. The helpers return NULL with no error
+   set when the python version must be used instead. */
+static PyObject *_pfFallback=NULL, *_pfDictClass=NULL, *_pfArrayClass=NULL, *_pfArrayCompactClass=NULL, *_pfRefClass=NULL;
+static PyObject *_pfLineEnd=NULL, *_pfInd=NULL, *_pfSpace=NULL, *_pfRefFmt=NULL;
+
+static PyObject *_pfFormat(PyObject *el, PyObject *doc, int toplevel);
+
+/*the formatted parts are joined in C so they must all be strings*/
+static PyObject *_pfFormatStr(PyObject *el, PyObject *doc)
+{
+	PyObject	*r = _pfFormat(el,doc,0);
+	if(r && !PyString_Check(r)){
+		PyErr_Format(PyExc_TypeError,"pdfFormat: formatting %.200s gave a %.200s not a string",el->ob_type->tp_name,r->ob_type->tp_name);
+		Py_DECREF(r);
+		r = NULL;
+		}
+	return r;
+}
+
+static PyObject *_pfName(PyObject *data)
+{
+	unsigned char	*s = (unsigned char *)PyString_AS_STRING(data), c;
+	int				i, n = PyString_GET_SIZE(data);
+	char			*q;
+	PyObject		*r = PyString_FromStringAndSize(NULL,1+3*n);
+	if(!r) return NULL;
+	q = PyString_AS_STRING(r);
+	*q++ = '/';
+	for(i=0;i<n;i++){
+		c = s[i];
+		if(c<0x21 || c>0x7e || strchr("%()<>{}[]#",c)) q += sprintf(q,"#%x",c);
+		else *q++ = c;
+		}
+	_PyString_Resize(&r,q-PyString_AS_STRING(r));
+	return r;
+}
+
+/*return a+s+b where s is a string and a, b are C strings*/
+static PyObject *_pfEnclose(char *a, PyObject *s, char *b)
+{
+	int			la=strlen(a), ls, lb=strlen(b);
+	char		*q;
+	PyObject	*r;
+	if(!s) return NULL;
+	ls = PyString_GET_SIZE(s);
+	r = PyString_FromStringAndSize(NULL,la+ls+lb);
+	if(r){
+		q = PyString_AS_STRING(r);
+		memcpy(q,a,la);
+		memcpy(q+la,PyString_AS_STRING(s),ls);
+		memcpy(q+la+ls,b,lb);
+		}
+	Py_DECREF(s);
+	return r;
+}
+
+static int _pfMultiline(PyObject *el)
+{
+	int			r;
+	PyObject	*m = PyObject_GetAttrString(el,"multiline");
+	if(!m) return -1;
+	r = PyObject_IsTrue(m);
+	Py_DECREF(m);
+	return r;
+}
+
+static PyObject *_pfRef(PyObject *d, PyObject *doc)
+{
+	PyObject	*name = PyDict_GetItemString(d,"name"), *m, *t, *r=NULL;
+	if(!name) return NULL;
+	if((m=PyObject_GetAttrString(doc,"idToObjectNumberAndVersion"))){
+		if((t=PyObject_GetItem(m,name))){
+			r = PyString_Format(_pfRefFmt,t);
+			Py_DECREF(t);
+			}
+		Py_DECREF(m);
+		}
+	/*python raises the unresolved forward reference error*/
+	if(!r) PyErr_Clear();
+	return r;
+}
+
+static PyObject *_pfDict(PyObject *el, PyObject *D, PyObject *doc)
+{
+	PyObject	*L, *k, *v, *s, *t, *sep;
+	int			i, n, ml;
+	char		*q;
+	if(!PyDict_CheckExact(D)) return NULL;
+	if(!(L=PyDict_Keys(D))) return NULL;
+	if(PyList_Sort(L)) goto L_ERR;
+	n = PyList_GET_SIZE(L);
+	for(i=0;i<n;i++){
+		if(!PyString_CheckExact(PyList_GET_ITEM(L,i))){
+			Py_DECREF(L);
+			return NULL;
+			}
+		}
+	for(i=0;i<n;i++){
+		k = PyList_GET_ITEM(L,i);
+		if(!(v=PyDict_GetItem(D,k))){
+			PyErr_SetObject(PyExc_KeyError,k);
+			goto L_ERR;
+			}
+		Py_INCREF(v);
+		t = _pfFormatStr(v,doc);
+		Py_DECREF(v);
+		if(!t) goto L_ERR;
+		if(!(s=_pfName(k))){
+			Py_DECREF(t);
+			goto L_ERR;
+			}
+		v = PyString_FromStringAndSize(NULL,PyString_GET_SIZE(s)+1+PyString_GET_SIZE(t));
+		if(v){
+			q = PyString_AS_STRING(v);
+			memcpy(q,PyString_AS_STRING(s),PyString_GET_SIZE(s));
+			q += PyString_GET_SIZE(s);
+			*q++ = ' ';
+			memcpy(q,PyString_AS_STRING(t),PyString_GET_SIZE(t));
+			}
+		Py_DECREF(s);
+		Py_DECREF(t);
+		if(!v || PyList_SetItem(L,i,v)) goto L_ERR;
+		}
+	if((ml=_pfMultiline(el))<0) goto L_ERR;
+	if(ml) sep = _pfInd;
+	else{
+		/*break up every 6 elements anyway*/
+		for(i=6;i<n;i+=6) if(PyList_Insert(L,i,_pfLineEnd)) goto L_ERR;
+		sep = _pfSpace;
+		}
+	s = _PyString_Join(sep,L);
+	Py_DECREF(L);
+	return _pfEnclose("<< ",s," >>");
+L_ERR:
+	Py_DECREF(L);
+	if(!PyErr_Occurred()) PyErr_SetString(ErrorObject,"pdfFormat: dictionary formatting failed");
+	return NULL;
+}
+
+static PyObject *_pfArray(PyObject *el, PyObject *S, PyObject *doc)
+{
+	PyObject	*L, *t, *s;
+	int			i, n, m, ml, ls, le;
+	char		*q, *lineend;
+	if(!PyList_CheckExact(S)) return NULL;
+	if(!(L=PyList_GetSlice(S,0,PyList_GET_SIZE(S)))) return NULL;
+	n = PyList_GET_SIZE(L);
+	for(i=0;i<n;i++){
+		if(!(t=_pfFormatStr(PyList_GET_ITEM(L,i),doc)) || PyList_SetItem(L,i,t)) goto L_ERR;
+		}
+	if((ml=_pfMultiline(el))<0) goto L_ERR;
+	if(ml) s = _PyString_Join(_pfInd,L);
+	else if(n>10){
+		/*break up every 10 elements anyway*/
+		lineend = PyString_AS_STRING(_pfLineEnd);
+		le = PyString_GET_SIZE(_pfLineEnd);
+		m = (n/10)*10;
+		for(ls=i=0;i<n;i++) ls += PyString_GET_SIZE(PyList_GET_ITEM(L,i))+(i<m && i%10==9 ? le : 1);
+		if(!(t=PyString_FromStringAndSize(NULL,ls))) goto L_ERR;
+		q = PyString_AS_STRING(t);
+		for(i=0;i<n;i++){
+			s = PyList_GET_ITEM(L,i);
+			memcpy(q,PyString_AS_STRING(s),PyString_GET_SIZE(s));
+			q += PyString_GET_SIZE(s);
+			if(i<m && i%10==9){
+				memcpy(q,lineend,le);
+				q += le;
+				}
+			else *q++ = ' ';
+			}
+		s = PyObject_CallMethod(t,"strip",NULL);
+		Py_DECREF(t);
+		}
+	else s = _PyString_Join(_pfSpace,L);
+	Py_DECREF(L);
+	return _pfEnclose("[ ",s," ]");
+L_ERR:
+	Py_DECREF(L);
+	return NULL;
+}
+
+static PyObject *_pfFormat(PyObject *el, PyObject *doc, int toplevel)
+{
+	PyObject	*klass, *d, *v, *r=NULL;
+	char		*s;
+	if(PyString_CheckExact(el)){
+		Py_INCREF(el);
+		return el;
+		}
+	if(PyInt_CheckExact(el) || PyFloat_CheckExact(el)){
+		s = _fp_one(el);
+		return s ? PyString_FromString(s) : NULL;
+		}
+	if(PyInstance_Check(el)){
+		klass = (PyObject *)((PyInstanceObject *)el)->in_class;
+		d = ((PyInstanceObject *)el)->in_dict;
+		if((klass==_pfDictClass || klass==_pfArrayClass || klass==_pfArrayCompactClass || klass==_pfRefClass)
+				&& !PyDict_GetItemString(d,"__RefOnly__") && !PyDict_GetItemString(d,"__Comment__")
+				&& !PyDict_GetItemString(d,"format")){
+			if(klass==_pfRefClass) r = _pfRef(d,doc);
+			else if(klass==_pfDictClass){
+				if((v=PyDict_GetItemString(d,"dict"))) r = _pfDict(el,v,doc);
+				}
+			else if((v=PyDict_GetItemString(d,"sequence"))) r = _pfArray(el,v,doc);
+			if(r || PyErr_Occurred()) return r;
+			}
+		}
+	return PyObject_CallFunction(_pfFallback,"OOi",el,doc,toplevel);
+}
+
+static PyObject *pdfFormat(PyObject *module, PyObject *args, PyObject *kwds)
+{
+	PyObject	*el, *doc;
+	int			toplevel=0;
+	static char *kwlist[] = {"element","document","toplevel",NULL};
+	if(!PyArg_ParseTupleAndKeywords(args,kwds,"OO|i:pdfFormat",kwlist,&el,&doc,&toplevel)) return NULL;
+	if(!_pfFallback){
+		PyErr_SetString(ErrorObject,"pdfFormat: _setPDFFormat has not been called");
+		return NULL;
+		}
+	return _pfFormat(el,doc,toplevel);
+}
+
+/*unicode names are escaped by code point; as in python the result is
+  unicode only if some character wasn't escaped*/
+static PyObject *_pfNameU(PyObject *data)
+{
+	Py_UNICODE		*s = PyUnicode_AS_UNICODE(data);
+	unsigned long	c;
+	int				i, n = PyUnicode_GET_SIZE(data), kept = 0;
+	char			*b, *q;
+	PyObject		*r;
+	if(!(b=q=PyMem_Malloc(1+9*n))) return PyErr_NoMemory();
+	*q++ = '/';
+	for(i=0;i<n;i++){
+		c = s[i];
+		if(c<0x21 || c>0x7e || strchr("%()<>{}[]#",(int)c)) q += sprintf(q,"#%lx",c);
+		else{
+			*q++ = (char)c;
+			kept = 1;
+			}
+		}
+	r = kept ? PyUnicode_DecodeASCII(b,q-b,NULL) : PyString_FromStringAndSize(b,q-b);
+	PyMem_Free(b);
+	return r;
+}
+
+static PyObject *pdfName(PyObject *module, PyObject *args)
+{
+	PyObject	*data;
+	if(!PyArg_ParseTuple(args,"O:pdfName",&data)) return NULL;
+	if(PyString_Check(data)) return _pfName(data);
+	if(PyUnicode_Check(data)) return _pfNameU(data);
+	PyErr_SetString(PyExc_TypeError,"pdfName: argument must be a string or unicode");
+	return NULL;
+}
+
+static void _pfSet(PyObject **p, PyObject *v)
+{
+	Py_XINCREF(v);
+	Py_XDECREF(*p);
+	*p = v;
+}
+
+static PyObject *_setPDFFormat(PyObject *module, PyObject *args)
+{
+	PyObject	*fallback, *dictClass, *arrayClass, *arrayCompactClass, *refClass, *lineEnd, *ind;
+	if(!PyArg_ParseTuple(args,"OOOOOS:_setPDFFormat",&fallback,&dictClass,&arrayClass,&arrayCompactClass,&refClass,&lineEnd)) return NULL;
+	if(!(ind=PyString_FromFormat("%s ",PyString_AS_STRING(lineEnd)))) return NULL;
+	if(!_pfSpace && !(_pfSpace=PyString_FromString(" "))) return NULL;
+	if(!_pfRefFmt && !(_pfRefFmt=PyString_FromString("%s %s R"))) return NULL;
+	_pfSet(&_pfFallback,fallback);
+	_pfSet(&_pfDictClass,dictClass);
+	_pfSet(&_pfArrayClass,arrayClass);
+	_pfSet(&_pfArrayCompactClass,arrayCompactClass);
+	_pfSet(&_pfRefClass,refClass);
+	_pfSet(&_pfLineEnd,lineEnd);
+	_pfSet(&_pfInd,ind);
+	Py_DECREF(ind);
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+/*pdfFormat end****************/
+
+/*ContentStream start****************/
+/* the page and text object code of pdfgen; a list compatible sequence of
+   operator strings kept in one growable byte buffer. ends[i] is the end
+   offset of item i. op(name,*nums) formats the numbers with _fp_one straight
+   into the buffer. The python version is reportlab.lib.utils._py_ContentStream */
+typedef struct {
+	PyObject_HEAD
+	char		*buf;
+	Py_ssize_t	len, size;
+	Py_ssize_t	*ends;
+	Py_ssize_t	n, nsize;
+	} CSobject;
+
+static PyTypeObject ContentStream_type;
+#define CS_Check(v) PyObject_TypeCheck(v,&ContentStream_type)
+#define CS_START(self,i) ((i) ? (self)->ends[(i)-1] : 0)
+
+static int _csReserve(CSobject *self, Py_ssize_t len, Py_ssize_t n)
+{
+	Py_ssize_t	size;
+	void		*p;
+	if(len>self->size){
+		size = max(len,2*self->size+256);
+		if(!(p=PyMem_Realloc(self->buf,size))){
+			PyErr_NoMemory();
+			return -1;
+			}
+		self->buf = p;
+		self->size = size;
+		}
+	if(n>self->nsize){
+		size = max(n,2*self->nsize+32);
+		if(!(p=PyMem_Realloc(self->ends,size*sizeof(Py_ssize_t)))){
+			PyErr_NoMemory();
+			return -1;
+			}
+		self->ends = p;
+		self->nsize = size;
+		}
+	return 0;
+}
+
+/*the bytes of an item; unicode goes through str as a python join would*/
+static int _csBytes(PyObject *v, char **s, Py_ssize_t *l, PyObject **tmp)
+{
+	*tmp = NULL;
+	if(PyUnicode_Check(v)){
+		if(!(v=*tmp=PyObject_Str(v))) return -1;
+		}
+	else if(!PyString_Check(v)){
+		PyErr_Format(PyExc_TypeError,"ContentStream items must be strings not %.200s",v->ob_type->tp_name);
+		return -1;
+		}
+	return PyString_AsStringAndSize(v,s,l);
+}
+
+static int _csAppend(CSobject *self, PyObject *v)
+{
+	char		*s;
+	Py_ssize_t	l;
+	PyObject	*tmp;
+	int			r = -1;
+	if(_csBytes(v,&s,&l,&tmp)) return -1;
+	if(!_csReserve(self,self->len+l,self->n+1)){
+		memcpy(self->buf+self->len,s,l);
+		self->ends[self->n++] = self->len += l;
+		r = 0;
+		}
+	Py_XDECREF(tmp);
+	return r;
+}
+
+static int _csExtend(CSobject *self, PyObject *seq)
+{
+	Py_ssize_t	i, n;
+	PyObject	*fast = PySequence_Fast(seq,"ContentStream.extend argument must be iterable");
+	int			r = 0;
+	if(!fast) return -1;
+	n = PySequence_Fast_GET_SIZE(fast);
+	for(i=0;i<n && !r;i++) r = _csAppend(self,PySequence_Fast_GET_ITEM(fast,i));
+	Py_DECREF(fast);
+	return r;
+}
+
+static PyObject *_csItem(CSobject *self, Py_ssize_t i)
+{
+	Py_ssize_t	start;
+	if(i<0 || i>=self->n){
+		PyErr_SetString(PyExc_IndexError,"ContentStream index out of range");
+		return NULL;
+		}
+	start = CS_START(self,i);
+	return PyString_FromStringAndSize(self->buf+start,self->ends[i]-start);
+}
+
+static PyObject *_csList(CSobject *self)
+{
+	Py_ssize_t	i;
+	PyObject	*r = PyList_New(self->n), *v;
+	if(!r) return NULL;
+	for(i=0;i<self->n;i++){
+		if(!(v=_csItem(self,i))){
+			Py_DECREF(r);
+			return NULL;
+			}
+		PyList_SET_ITEM(r,i,v);
+		}
+	return r;
+}
+
+/*replace item i by v, or delete it when v is NULL*/
+static int _csSetItem(CSobject *self, Py_ssize_t i, PyObject *v)
+{
+	char		*s = NULL;
+	Py_ssize_t	l = 0, start, end, d, j;
+	PyObject	*tmp = NULL;
+	int			r = -1;
+	if(i<0 || i>=self->n){
+		PyErr_SetString(PyExc_IndexError,"ContentStream assignment index out of range");
+		return -1;
+		}
+	if(v && _csBytes(v,&s,&l,&tmp)) return -1;
+	start = CS_START(self,i);
+	end = self->ends[i];
+	d = l-(end-start);
+	if(!_csReserve(self,self->len+d,self->n)){
+		memmove(self->buf+end+d,self->buf+end,self->len-end);
+		if(l) memcpy(self->buf+start,s,l);
+		self->len += d;
+		for(j=i;j<self->n;j++) self->ends[j] += d;
+		if(!v){
+			memmove(self->ends+i,self->ends+i+1,(self->n-i-1)*sizeof(Py_ssize_t));
+			self->n--;
+			}
+		r = 0;
+		}
+	Py_XDECREF(tmp);
+	return r;
+}
+
+static PyObject *ContentStream_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+	return type->tp_alloc(type,0);	/*zeroed, so no buffers yet*/
+}
+
+static int ContentStream_init(CSobject *self, PyObject *args, PyObject *kwds)
+{
+	static char	*kwlist[] = {"sequence",NULL};
+	PyObject	*seq = NULL;
+	if(!PyArg_ParseTupleAndKeywords(args,kwds,"|O:ContentStream",kwlist,&seq)) return -1;
+	self->len = self->n = 0;
+	return seq ? _csExtend(self,seq) : 0;
+}
+
+static void ContentStream_dealloc(CSobject *self)
+{
+	PyMem_Free(self->buf);
+	PyMem_Free(self->ends);
+	self->ob_type->tp_free((PyObject *)self);
+}
+
+static PyObject *ContentStream_append(CSobject *self, PyObject *v)
+{
+	if(_csAppend(self,v)) return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static PyObject *ContentStream_extend(CSobject *self, PyObject *seq)
+{
+	if(_csExtend(self,seq)) return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static PyObject *ContentStream_op(CSobject *self, PyObject *args)
+{
+	Py_ssize_t	aL = PyTuple_GET_SIZE(args), i, l, k;
+	PyObject	*nums, *v, *tmp;
+	char		*s, *p;
+	int			r = -1;
+	if(aL<1){
+		PyErr_SetString(PyExc_TypeError,"ContentStream.op needs an operator");
+		return NULL;
+		}
+	if(_csBytes(PyTuple_GET_ITEM(args,0),&s,&l,&tmp)) return NULL;
+	nums = PyTuple_GetSlice(args,1,aL);
+	aL--;
+	if(nums && aL==1 && PySequence_Check(v=PyTuple_GET_ITEM(nums,0)) && !PyString_Check(v) && !PyUnicode_Check(v)){
+		Py_DECREF(nums);
+		if((nums=PySequence_Fast(v,"ContentStream.op bad numeric sequence"))) aL = PySequence_Fast_GET_SIZE(nums);
+		}
+	if(!nums) goto L_done;
+	/*format at the end of the buffer and only then make it an item*/
+	k = self->len;
+	for(i=0;i<aL;i++){
+		if(!(p=_fp_one(PySequence_Fast_GET_ITEM(nums,i)))) goto L_done;
+		if(_csReserve(self,k+strlen(p)+1,self->n+1)) goto L_done;
+		if(i) self->buf[k++] = ' ';
+		memcpy(self->buf+k,p,strlen(p));
+		k += strlen(p);
+		}
+	if(_csReserve(self,k+l+1,self->n+1)) goto L_done;
+	if(aL) self->buf[k++] = ' ';
+	memcpy(self->buf+k,s,l);
+	self->ends[self->n++] = self->len = k+l;
+	r = 0;
+L_done:
+	Py_XDECREF(nums);
+	Py_XDECREF(tmp);
+	if(r) return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static PyObject *ContentStream_join(CSobject *self, PyObject *args)
+{
+	char		*sep, *q;
+	Py_ssize_t	sepLen, i, start;
+	int			t;
+	PyObject	*r;
+	if(!PyArg_ParseTuple(args,"s#:join",&sep,&t)) return NULL;
+	sepLen = t;
+	if(!(r=PyString_FromStringAndSize(NULL,self->len+(self->n>1 ? (self->n-1)*sepLen : 0)))) return NULL;
+	q = PyString_AS_STRING(r);
+	for(i=0;i<self->n;i++){
+		if(i && sepLen){
+			memcpy(q,sep,sepLen);
+			q += sepLen;
+			}
+		start = CS_START(self,i);
+		memcpy(q,self->buf+start,self->ends[i]-start);
+		q += self->ends[i]-start;
+		}
+	return r;
+}
+
+static PyObject *ContentStream_reduce(CSobject *self)
+{
+	PyObject	*L = _csList(self);
+	if(!L) return NULL;
+	return Py_BuildValue("(O(N))",self->ob_type,L);
+}
+
+static Py_ssize_t ContentStream_length(CSobject *self)
+{
+	return self->n;
+}
+
+static PyObject *ContentStream_subscript(CSobject *self, PyObject *key)
+{
+	Py_ssize_t	i, start, stop, step, slen, j;
+	PyObject	*r, *v;
+	if(PyIndex_Check(key)){
+		if((i=PyNumber_AsSsize_t(key,PyExc_IndexError))==-1 && PyErr_Occurred()) return NULL;
+		if(i<0) i += self->n;
+		return _csItem(self,i);
+		}
+	if(PySlice_Check(key)){
+		if(PySlice_GetIndicesEx((PySliceObject *)key,self->n,&start,&stop,&step,&slen)<0) return NULL;
+		if(!(r=PyList_New(slen))) return NULL;
+		for(i=start,j=0;j<slen;i+=step,j++){
+			if(!(v=_csItem(self,i))){
+				Py_DECREF(r);
+				return NULL;
+				}
+			PyList_SET_ITEM(r,j,v);
+			}
+		return r;
+		}
+	PyErr_Format(PyExc_TypeError,"ContentStream indices must be integers, not %.200s",key->ob_type->tp_name);
+	return NULL;
+}
+
+static int ContentStream_ass_subscript(CSobject *self, PyObject *key, PyObject *v)
+{
+	Py_ssize_t	i;
+	PyObject	*L;
+	int			r;
+	if(PyIndex_Check(key)){
+		if((i=PyNumber_AsSsize_t(key,PyExc_IndexError))==-1 && PyErr_Occurred()) return -1;
+		if(i<0) i += self->n;
+		return _csSetItem(self,i,v);
+		}
+	/*slices are rare; do them on a list and rebuild*/
+	if(!(L=_csList(self))) return -1;
+	r = v ? PyObject_SetItem(L,key,v) : PyObject_DelItem(L,key);
+	if(!r){
+		self->len = self->n = 0;
+		r = _csExtend(self,L);
+		}
+	Py_DECREF(L);
+	return r;
+}
+
+static PyObject *ContentStream_item(CSobject *self, Py_ssize_t i)
+{
+	return _csItem(self,i);
+}
+
+static PyObject *ContentStream_richcompare(PyObject *v, PyObject *w, int op)
+{
+	PyObject	*a, *b, *r = NULL;
+	if(!(CS_Check(v) || PyList_Check(v)) || !(CS_Check(w) || PyList_Check(w))){
+		Py_INCREF(Py_NotImplemented);
+		return Py_NotImplemented;
+		}
+	a = CS_Check(v) ? _csList((CSobject *)v) : (Py_INCREF(v),v);
+	b = CS_Check(w) ? _csList((CSobject *)w) : (Py_INCREF(w),w);
+	if(a && b) r = PyObject_RichCompare(a,b,op);
+	Py_XDECREF(a);
+	Py_XDECREF(b);
+	return r;
+}
+
+static PyObject *ContentStream_repr(CSobject *self)
+{
+	PyObject	*L = _csList(self), *r;
+	if(!L) return NULL;
+	r = PyObject_Repr(L);
+	Py_DECREF(L);
+	return r;
+}
+
+static PyMethodDef ContentStream_methods[] = {
+	{"append", (PyCFunction)ContentStream_append, METH_O, "append(s) add operator string s"},
+	{"extend", (PyCFunction)ContentStream_extend, METH_O, "extend(seq) add the operator strings of seq"},
+	{"op", (PyCFunction)ContentStream_op, METH_VARARGS, "op(name,*nums) add the numbers (or a single sequence of them) followed by operator name"},
+	{"join", (PyCFunction)ContentStream_join, METH_VARARGS, "join(sep) return the items joined by sep"},
+	{"__reduce__", (PyCFunction)ContentStream_reduce, METH_NOARGS, "helper for pickle and copy"},
+	{NULL, NULL}
+	};
+
+static PySequenceMethods ContentStream_as_sequence = {
+	(lenfunc)ContentStream_length,	/* sq_length */
+	0,					/* sq_concat */
+	0,					/* sq_repeat */
+	(ssizeargfunc)ContentStream_item,	/* sq_item */
+	};
+
+static PyMappingMethods ContentStream_as_mapping = {
+	(lenfunc)ContentStream_length,	/* mp_length */
+	(binaryfunc)ContentStream_subscript,	/* mp_subscript */
+	(objobjargproc)ContentStream_ass_subscript,	/* mp_ass_subscript */
+	};
+
+static PyTypeObject ContentStream_type = {
+	PyObject_HEAD_INIT(DEFERRED_ADDRESS(&PyType_Type))
+	0,
+	"_rl_accel.ContentStream",
+	sizeof(CSobject),
+	0,
+	(destructor)ContentStream_dealloc,	/* tp_dealloc */
+	0,					/* tp_print */
+	0,					/* tp_getattr */
+	0,					/* tp_setattr */
+	0,					/* tp_compare */
+	(reprfunc)ContentStream_repr,	/* tp_repr */
+	0,					/* tp_as_number */
+	&ContentStream_as_sequence,	/* tp_as_sequence */
+	&ContentStream_as_mapping,	/* tp_as_mapping */
+	0,					/* tp_hash */
+	0,					/* tp_call */
+	0,					/* tp_str */
+	0,					/* tp_getattro */
+	0,					/* tp_setattro */
+	0,					/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+	"ContentStream(sequence=()) a list of PDF content stream operators",	/* tp_doc */
+	0,					/* tp_traverse */
+	0,					/* tp_clear */
+	ContentStream_richcompare,	/* tp_richcompare */
+	0,					/* tp_weaklistoffset */
+	0,					/* tp_iter */
+	0,					/* tp_iternext */
+	ContentStream_methods,		/* tp_methods */
+	0,					/* tp_members */
+	0,					/* tp_getset */
+	0,					/* tp_base */
+	0,					/* tp_dict */
+	0,					/* tp_descr_get */
+	0,					/* tp_descr_set */
+	0,					/* tp_dictoffset */
+	(initproc)ContentStream_init,	/* tp_init */
+	0,					/* tp_alloc */
+	ContentStream_new,			/* tp_new */
+};
+/*ContentStream end****************/
+
+/*ciphers start****************/
+/* the RC4 (ArcIV) and AES-128 CBC ciphers used for PDF encryption; the pure
+   python versions are in reportlab.lib.arciv and reportlab.lib.aes */
+static PyObject *arcIV(PyObject *module, PyObject *args)
+{
+	unsigned char	*key, *text, *out, sbox[256], t;
+	int				keyLen, textLen, i, j, p;
+	PyObject		*r;
+	if(!PyArg_ParseTuple(args,"s#s#:arcIV",&key,&keyLen,&text,&textLen)) return NULL;
+	if(!keyLen){
+		PyErr_SetString(PyExc_ValueError,"arcIV: empty key");
+		return NULL;
+		}
+	for(i=0;i<256;i++) sbox[i] = i;
+	for(i=j=0;i<256;i++){
+		j = (j+sbox[i]+key[i%keyLen]) & 0xff;
+		t = sbox[i]; sbox[i] = sbox[j]; sbox[j] = t;
+		}
+	if(!(r=PyString_FromStringAndSize(NULL,textLen))) return NULL;
+	out = (unsigned char *)PyString_AS_STRING(r);
+	for(p=i=j=0;p<textLen;p++){
+		i = (i+1) & 0xff;
+		j = (j+sbox[i]) & 0xff;
+		t = sbox[i]; sbox[i] = sbox[j]; sbox[j] = t;
+		out[p] = text[p] ^ sbox[(sbox[i]+sbox[j]) & 0xff];
+		}
+	return r;
+}
+
+static unsigned char	_aesS[256];
+static unsigned long	_aesT[4][256];
+static int				_aesReady=0;
+#define AES_XTIME(x) ((((x)<<1) ^ (((x)&0x80) ? 0x1b : 0)) & 0xff)
+#define AES_ROTL8(x,s) ((((x)<<(s)) | ((x)>>(8-(s)))) & 0xff)
+
+static void _aesInit(void)
+{
+	unsigned	p=1, q=1, s, s2;
+	int			x;
+	/*the sbox is the affine transform of the multiplicative inverse; p runs
+	  through the powers of 3 and q through those of its inverse*/
+	do{
+		p = p ^ AES_XTIME(p);
+		q ^= q<<1;
+		q ^= q<<2;
+		q ^= q<<4;
+		q &= 0xff;
+		if(q&0x80) q ^= 0x09;
+		_aesS[p] = (q ^ AES_ROTL8(q,1) ^ AES_ROTL8(q,2) ^ AES_ROTL8(q,3) ^ AES_ROTL8(q,4) ^ 0x63) & 0xff;
+		} while(p!=1);
+	_aesS[0] = 0x63;
+	for(x=0;x<256;x++){
+		s = _aesS[x];
+		s2 = AES_XTIME(s);
+		_aesT[0][x] = ((unsigned long)s2<<24) | (s<<16) | (s<<8) | (s2^s);
+		_aesT[1][x] = ((unsigned long)(s2^s)<<24) | (s2<<16) | (s<<8) | s;
+		_aesT[2][x] = ((unsigned long)s<<24) | ((s2^s)<<16) | (s2<<8) | s;
+		_aesT[3][x] = ((unsigned long)s<<24) | (s<<16) | ((s2^s)<<8) | s2;
+		}
+	_aesReady = 1;
+}
+
+#define AES_GET32(b) (((unsigned long)(b)[0]<<24) | ((unsigned long)(b)[1]<<16) | ((unsigned long)(b)[2]<<8) | (unsigned long)(b)[3])
+#define AES_PUT32(b,v) ((b)[0]=(unsigned char)((v)>>24), (b)[1]=(unsigned char)((v)>>16), (b)[2]=(unsigned char)((v)>>8), (b)[3]=(unsigned char)(v))
+#define AES_SUB(w) (((unsigned long)_aesS[((w)>>24)&0xff]<<24) | ((unsigned long)_aesS[((w)>>16)&0xff]<<16) | ((unsigned long)_aesS[((w)>>8)&0xff]<<8) | _aesS[(w)&0xff])
+
+static void _aesExpandKey(unsigned char *key, unsigned long *rk)
+{
+	int				i;
+	unsigned long	t, rcon=1;
+	for(i=0;i<4;i++) rk[i] = AES_GET32(key+4*i);
+	for(i=4;i<44;i++){
+		t = rk[i-1];
+		if(!(i%4)){
+			t = AES_SUB(((t<<8) | (t>>24)) & 0xffffffff) ^ (rcon<<24);
+			rcon = AES_XTIME(rcon);
+			}
+		rk[i] = rk[i-4] ^ t;
+		}
+}
+
+static void _aesEncryptBlock(unsigned long *rk, unsigned char *in, unsigned char *out)
+{
+	unsigned long	s0, s1, s2, s3, t0, t1, t2, t3;
+	int				r;
+	s0 = AES_GET32(in) ^ rk[0];
+	s1 = AES_GET32(in+4) ^ rk[1];
+	s2 = AES_GET32(in+8) ^ rk[2];
+	s3 = AES_GET32(in+12) ^ rk[3];
+	for(r=1;r<10;r++){
+		rk += 4;
+		t0 = _aesT[0][s0>>24] ^ _aesT[1][(s1>>16)&0xff] ^ _aesT[2][(s2>>8)&0xff] ^ _aesT[3][s3&0xff] ^ rk[0];
+		t1 = _aesT[0][s1>>24] ^ _aesT[1][(s2>>16)&0xff] ^ _aesT[2][(s3>>8)&0xff] ^ _aesT[3][s0&0xff] ^ rk[1];
+		t2 = _aesT[0][s2>>24] ^ _aesT[1][(s3>>16)&0xff] ^ _aesT[2][(s0>>8)&0xff] ^ _aesT[3][s1&0xff] ^ rk[2];
+		t3 = _aesT[0][s3>>24] ^ _aesT[1][(s0>>16)&0xff] ^ _aesT[2][(s1>>8)&0xff] ^ _aesT[3][s2&0xff] ^ rk[3];
+		s0 = t0; s1 = t1; s2 = t2; s3 = t3;
+		}
+	rk += 4;
+	t0 = (((unsigned long)_aesS[s0>>24]<<24) | ((unsigned long)_aesS[(s1>>16)&0xff]<<16) | ((unsigned long)_aesS[(s2>>8)&0xff]<<8) | _aesS[s3&0xff]) ^ rk[0];
+	t1 = (((unsigned long)_aesS[s1>>24]<<24) | ((unsigned long)_aesS[(s2>>16)&0xff]<<16) | ((unsigned long)_aesS[(s3>>8)&0xff]<<8) | _aesS[s0&0xff]) ^ rk[1];
+	t2 = (((unsigned long)_aesS[s2>>24]<<24) | ((unsigned long)_aesS[(s3>>16)&0xff]<<16) | ((unsigned long)_aesS[(s0>>8)&0xff]<<8) | _aesS[s1&0xff]) ^ rk[2];
+	t3 = (((unsigned long)_aesS[s3>>24]<<24) | ((unsigned long)_aesS[(s0>>16)&0xff]<<16) | ((unsigned long)_aesS[(s1>>8)&0xff]<<8) | _aesS[s2&0xff]) ^ rk[3];
+	AES_PUT32(out,t0);
+	AES_PUT32(out+4,t1);
+	AES_PUT32(out+8,t2);
+	AES_PUT32(out+12,t3);
+}
+
+static PyObject *aesEncryptCBC(PyObject *module, PyObject *args)
+{
+	unsigned char	*key, *iv, *text, *out, *prev, block[16];
+	int				keyLen, ivLen, textLen, p, k;
+	unsigned long	rk[44];
+	PyObject		*r;
+	if(!PyArg_ParseTuple(args,"s#s#s#:aesEncryptCBC",&key,&keyLen,&iv,&ivLen,&text,&textLen)) return NULL;
+	if(keyLen!=16 || ivLen!=16 || textLen%16){
+		PyErr_SetString(PyExc_ValueError,"aesEncryptCBC: key and iv must be 16 bytes and the text a multiple of 16 bytes");
+		return NULL;
+		}
+	if(!_aesReady) _aesInit();
+	_aesExpandKey(key,rk);
+	if(!(r=PyString_FromStringAndSize(NULL,textLen))) return NULL;
+	out = (unsigned char *)PyString_AS_STRING(r);
+	for(prev=iv,p=0;p<textLen;p+=16){
+		for(k=0;k<16;k++) block[k] = text[p+k] ^ prev[k];
+		_aesEncryptBlock(rk,block,out+p);
+		prev = out+p;
+		}
+	return r;
+}
+/*ciphers end****************/
+
 static char *__doc__=
 "_rl_accel contains various accelerated utilities\n\
 \n\
@@ -1259,11 +2541,19 @@ static char *__doc__=
 \t_instanceStringWidthTTF version2 TTFont instance stringWidth\n\
 \tunicode2T1 version2 pdfmetrics.unicode2T1\n\
 \t_reset() version2 clears _rl_accel state\n"
+"\tparaTokenize(text) returns the markup tokens of a platypus paragraph text\n"
+"\tpdfFormat(element,document,toplevel=0) version of pdfdoc.format\n"
+"\tpdfName(data) version of pdfdoc.PDFName\n"
+"\t_setPDFFormat(fallback,dictClass,arrayClass,arrayCompactClass,refClass,lineEnd) registers the pdfdoc classes\n"
+"\tarcIV(key,text) returns the ArcIV (RC4) encryption of text\n"
+"\taesEncryptCBC(key,iv,text) returns the AES-128 CBC encryption of text\n"
+"\tContentStream(sequence=()) creates a list like buffer of PDF content stream operators\n"
 #ifdef	HAVE_BOX
 "\tBox(width,character=None) creates a Knuth character Box with the specified width.\n"
 "\tGlue(width,stretch,shrink) creates a Knuth glue Box with the specified width, stretch and shrink.\n"
 "\tPenalty(width,penalty,flagged=0) creates a Knuth penalty Box with the specified width and penalty.\n"
 "\tBoxList() creates a knuth box list.\n"
+"\tkpBreaks(items,lineWidths) returns the Knuth-Plass total fit break positions of a list of Box/Glue/Penalty items.\n"
 #endif
 ;
 
@@ -1283,10 +2573,17 @@ static struct PyMethodDef _methods[] = {
 	{"_instanceStringWidthU", (PyCFunction)_instanceStringWidthU, METH_VARARGS|METH_KEYWORDS, "Font.stringWidth(self,text,fontName,fontSize,encoding='utf8') --> width"},
 	{"_instanceStringWidthTTF", (PyCFunction)_instanceStringWidthTTF, METH_VARARGS|METH_KEYWORDS, "TTFont.stringWidth(self,text,fontName,fontSize,encoding='utf8') --> width"},
 	{"_reset", (PyCFunction)_reset, METH_NOARGS, "_rl_accel._reset() reset _rl_accel state"},
+	{"paraTokenize", paraTokenize, METH_VARARGS, "paraTokenize(text) return a list of (kind,value) paragraph markup tokens"},
+	{"pdfFormat", (PyCFunction)pdfFormat, METH_VARARGS|METH_KEYWORDS, "pdfFormat(element,document,toplevel=0) return the PDF representation of element"},
+	{"pdfName", pdfName, METH_VARARGS, "pdfName(data) return the PDF name for string data"},
+	{"_setPDFFormat", _setPDFFormat, METH_VARARGS, "_setPDFFormat(fallback,dictClass,arrayClass,arrayCompactClass,refClass,lineEnd) register the pdfdoc classes for pdfFormat"},
+	{"arcIV", arcIV, METH_VARARGS, "arcIV(key,text) return the ArcIV (RC4) encryption of text"},
+	{"aesEncryptCBC", aesEncryptCBC, METH_VARARGS, "aesEncryptCBC(key,iv,text) return the AES-128 CBC encryption of text (a multiple of 16 bytes)"},
 #ifdef	HAVE_BOX
 	{"Box",	(PyCFunction)Box,	METH_VARARGS|METH_KEYWORDS, "Box(width,character=None) create a Knuth Box instance"},
 	{"Glue", (PyCFunction)Glue,	METH_VARARGS|METH_KEYWORDS, "Glue(width,stretch,shrink) create a Knuth Glue instance"},
 	{"Penalty", (PyCFunction)Penalty,	METH_VARARGS|METH_KEYWORDS, "Penalty(width,penalty,flagged=0) create a Knuth Penalty instance"},
+	{"kpBreaks", (PyCFunction)kpBreaks,	METH_VARARGS|METH_KEYWORDS, "kpBreaks(items,lineWidths,linePenalty=10,adjDemerits=10000,flaggedDemerits=3000) return the Knuth-Plass break positions"},
 #endif
 	{NULL,		NULL}		/* sentinel */
 	};
@@ -1307,6 +2604,10 @@ void init_rl_accel(void)
 	moduleVersion = PyString_FromString(VERSION);
 	PyModule_AddObject(moduleObject, "error", ErrorObject);
 	PyModule_AddObject(moduleObject, "version", moduleVersion );
+	ContentStream_type.ob_type = &PyType_Type;
+	if(PyType_Ready(&ContentStream_type)<0) goto err;
+	Py_INCREF(&ContentStream_type);
+	if(PyModule_AddObject(moduleObject, "ContentStream", (PyObject *)&ContentStream_type)<0) goto err;
 
 #ifdef	HAVE_BOX
 	BoxType.ob_type = &PyType_Type;
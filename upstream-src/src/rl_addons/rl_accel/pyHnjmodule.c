@@ -287,7 +287,7 @@ static struct PyMethodDef pyHnj_methods[] = {
 };
 
 
-/* Initialization function for the module (*must* be called initpyHnj) */
+/* Initialization function for the module (*must* be called init_pyHnj) */
 
 static char pyHnj_module_documentation[] = 
 "This is the pyHnj module.  This code is based on the hyphenization\n\
@@ -308,24 +308,24 @@ Functions within Hyphen:\n\
 ";
 
 void
-initpyHnj() {
+init_pyHnj() {
   PyObject *m, *d;
 
   /* necessary to manually set the type */
   Hyphentype.ob_type = &PyType_Type; 
 
   /* Create the module and add the functions */
-  m = Py_InitModule4("pyHnj", pyHnj_methods,
+  m = Py_InitModule4("_pyHnj", pyHnj_methods,
 		     pyHnj_module_documentation,
 		     (PyObject*)NULL,PYTHON_API_VERSION);
   
   /* Add some symbolic constants to the module */
   d = PyModule_GetDict(m);
-  ErrorObject = PyString_FromString("pyHnj.error");
+  ErrorObject = PyString_FromString("_pyHnj.error");
   PyDict_SetItemString(d, "error", ErrorObject);
   
   
   /* Check for errors */
   if (PyErr_Occurred())
-    Py_FatalError("can't initialize module pyHnj");
+    Py_FatalError("can't initialize module _pyHnj");
 }
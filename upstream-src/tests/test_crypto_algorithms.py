@@ -79,6 +79,21 @@ class EncryptionAlgorithmTestCase(unittest.TestCase):
                                  'anonymous')
                        ) == '<27FB3E943FCF61878B>'
 
+    def checkEncryptStringAES(self):
+        "revision 4 prefixes the iv and pads to whole AES blocks"
+        assert hexText(encodePDF('0123456789abcdef', 7, 0, 'Hello encrypted world!', revision=4, iv=16*'I')
+                       ) == '<49494949494949494949494949494949230A3EC498E9FD412A0B5D9C2B7AD1D9A1E209081EFE8CD4271B4B0640AA8D7F>'
+
+    def checkCiphers(self):
+        "the accelerated and Python ciphers agree with the published vectors"
+        from reportlab.lib import arciv, aes
+        for t in arciv._TESTS:
+            assert arciv.encode(t['input'],t['key']) == t['output']
+            assert arciv.ArcIV(t['key']).encode(t['input']) == t['output']
+        for t in aes._TESTS:
+            assert aes.encryptCBC(t['input'],t['key'],t['iv']) == t['output']
+            assert aes.AES128(t['key']).encryptCBC(t['iv'],t['input']) == t['output']
+
 class EyeballTestCase(unittest.TestCase):
     "This makes a gaxillion self-explanatory files"
     def check40BitOptions(self):
@@ -49,6 +49,23 @@ class EncryptTestCase(unittest.TestCase):
         doc.build(story)
         parsedoc(fname)
 
+    def test_aes(self):
+        "Test generating an AES encrypted pdf; invariant documents must be reproducible."
+        fname = outputfile('test_encrypt_aes.pdf')
+        data = []
+        for i in 0, 1:
+            c = Canvas(fname, invariant=1)
+            pdfencrypt.encryptCanvas(c, 'User', 'Owner', strength=128, aes=1)
+            c.setFont('Helvetica-Bold', 36)
+            c.drawString(100,700, 'Top secret')
+            c.save()
+            data.append(open(fname,'rb').read())
+        self.assertEqual(data[0],data[1])
+        self.assert_(data[0].startswith('%PDF-1.6'))
+        self.assert_('/CFM /AESV2' in data[0])
+        self.assert_('Top secret' not in data[0])
+        parsedoc(fname)
+
 def makeSuite():
     return makeSuiteForClasses(EncryptTestCase)
 
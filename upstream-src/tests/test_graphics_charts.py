@@ -410,8 +410,46 @@ class ChartTestCase(unittest.TestCase):
         global FINISHED
         FINISHED = 1
 
+class LinePlotTestCase(unittest.TestCase):
+    "Test whole series scaling and decimation in line plots."
+
+    def makePlot(self, n=2000):
+        from math import sin
+        lp = LinePlot()
+        lp.x, lp.y, lp.width, lp.height = 50, 50, 300, 200
+        lp.data = [[(i, sin(i/50.)+0.3*sin(i*0.37)) for i in xrange(n)], [(i, i%7 or None) for i in xrange(n)]]
+        lp.yValueAxis.reverseDirection = 1
+        lp.draw()
+        return lp
+
+    def test0(self):
+        "scaleValues and calcPositions agree with scale"
+        lp = self.makePlot()
+        for rowNo, row in enumerate(lp.data):
+            self.assertEqual(lp._positions[rowNo],
+                [(lp.xValueAxis.scale(x), lp.yValueAxis.scale(y)) for x, y in row])
+
+    def test1(self):
+        "minMaxDecimate keeps each column's first, last and extreme points"
+        from reportlab.graphics.charts.utils import minMaxDecimate
+        P = [(0,0),(0.1,5),(0.2,-3),(0.3,1),(0.4,2),(1.5,0),(1.6,1),(2.5,7)]
+        self.assertEqual(minMaxDecimate(P,1),[(0,0),(0.1,5),(0.2,-3),(0.4,2),(1.5,0),(1.6,1),(2.5,7)])
+        self.assertEqual(minMaxDecimate(P,0),P)
+        self.assertEqual(minMaxDecimate(P[:4],1),P[:4])
+
+    def test2(self):
+        "decimation reduces the joined lines only"
+        def points(g):
+            return [len(x.points) for x in g.contents if isinstance(x,PolyLine)]
+        lp = self.makePlot()
+        n0 = points(lp.makeLines())
+        lp.decimation = 1
+        n1 = points(lp.makeLines())
+        self.assertEqual(n0, [4000, 4000])
+        self.assert_(n1[0]<4*300*2 and n1[1]<4*300*2, n1)
+
 def makeSuite():
-    return makeSuiteForClasses(ChartTestCase)
+    return makeSuiteForClasses(ChartTestCase, LinePlotTestCase)
 
 
 #noruntests
@@ -0,0 +1,84 @@
+#Copyright ReportLab Europe Ltd. 2000-2008
+#see license.txt for license details
+"""Tests for renderPM.drawBatch
+"""
+__version__='''$Id$'''
+from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation, skipUnless
+setOutDir(__name__)
+import unittest, os
+from reportlab.lib import colors
+from reportlab.pdfbase import pdfmetrics
+from reportlab.graphics import renderbase
+from reportlab.graphics.shapes import Drawing, Circle, String
+try:
+    from reportlab.graphics import renderPM
+except ImportError:
+    renderPM = None
+
+def makeDrawing(i):
+    d = Drawing(100,80)
+    for j in xrange(20):
+        d.add(Circle((j*37+i)%100,(j*53)%80,5+j%7,fillColor=colors.Color(j/20.,0.3,0.6)))
+    d.add(String(10,10,'job %d' % i,fontName='DarkGardenMK',fontSize=12))
+    return d
+
+class DrawBatchTestCase(unittest.TestCase):
+    "Test renderPM.drawBatch"
+
+    def setUp(self):
+        #we use the one T1 font we distribute
+        from reportlab import rl_config
+        fontDir = os.path.join(os.path.dirname(rl_config.__file__),'fonts')
+        pdfmetrics.registerTypeFace(pdfmetrics.EmbeddedType1Face(
+                        os.path.join(fontDir,'DarkGardenMK.afm'),os.path.join(fontDir,'DarkGardenMK.pfb')))
+        pdfmetrics.registerFont(pdfmetrics.Font('DarkGardenMK','DarkGardenMK','WinAnsiEncoding'))
+        self._fontName = renderbase.STATE_DEFAULTS['fontName']
+        renderbase.STATE_DEFAULTS['fontName'] = 'DarkGardenMK'
+
+    def tearDown(self):
+        renderbase.STATE_DEFAULTS['fontName'] = self._fontName
+
+    def checkBatch(self, *P):
+        jobs = [(makeDrawing(i),'PNG',72) for i in xrange(6)]
+        jobs.insert(3,(makeDrawing(9),'NOSUCHFORMAT',72))
+        fn = outputfile('test_graphics_renderPM_batch.gif')
+        jobs.append((makeDrawing(10),'GIF',144,fn))
+        for processes in P:
+            R = list(renderPM.drawBatch(jobs,processes=processes))
+            self.assertEqual(sorted([r[0] for r in R]),range(len(jobs)))
+            for i, result, t, error in R:
+                self.assert_(t>=0)
+                if i==3:
+                    self.assertEqual(result,None)
+                    self.assert_(error.startswith('RenderPMError'),error)
+                elif i==7:
+                    self.assertEqual((result,error),(fn,None))
+                else:
+                    self.assertEqual(error,None)
+                    self.assertEqual(result,renderPM.drawToString(jobs[i][0],'PNG'))
+        self.assert_(os.path.isfile(fn))
+        return R
+
+    @skipUnless(renderPM,'renderPM needs the _renderPM extension')
+    def test0(self):
+        "drawBatch matches drawToString and reports failures per job"
+        self.checkBatch(1,3)
+
+    @skipUnless(renderPM,'renderPM needs the _renderPM extension')
+    def test1(self):
+        "without forked workers the jobs are rendered here, in order"
+        forkedWorkers = renderPM._forkedWorkers
+        renderPM._forkedWorkers = lambda: 0
+        try:
+            R = self.checkBatch(3)
+        finally:
+            renderPM._forkedWorkers = forkedWorkers
+        self.assertEqual([r[0] for r in R],range(len(R)))
+
+def makeSuite():
+    return makeSuiteForClasses(DrawBatchTestCase)
+
+#noruntests
+if __name__ == "__main__":
+    unittest.TextTestRunner().run(makeSuite())
+    printLocation()
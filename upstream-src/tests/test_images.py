@@ -7,7 +7,7 @@ __doc__="""Tests to do with image handling.
 Most of them make use of test\pythonpowereed.gif."""
 from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, printLocation
 setOutDir(__name__)
-import os
+import os, re
 try:
     from hashlib import md5
 except ImportError:
@@ -42,8 +42,109 @@ class ReaderTestCase(unittest.TestCase):
         pixels = ir.getRGBData()
         assert md5(pixels).hexdigest() == '02e000bf3ffcefe9fc9660c95d7e27cf'
 
+class ImageDedupTestCase(unittest.TestCase):
+    "drawImage should reuse images with the same encoded bytes without decoding them"
+
+    def test(self):
+        from reportlab.lib.testutils import testsFolder
+        from reportlab.lib.utils import getStringIO
+        from reportlab.pdfgen.canvas import Canvas
+        fn = os.path.join(testsFolder,'pythonpowered.gif')
+        c = Canvas(getStringIO(),invariant=1)
+        c.drawImage(fn,0,0)
+        def getRGBData(self):
+            raise ValueError('reused image was decoded')
+        ImageReader.getRGBData, old = getRGBData, ImageReader.getRGBData
+        try:
+            for ir in ImageReader(fn), ImageReader(getStringIO(open(fn,'rb').read())):
+                c.showPage()
+                c.drawImage(ir,0,0)
+        finally:
+            ImageReader.getRGBData = old
+        c.drawImage(fn,100,100,mask='auto')
+        self.assertEqual(len(c._doc.imageRegistry),2)
+        pdf = c.getpdfdata()
+        self.assertEqual(pdf.count('/Subtype /Image'),2)
+
+class PNGPassthroughTestCase(unittest.TestCase):
+    "PNGs should be embedded without decoding them when possible"
+
+    def xobj(self, im, mask='auto', **kw):
+        from reportlab.lib.utils import getStringIO
+        from reportlab.pdfbase.pdfdoc import PDFImageXObject
+        f = getStringIO()
+        im.save(f,'PNG',**kw)
+        f.seek(0)
+        return PDFImageXObject('x',ImageReader(f),mask=mask), f
+
+    def test0(self):
+        from reportlab.lib.utils import Image
+        from reportlab.pdfbase.pdfutils import readPNGInfo
+        if Image is None: return
+        im = Image.open(os.path.join(os.path.dirname(__file__) or '.','pythonpowered.gif'))
+        im.info.clear()     #no transparency
+        for mode, cs, mask in (('RGB','DeviceRGB',None),('L','DeviceGray',None),('1','DeviceGray',None),('P','Indexed',None)):
+            x, f = self.xobj(im.convert(mode))
+            info = readPNGInfo(f)
+            self.assertEqual(x.streamContent,info['idat'])
+            self.assertEqual(x._filters,('FlateDecode',))
+            self.assertEqual(x._decodeParms['Predictor'],15)
+            self.assertEqual(x.bitsPerComponent,info['bitDepth'])
+            self.assertEqual(isinstance(x.colorSpace,str) and x.colorSpace or x.colorSpace.sequence[0].strip('/'),cs)
+            self.assertEqual(x.mask,mask)
+        x, f = self.xobj(im,transparency=0)
+        self.assertEqual(x.mask,(0,0))
+        x, f = self.xobj(im.convert('RGB'),transparency=(255,255,255))
+        self.assertEqual(x.mask,[255,255,255,255,255,255])
+        x, f = self.xobj(im.convert('RGB'),mask=None,transparency=(255,255,255))
+        self.assertEqual(x.mask,None)
+
+    def test3(self):
+        "an rgb colour key mask must be reduced to one range for a gray PNG"
+        from reportlab.lib.utils import Image
+        if Image is None: return
+        im = Image.new('L',(4,4),200)
+        x, f = self.xobj(im,mask=[190,210,195,255,0,205])
+        self.assertEqual(x.colorSpace,'DeviceGray')
+        self.assertEqual(x.mask,[195,205])
+        x, f = self.xobj(im,mask=[0,10,100,110,0,255])
+        self.assertEqual(x.mask,None)
+        x, f = self.xobj(im.convert('RGB'),mask=[190,210,195,255,0,205])
+        self.assertEqual(x.mask,[190,210,195,255,0,205])
+        from reportlab.lib.utils import getStringIO
+        from reportlab.pdfgen.canvas import Canvas
+        c = Canvas(getStringIO())
+        c.drawImage(ImageReader(self.xobj(im)[1]),0,0,mask=[190,210,195,255,0,205])
+        pdf = c.getpdfdata()
+        self.assertEqual(re.findall(r'/Mask \[\s*(\d+)\s+(\d+)\s*\]',pdf),[('195','205')])
+
+    def test1(self):
+        "alpha is only split into an SMask when it's needed"
+        from reportlab.lib.utils import Image
+        if Image is None: return
+        im = Image.new('RGBA',(4,4),(255,0,0,255))
+        x, f = self.xobj(im)
+        self.assertEqual(getattr(x,'_smask',None),None)
+        im.putpixel((1,1),(0,0,0,128))
+        x, f = self.xobj(im)
+        self.assertNotEqual(getattr(x,'_smask',None),None)
+
+    def test2(self):
+        from reportlab.lib.testutils import testsFolder
+        from reportlab.lib.utils import getStringIO
+        from reportlab.pdfgen.canvas import Canvas
+        c = Canvas(getStringIO())
+        c.drawImage(os.path.join(testsFolder,'tall_red.png'),0,0)
+        c.drawImage(ImageReader(os.path.join(testsFolder,'pythonpowered.gif')),0,0)
+        pdf = c.getpdfdata()
+        self.assertEqual(pdf.count('/DecodeParms'),1)
+        X = [x for x in pdf.split('endobj') if '/Subtype /Image' in x]
+        self.assertEqual(len(X),2)
+        for x in X:
+            self.assert_('ASCII85Decode' not in x)
+
 def makeSuite():
-    return makeSuiteForClasses(ReaderTestCase)
+    return makeSuiteForClasses(ReaderTestCase,ImageDedupTestCase,PNGPassthroughTestCase)
 
 #noruntests
 if __name__ == "__main__":
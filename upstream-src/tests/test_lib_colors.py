@@ -146,6 +146,26 @@ class ColorTestCase(unittest.TestCase):
 
         canvas.save()
 
+    def test6(self):
+        "toColor remembers string specs but honours extraColorsNS"
+        toColor = colors.toColor
+        for spec in ('rgb(10,20,30)', 'hsl(120,100%,50%)', '#ff8800', 'Red', 'ReportLabBlue', 'Color(1,0,0)'):
+            c = toColor(spec)
+            self.assert_(toColor(spec) is c, spec)
+        self.assertEqual(toColor('rgb(255,0,0)'), colors.red)
+        self.assertEqual(toColor('nosuchcolor',colors.pink), colors.pink)
+        self.assertRaises(ValueError, toColor, 'nosuchcolor')
+        try:
+            toColor.setExtraColorsNameSpace({'red':colors.blue, 'rgb(0,0,0)':colors.green, 'mine':colors.pink})
+            self.assertEqual(toColor('red'), colors.blue)
+            self.assertEqual(toColor('rgb(0,0,0)'), colors.black)
+            self.assertEqual(toColor('mine'), colors.pink)
+        finally:
+            toColor.setExtraColorsNameSpace({})
+        self.assertEqual(toColor('red'), colors.red)
+        hits, misses, size = colors.toColorCacheInfo()
+        self.assert_(hits and misses and size)
+
 
 def makeSuite():
     return makeSuiteForClasses(ColorTestCase)
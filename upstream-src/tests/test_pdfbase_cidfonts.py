@@ -0,0 +1,125 @@
+#Copyright ReportLab Europe Ltd. 2000-2008
+#see license.txt for license details
+"""Tests for the CMAP tables and widths of pdfbase.cidfonts
+"""
+__version__='''$Id$'''
+from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation
+setOutDir(__name__)
+import unittest, os, time
+from reportlab import rl_config
+from reportlab.pdfbase import cidfonts
+from reportlab.pdfbase.cidfonts import CIDEncoding, UnicodeCIDFont
+
+_baseCMap = '''%!PS-Adobe-3.0 Resource-CMap
+/CMapName /RLTest-Base def
+2 begincodespacerange
+<00> <80>
+<8140> <9ffc>
+endcodespacerange
+1 beginnotdefrange
+<8140> <817f> 5
+endnotdefrange
+3 begincidrange
+<20> <7e> 1
+<8180> <81ff> 100
+<8240> <82ff> 300
+endcidrange
+endcmap
+'''
+
+_cmap = '''%%!PS-Adobe-3.0 Resource-CMap
+/CMapName /RLTest-H def
+/RLTest-Base usecmap
+2 begincidrange
+<41> <43> %d
+<81a0> <8260> 2000
+endcidrange
+endcmap
+'''
+
+class CIDEncodingTestCase(unittest.TestCase):
+    "Test the CMAP range tables of CIDEncoding"
+
+    def setUp(self):
+        self._disable = cidfonts.DISABLE_CMAP
+        self._searchPath = rl_config.CMapSearchPath
+        cidfonts.DISABLE_CMAP = False
+        self.cmapDir = os.path.dirname(outputfile('RLTest-H'))
+        rl_config.CMapSearchPath = (self.cmapDir,)
+        self.writeCMaps(900)
+        cidfonts._cmapTables.clear()
+
+    def tearDown(self):
+        cidfonts.DISABLE_CMAP = self._disable
+        rl_config.CMapSearchPath = self._searchPath
+        cidfonts._cmapTables.clear()
+
+    def writeCMaps(self, firstCID):
+        open(os.path.join(self.cmapDir,'RLTest-Base'),'w').write(_baseCMap)
+        open(os.path.join(self.cmapDir,'RLTest-H'),'w').write(_cmap % firstCID)
+
+    def checkTranslate(self, enc, firstCID=900):
+        self.assertEqual(enc.translate('ABCD '),[firstCID,firstCID+1,firstCID+2,37,1])
+        #later ranges override the parts of earlier ones they cover
+        self.assertEqual(enc.translate('\x81\x80\x81\x9f\x81\xa0\x82\x60\x82\x61'),[100,131,2000,2192,333])
+        #undefined codes give the notdef cid or 0
+        self.assertEqual(enc.translate('\x81\x40\x81\x7f\x9f\x00\x80'),[5,5,0,0])
+
+    def test0(self):
+        "translate looks codes up in the parsed ranges"
+        enc = CIDEncoding('RLTest-H',useCache=0)
+        self.checkTranslate(enc)
+        cmap = enc.getCMap()
+        self.assertEqual(len(cmap),0x7e-0x20+1+0x8260-0x8180+1+0x82ff-0x8261+1)
+        self.assertEqual((cmap[0x41],cmap[0x44],cmap[0x8261]),(900,37,333))
+
+    def test1(self):
+        "the parsed tables are saved and reused until the CMAP files change"
+        from reportlab.lib.utils import get_rl_tempdir
+        fn = os.path.join(get_rl_tempdir('FastCMAPS'),'RLTest-H.fastcmap')
+        if os.path.isfile(fn): os.remove(fn)
+        enc = CIDEncoding('RLTest-H',useCache=1)
+        self.checkTranslate(enc)
+        self.assertEqual(enc.source,'CMAP: RLTest-H')
+        self.assert_(os.path.isfile(fn))
+
+        #the process shares the tables of each name
+        enc1 = CIDEncoding('RLTest-H',useCache=1)
+        self.checkTranslate(enc1)
+        self.assert_(enc1._cidTable is enc._cidTable)
+
+        #another process would read the saved file
+        cidfonts._cmapTables.clear()
+        enc = CIDEncoding('RLTest-H',useCache=1)
+        self.checkTranslate(enc)
+        self.assertEqual(enc.source,fn)
+
+        #a changed CMAP file is parsed again
+        cidfonts._cmapTables.clear()
+        self.writeCMaps(9000)
+        t = time.time()+10
+        os.utime(os.path.join(self.cmapDir,'RLTest-H'),(t,t))
+        enc = CIDEncoding('RLTest-H',useCache=1)
+        self.checkTranslate(enc,9000)
+        self.assertEqual(enc.source,'CMAP: RLTest-H')
+
+class UnicodeCIDFontTestCase(unittest.TestCase):
+    "Test UnicodeCIDFont widths"
+
+    def test0(self):
+        "stringWidth uses the unicode widths or 1000"
+        font = UnicodeCIDFont('HeiseiMin-W3')
+        text = u'\u6771\u4eac abc, m\uff61'
+        widths = font.unicodeWidths
+        self.assertEqual(font.stringWidth(text,10),10*0.001*sum([widths.get(c,1000) for c in text]))
+        self.assertEqual(font.stringWidth(text.encode('utf8'),10),font.stringWidth(text,10))
+        self.assertEqual(font.stringWidth(u'\u6771\u4eac',10),20)
+        self.assertEqual(font.stringWidth(u'',10),0)
+
+def makeSuite():
+    return makeSuiteForClasses(CIDEncodingTestCase,UnicodeCIDFontTestCase)
+
+#noruntests
+if __name__ == "__main__":
+    unittest.TextTestRunner().run(makeSuite())
+    printLocation()
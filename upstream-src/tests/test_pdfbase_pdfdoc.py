@@ -1,7 +1,8 @@
 from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation, NearTestCase
 setOutDir(__name__)
-import unittest,re,codecs
+import unittest,re,codecs,os
 from reportlab.pdfbase import pdfdoc
+from reportlab.lib.utils import getStringIO
 
 class PdfdocTestCase(NearTestCase):
     """Tests of expected Unicode and encoding behaviour
@@ -20,9 +21,197 @@ class PdfdocTestCase(NearTestCase):
         self.assertEquals(pdfdoc.PDFString(u'Hello\xa0World',1).format(self.doc),'(\\376\\377\\000H\\000e\\000l\\000l\\000o\\000\\240\\000W\\000o\\000r\\000l\\000d)')
         self.assertEquals(pdfdoc.PDFString(u'Hello\xa0World',0).format(self.doc),'(\xfe\xff\x00H\x00e\x00l\x00l\x00o\x00\xa0\x00W\x00o\x00r\x00l\x00d)')
 
+class FormatTestCase(unittest.TestCase):
+    "the accelerated pdfdoc.format must match the python version"
+    def setUp(self):
+        self.format = pdfdoc.format
+
+    def tearDown(self):
+        pdfdoc.format = self.format
+
+    def pyFormat(self, element, document, toplevel=0):
+        pdfdoc.format = pdfdoc._pyFormat
+        try:
+            return pdfdoc.format(element, document, toplevel)
+        finally:
+            pdfdoc.format = self.format
+
+    def elements(self, doc):
+        ref = doc.Reference(pdfdoc.PDFString('x'),'R0')
+        doc.idToObjectNumberAndVersion = {'R0':(7,0)}
+        class SubDict(pdfdoc.PDFDictionary): pass
+        commented = pdfdoc.PDFDictionary({'A':1})
+        commented.__Comment__ = 'a comment'
+        D = dict([('K%d' % i,i*1.5) for i in xrange(14)])
+        D.update({'Name#(1)':'/Foo','Arr':pdfdoc.PDFArray(range(23)),'Ref':ref,'Neg':-0.00000001,
+                'Compact':pdfdoc.PDFArrayCompact([0.125,-3,'  x  ']+range(20)),
+                'Sub':SubDict({'B':pdfdoc.PDFString('abc')}),'Comm':commented,
+                'Short':pdfdoc.PDFArray([1,2.25,'z']),'Uni':u'u'})
+        return [3, 0.3333333, 'string', u'unicode', 1e19, pdfdoc.PDFName('a b\xff%'),
+                pdfdoc.PDFArrayCompact(['  pad']+range(10)), pdfdoc.PDFArrayCompact(['  pad']+range(9)),
+                pdfdoc.PDFDictionary(D), pdfdoc.PDFDictionary({u'unicodekey':1,'other':2}),
+                pdfdoc.PDFArray([pdfdoc.PDFDictionary(D)]), ref]
+
+    def testFormat(self):
+        doc = pdfdoc.PDFDocument(invariant=1)
+        for e in self.elements(doc):
+            for toplevel in (0,1):
+                self.assertEquals(pdfdoc.format(e,doc,toplevel),self.pyFormat(e,doc,toplevel))
+        self.assertRaises(KeyError,pdfdoc.format,pdfdoc.PDFObjectReference('R1'),doc)
+        self.assertEquals(pdfdoc.PDFName('a b\xff%#'),'/a#20b#ff#25#23')
+
+    def testName(self):
+        "the accelerated PDFName must match the python one, unicode included"
+        for data in ('a b\xff%#', 'Helvetica', '', u'', u'caf\xe9', u'\xd8', u'\u20ac(x)'):
+            name = pdfdoc.PDFName(data)
+            self.assertEquals((name,type(name)),(pdfdoc._py_PDFName(data),type(pdfdoc._py_PDFName(data))))
+
+    def testDocument(self):
+        from reportlab.pdfgen.canvas import Canvas
+        def build():
+            c = Canvas(getStringIO(), invariant=1)
+            for i in xrange(3):
+                for j in xrange(15):
+                    c.linkURL('http://www.reportlab.com/%d/%d' % (i,j), (10,10+j*20,100,25+j*20), relative=0)
+                c.bookmarkPage('P%d' % i)
+                c.addOutlineEntry(u'Page \xe9 %d' % i,'P%d' % i)
+                c.showPage()
+            return c.getpdfdata()
+        ref = build()
+        pdfdoc.format = pdfdoc._pyFormat
+        self.assertEquals(build(),ref)
+
+class StreamThreadsTestCase(unittest.TestCase):
+    "streams filtered by a pool of threads before the document is written"
+    def setUp(self):
+        from reportlab import rl_config
+        self._saved = rl_config.pdfStreamThreads, rl_config.zlibCompressionLevel, rl_config.useA85
+
+    def tearDown(self):
+        from reportlab import rl_config
+        rl_config.pdfStreamThreads, rl_config.zlibCompressionLevel, rl_config.useA85 = self._saved
+
+    def build(self, threads, level=6, useA85=1):
+        from reportlab import rl_config
+        from reportlab.pdfgen.canvas import Canvas
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        rl_config.pdfStreamThreads = threads
+        rl_config.zlibCompressionLevel = level
+        rl_config.useA85 = useA85
+        pdfmetrics.registerFont(TTFont('Vera','Vera.ttf'))
+        c = Canvas(getStringIO(), invariant=1)
+        for i in xrange(6):
+            c.setFont(i%2 and 'Vera' or 'Helvetica',12)
+            for j in xrange(40):
+                c.drawString(10,10+j*15,'Page %d line %d' % (i,j))
+            c.showPage()
+        return c.getpdfdata()
+
+    def testThreads(self):
+        for useA85 in (0,1):
+            ref = self.build(0,useA85=useA85)
+            self.assertEquals(self.build(3,useA85=useA85),ref)
+            self.assertEquals(self.build(1,useA85=useA85),ref)
+        self.assertEquals(ref.count('/ASCII85Decode'),6)
+        self.assertEquals(ref.count('/FontFile2'),1)
+
+    def testLevel(self):
+        self.assert_(len(self.build(3,1,0))>len(self.build(3,9,0)))
+
+def checkXref(self,data):
+    "every xref entry must point at the start of its object"
+    xrefpos = int(data[data.rindex('startxref')+9:].split()[0])
+    self.assertEquals(data[xrefpos:xrefpos+4],'xref')
+    lines = data[xrefpos:].split('trailer')[0].split()
+    n = int(lines[2])
+    entries = lines[3:3+3*n]
+    for i in xrange(1,n):
+        offset = int(entries[3*i])
+        self.assert_(data[offset:].startswith('%d 0 obj' % i), 'bad offset for object %d' % i)
+
+class StreamOutputTestCase(unittest.TestCase):
+    "documents written incrementally by the canvas"
+    def _makeCanvas(self, f, streamOutput):
+        from reportlab.pdfgen.canvas import Canvas
+        from reportlab.lib.testutils import testsFolder
+        c = Canvas(f, invariant=1, streamOutput=streamOutput)
+        gif = os.path.join(testsFolder,'pythonpowered.gif')
+        for i in xrange(5):
+            c.drawString(100,700,'Page %d' % (i+1))
+            c.drawImage(gif,100,500)
+            c.bookmarkPage('P%d' % i)
+            c.addOutlineEntry('Page %d' % (i+1),'P%d' % i)
+            c.showPage()
+        return c
+
+    def testStreamed(self):
+        for streamOutput in (1,2):
+            f = getStringIO()
+            c = self._makeCanvas(f, streamOutput)
+            doc = c._doc
+            if streamOutput==1:
+                self.assert_(f.getvalue().startswith('%PDF-1.3'))
+            else:
+                self.assertEquals(f.getvalue(),'') #spooled until save
+            flushed = [o for o in doc.idToObject.values() if isinstance(o,pdfdoc.PDFFlushedObject)]
+            self.assertEquals(len(flushed),6)    #five page streams and one image
+            self.assertRaises(pdfdoc.PDFError,c.getpdfdata)
+            c.save()
+            data = f.getvalue()
+            checkXref(self,data)
+            self.assertEquals(data.count('/Subtype /Image'),1)
+            self.assertEquals(data.count('/Type /Page >>'),5)
+
+    def testEncryptedNotFlushed(self):
+        f = getStringIO()
+        from reportlab.pdfgen.canvas import Canvas
+        c = Canvas(f, invariant=1, streamOutput=1, encrypt='secret')
+        c.drawString(100,700,'hidden')
+        c.showPage()
+        self.failIf([o for o in c._doc.idToObject.values() if isinstance(o,pdfdoc.PDFFlushedObject)])
+        c.save()
+        checkXref(self,f.getvalue())
+
+    def testVersionRaised(self):
+        f = getStringIO()
+        from reportlab.pdfgen.canvas import Canvas
+        c = Canvas(f, invariant=1, streamOutput=1)
+        c.showPage()
+        c.setFillAlpha(0.5)
+        c.rect(10,10,100,100,fill=1)
+        c.save()
+        data = f.getvalue()
+        self.assert_(data.startswith('%PDF-1.3'))
+        self.assert_('/Version /1.4' in data)
+        checkXref(self,data)
+
+    def testMultiBuild(self):
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, PageBreak
+        from reportlab.platypus.tableofcontents import TableOfContents
+        from reportlab.lib.styles import getSampleStyleSheet
+        h1 = getSampleStyleSheet()['Heading1']
+        class Doc(SimpleDocTemplate):
+            def afterFlowable(self, flowable):
+                if isinstance(flowable,Paragraph) and flowable.style is h1:
+                    self.notify('TOCEntry', (0, flowable.getPlainText(), self.page))
+        fn = outputfile('test_pdfbase_pdfdoc_stream.pdf')
+        doc = Doc(fn, invariant=1, streamOutput=1)
+        story = [TableOfContents()]
+        for i in xrange(3):
+            story.append(PageBreak())
+            story.append(Paragraph('Chapter %d' % i, h1))
+        doc.multiBuild(story)
+        data = open(fn,'rb').read()
+        checkXref(self,data)
+        self.assertEquals(data.count('/Type /Page >>'),4)
+
 def makeSuite():
     return makeSuiteForClasses(
         PdfdocTestCase,
+        FormatTestCase,
+        StreamThreadsTestCase,
+        StreamOutputTestCase,
         )
 
 #noruntests
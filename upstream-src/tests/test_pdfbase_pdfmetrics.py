@@ -97,8 +97,43 @@ class PDFMetricsTestCase(unittest.TestCase):
         makeTestDoc(fontNamesToTest)
 
 
+class StringWidthCacheTestCase(unittest.TestCase):
+    "Test the stringWidth cache."
+
+    def tearDown(self):
+        from reportlab.rl_config import _reset
+        _reset()
+
+    def test0(self):
+        "cached widths match the font's and scale with size"
+        from reportlab import rl_config
+        rl_config._reset()
+        font = pdfmetrics.getFont('Helvetica')
+        for text in ('Hello', u'Hello', 'caf\xc3\xa9', u'caf\xe9', '', 'Hello'):
+            for size in (10, 7.5):
+                self.assertAlmostEqual(pdfmetrics.stringWidth(text,'Helvetica',size),font.stringWidth(text,size),8)
+        hits, misses, size = pdfmetrics.stringWidthCacheInfo()
+        self.assertEqual((hits,misses,size),(8,4,4))
+        #latin-1 text isn't cached as the key doesn't know its encoding
+        self.assertAlmostEqual(pdfmetrics.stringWidth('caf\xe9','Helvetica',10,'latin1'),font.stringWidth(u'caf\xe9',10),8)
+        self.assertEqual(pdfmetrics.stringWidthCacheInfo(),(hits,misses,size))
+
+    def test1(self):
+        "the cache is bounded and cleared by reset"
+        from reportlab import rl_config
+        rl_config.stringWidthCacheSize = 100
+        pdfmetrics._widthCaches.clear()
+        for i in xrange(1000):
+            pdfmetrics.stringWidth(str(i),'Times-Roman',10)
+        self.assert_(pdfmetrics.stringWidthCacheInfo()[2]<=100)
+        rl_config._reset()
+        self.assertEqual(pdfmetrics.stringWidthCacheInfo(),(0,0,0))
+        rl_config.stringWidthCacheSize = 0
+        pdfmetrics.stringWidth('Hello','Times-Roman',10)
+        self.assertEqual(pdfmetrics.stringWidthCacheInfo(),(0,0,0))
+
 def makeSuite():
-    return makeSuiteForClasses(PDFMetricsTestCase)
+    return makeSuiteForClasses(PDFMetricsTestCase,StringWidthCacheTestCase)
 
 
 #noruntests
@@ -133,6 +133,30 @@ class TTFontFileTestCase(NearTestCase):
         self.assertEquals(ttf.stemV, 87)
         self.assertEquals(ttf.defaultWidth, 600.09765625)
 
+    def testInfoCache(self):
+        "Tests the TTFontFile extracted info cache"
+        import os, shutil
+        fn = outputfile('test_pdfbase_ttfonts_cache.ttf')
+        shutil.copyfile(TTFOpenFile("Vera.ttf")[0],fn)
+        ref = TTFontFile(StringIO(open(fn,'rb').read()))
+        cacheFile = ref._infoCacheFile(1,0)
+        self.assertEquals(cacheFile,None)
+        ttf = TTFontFile(fn)
+        cacheFile = ttf._infoCacheFile(1,0)
+        self.assert_(os.path.isfile(cacheFile))
+        self.failIfEqual(cacheFile,ttf._infoCacheFile(0,0))
+        class CachedTTFontFile(TTFontFile):
+            def extractInfo(self,charInfo=1):
+                raise ValueError('info should come from the cache')
+        ttf = CachedTTFontFile(fn)
+        for a in TTFontFile._infoAttrs:
+            self.assertEquals(getattr(ttf,a),getattr(ref,a))
+        self.assertEquals(ttf.makeSubset(range(32,128)),ref.makeSubset(range(32,128)))
+        #a changed font file has a different cache file
+        os.utime(fn,(0,0))
+        self.failIfEqual(ttf._infoCacheFile(1,0),cacheFile)
+        self.assertRaises(ValueError,CachedTTFontFile,fn)
+
     def testAdd32(self):
         "Test add32"
         self.assertEquals(add32(10, -6), 4)
@@ -187,6 +211,30 @@ class TTFontFileTestCase(NearTestCase):
         self.assertNear(subset.bbox, [-183.10546875, -235.83984375, 1287.109375, 928.22265625])
         self.assertEquals(subset.stemV, 87)
 
+    def testSubsetMemo(self):
+        "Tests makeSubset gives the same results when it remembers glyphs and subsets"
+        ttf = TTFontFile("Vera.ttf")
+        codes = ttf.charToGlyph.keys()
+        codes.sort()
+        subsets = [codes[i:i+64] for i in xrange(0,len(codes),64)]
+        self.assert_([c for c in codes if ttf._getGlyph(ttf.charToGlyph[c])[1]],'no composite glyphs')
+        def cold():
+            L = []
+            for s in subsets:
+                ttf.__dict__.pop('_glyphRefs',None)
+                ttf.__dict__.pop('_subsetCache',None)
+                L.append(ttf.makeSubset(s))
+            return L
+        ref = cold()
+        self.assertEquals([ttf.makeSubset(s) for s in subsets],ref)
+        ttf._subsetCache.clear()
+        self.assertEquals([ttf.makeSubset(s) for s in subsets],ref)
+        self.assertEquals([ttf.makeSubset(s) for s in subsets[-3:]],ref[-3:])
+        #only the composite glyph references are kept, not the glyph data
+        R = ttf._glyphRefs.values()
+        self.assert_(R)
+        self.assertEquals([c for c in R if type(c) is not tuple or [x for x in c if type(x) is not int]],[])
+
     def testFontMaker(self):
         "Tests TTFontMaker class"
         ttf = TTFontMaker()
@@ -0,0 +1,134 @@
+#Copyright ReportLab Europe Ltd. 2000-2008
+#see license.txt for license details
+"""Tests for reusing repeated drawings as form xobjects
+"""
+__version__='''$Id$'''
+from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation
+setOutDir(__name__)
+import unittest, re
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.utils import getStringIO
+from reportlab.graphics.shapes import Drawing, Rect, String, Circle
+from reportlab.graphics import renderPDF
+from reportlab.platypus import SimpleDocTemplate, Flowable, PageBreak, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+
+def makeLogo():
+    d = Drawing(100,40)
+    for i in xrange(20):
+        d.add(Circle(10+i*4,20,5+i%7,fillColor=colors.Color(i/20.,0.5,0.2)))
+    d.add(String(5,5,'ACME',fontSize=9))
+    return d
+
+class Box(Flowable):
+    def __init__(self,w,h,cached=1):
+        self.width = w
+        self.height = h
+        self.cached = cached
+
+    def draw(self):
+        self.canv.rect(0,0,self.width,self.height)
+
+    def getFormKey(self):
+        if self.cached: return (self.width,self.height)
+
+class FormCacheTestCase(unittest.TestCase):
+    "Test Canvas.drawCachedForm and its use for drawings"
+
+    def setUp(self):
+        self._formCaching = rl_config.formCaching
+
+    def tearDown(self):
+        rl_config.formCaching = self._formCaching
+
+    def build(self, story, formCaching=1, pageLogo=1):
+        rl_config.formCaching = formCaching
+        f = getStringIO()
+        logo = makeLogo()
+        def onPage(canv,doc):
+            if pageLogo: renderPDF.draw(logo,canv,400,780)
+        SimpleDocTemplate(f,invariant=1,pageCompression=0).build(story,onFirstPage=onPage,onLaterPages=onPage)
+        return f.getvalue()
+
+    def story(self):
+        story = []
+        for i in xrange(5):
+            story += [makeLogo(), Box(100,20), Box(50,50,0), PageBreak()]
+        return story
+
+    def test0(self):
+        "repeated drawings become forms"
+        ref = self.build(self.story(),0)
+        pdf = self.build(self.story())
+        open(outputfile('test_pdfgen_formcache.pdf'),'wb').write(pdf)
+        self.assertEqual(ref.count('/Subtype /Form'),0)
+        self.assertEqual(pdf.count('/Subtype /Form'),3)
+        #first use is drawn inline, the other four pages use the form
+        self.assertEqual(pdf.count('/FormXob.rlFormCache0 Do'),4)
+        self.assertEqual(pdf.count('/FormXob.rlFormCache1 Do'),4)
+        self.assertEqual(pdf.count('/FormXob.rlFormCache2 Do'),4)
+        self.assert_(len(pdf)<len(ref))
+        self.assertEqual(pdf,self.build(self.story()))
+
+    def test1(self):
+        "drawings which may differ when drawn get no key"
+        d = makeLogo()
+        k = d.getFormKey()
+        self.assert_(k)
+        self.assertEqual(k,makeLogo().getFormKey())
+        d.contents[0].fillColor = colors.blue
+        self.failIfEqual(d.getFormKey(),k)
+        d.contents[0].fillColor = colors.Color(0.0,0.5,0.2)
+        self.assertEqual(d.getFormKey(),k)
+        d.contents[0].__dict__['fn'] = lambda: None
+        self.assertEqual(d.getFormKey(),None)
+        d = makeLogo()
+        d.contents[1]._drawTimeCallback = renderPDF.draw
+        self.assertEqual(d.getFormKey(),None)
+
+    def test2(self):
+        "drawCachedForm draws unseen and nested content inline"
+        from reportlab.pdfgen.canvas import Canvas
+        c = Canvas(getStringIO())
+        calls = []
+        def inner(x,y):
+            calls.append(('inner',x,y))
+        def outer(x,y):
+            calls.append(('outer',x,y))
+            c.drawCachedForm('inner',inner,x,y)
+        for i in xrange(3):
+            c.drawCachedForm('outer',outer,10,20)
+        self.assertEqual(calls,[('outer',10,20),('inner',10,20),('outer',0,0),('inner',0,0)])
+        self.assertEqual(c._doc.formCache,{'outer':'rlFormCache0'})
+
+    def test3(self):
+        "one drawing placed at different positions is still reused"
+        normal = getSampleStyleSheet()['Normal']
+        logo = makeLogo()
+        story = []
+        for i in xrange(1,9):
+            story += [Paragraph('word '*(40*i),normal), logo]
+        pdf = self.build(story,pageLogo=0)
+        self.assertEqual(pdf.count('/Subtype /Form'),1)
+        self.assertEqual(pdf.count('/FormXob.rlFormCache0 Do'),7)
+
+    def test4(self):
+        "a form's resources include the transparency and spot colours it uses"
+        d = Drawing(100,40)
+        d.add(Rect(0,0,50,40,fillColor=colors.red,fillOpacity=0.5))
+        d.add(Rect(50,0,50,40,fillColor=colors.CMYKColorSep(0,0.5,1,0,spotName='PANTONE 100')))
+        pdf = self.build([d,d,d],pageLogo=0)
+        self.assertEqual(pdf.count('/Subtype /Form'),1)
+        form = re.search(r'<< /BBox .*?/Subtype /Form',pdf,re.S).group()
+        self.assert_(re.search(r'/ExtGState << /gRLs\d+ ',form),form)
+        self.assert_('/ColorSpace << /PANTONE#20100 ' in form,form)
+        self.assert_('/PANTONE#20100 cs' in pdf)
+
+def makeSuite():
+    return makeSuiteForClasses(FormCacheTestCase)
+
+#noruntests
+if __name__ == "__main__":
+    unittest.TextTestRunner().run(makeSuite())
+    printLocation()
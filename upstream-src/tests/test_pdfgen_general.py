@@ -1040,6 +1040,24 @@ class PdfgenTestCase(unittest.TestCase):
         canv.showPage()
         canv.save()
 
+    def test6(self):
+        '''text object code'''
+        from reportlab.lib.utils import getStringIO
+        c = canvas.Canvas(getStringIO())
+        t = c.beginText(10,20)
+        t.setFont('Helvetica',10)
+        t.textLine('first (line)')
+        t.textLine()
+        t.textOut('')
+        t.textOut('out')
+        t.moveCursor(5,6)
+        t.moveCursor(1,2)
+        t._textOut('',1)
+        t.textLines('a\nb')
+        self.assertEquals(t._formatText('a'),'(a) Tj')
+        self.assertEquals(t.getCode(),
+            'BT 1 0 0 1 10 20 Tm /F1 10 Tf 12 TL (first \\(line\\)) Tj T*  T*  (out) Tj 6 -8 Td  T* (a) Tj T* (b) Tj T* ET')
+
 def trySomeColors(C,enforceColorSpace=None):
     from StringIO import StringIO
     out=StringIO()
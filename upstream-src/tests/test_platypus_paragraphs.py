@@ -3,7 +3,7 @@
 """Tests for the reportlab.platypus.paragraphs module.
 """
 __version__=''' $Id$ '''
-from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation
+from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation, skipUnless
 setOutDir(__name__)
 import sys, os, unittest
 from string import split, strip, join, whitespace
@@ -16,7 +16,7 @@ from reportlab.platypus.flowables import Flowable
 from reportlab.lib.colors import Color
 from reportlab.lib.units import cm
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER, TA_JUSTIFY
-from reportlab.lib.utils import _className
+from reportlab.lib.utils import _className, getLanguageHyphenater
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus.paragraph import Paragraph
 from reportlab.platypus.xpreformatted import XPreformatted
@@ -553,10 +553,183 @@ phonemic and morphological analysis.'''
         doc = MyDocTemplate(outputfile('test_platypus_paragraphs_just.pdf'))
         doc.build(story)
 
+def paraLines(text, style, width):
+    "return (extraSpace, text, lineBreak) for each line of a Paragraph wrapped to width"
+    P = Paragraph(text,style)
+    P.wrap(width,1000)
+    blPara = P.blPara
+    if blPara.kind:
+        return [(l.extraSpace, join([w.text for w in l.words],''), getattr(l,'lineBreak',0)) for l in blPara.lines]
+    return [(l[0], join(l[1]), 0) for l in blPara.lines]
+
+class KnuthPlassTestCase(unittest.TestCase):
+    "Test wordWrap='KP' Knuth-Plass line breaking."
+    def lines(self, text, style, width=200):
+        return paraLines(text, style, width)
+
+    def testBreaks(self):
+        from reportlab.lib.textsplit import Box, Glue, Penalty, kpBreaks, INFINITY_PENALTY
+        end = [Penalty(0,INFINITY_PENALTY),Glue(0,1e5,0),Penalty(0,-INFINITY_PENALTY)]
+        items = [Box(10),Glue(5,3,1),Box(10),Glue(5,3,1),Box(20),Glue(5,3,1),Box(10)]
+        self.assertEqual(kpBreaks(items+end,[40]),[3,9])
+        self.assertEqual(kpBreaks(items+end,[1000]),[9])
+        #an overlong box gets a line to itself
+        items[2] = Box(200)
+        self.assertEqual(kpBreaks(items+end,[40]),[1,3,9])
+        self.assertEqual(kpBreaks([],[40]),[])
+
+    def testLines(self):
+        from reportlab.lib import randomtext
+        import random
+        random.seed(7)
+        styleSheet = getSampleStyleSheet()
+        greedy = ParagraphStyle('greedy',parent=styleSheet['Normal'],alignment=TA_JUSTIFY)
+        kp = ParagraphStyle('kp',parent=greedy,wordWrap='KP')
+        slack = [0,0]
+        for i in xrange(20):
+            text = randomtext.randomText(randomtext.PYTHON, 10)
+            for markup in 0, 1:
+                if markup:
+                    text = text.replace(' a ',' <b>a</b> ').replace(' the ',' the<br/>',1)
+                G = self.lines(text,greedy)
+                K = self.lines(text,kp)
+                self.assertEqual(join([t for e,t,b in K]).split(),join([t for e,t,b in G]).split())
+                self.assertEqual([b for e,t,b in K].count(1),[b for e,t,b in G].count(1))
+                for e,t,b in K:
+                    self.assert_(e>=-1e-8 or ' ' not in t.strip(), 'overfull line %r' % t)
+                for j,L in enumerate((G,K)):
+                    slack[j] += sum([e*e for e,t,b in L[:-1] if not b])
+        #the spacing is more even
+        self.assert_(slack[1]<slack[0])
+
+    def testBuild(self):
+        from reportlab.lib.randomtext import randomText, PYTHON
+        styleSheet = getSampleStyleSheet()
+        normal = styleSheet['Normal']
+        story = []
+        for wordWrap in None, 'KP':
+            style = ParagraphStyle('just',parent=normal,alignment=TA_JUSTIFY,wordWrap=wordWrap,spaceAfter=12)
+            story.append(Paragraph('wordWrap=%r' % wordWrap,normal))
+            for text in (randomText(PYTHON,5), '<b>%s</b> <i>%s</i><br/>%s' % (randomText(PYTHON,2),randomText(PYTHON,2),randomText(PYTHON,2))):
+                story.append(Paragraph(text,style))
+        doc = MyDocTemplate(outputfile('test_platypus_paragraphs_kp.pdf'))
+        doc.build(story)
+
+_noHyphenater = 'no English hyphenation patterns (is _pyHnj built?)'
+
+class HyphenationTestCase(unittest.TestCase):
+    "Test hyphenation of overflowing words with hyphenationLang."
+    def lines(self, text, style, width=90):
+        return paraLines(text, style, width)
+
+    @skipUnless(getLanguageHyphenater('en'),_noHyphenater)
+    def testPoints(self):
+        from reportlab.lib.textsplit import hyphenationPoints, _hyphenations
+        self.assertEqual(hyphenationPoints(u'hyphenation','en'),(2,6))
+        self.assertEqual(hyphenationPoints(u'"Hyphenation,"','en'),(3,7))
+        self.assertEqual(hyphenationPoints(u'caf\xe9','en'),())
+        #latin-1 letters are hyphenated too, other words aren't
+        self.assertEqual(hyphenationPoints(u'encyclop\xe6dia,','en'),(2,4,8))
+        self.assertEqual(hyphenationPoints(u'\u03c5\u03c0\u03bf\u03bb\u03bf\u03b3\u03b9\u03c3\u03c4\u03ae\u03c2','en'),())
+        self.assertEqual(hyphenationPoints(u'hyphenation','xx'),())
+        hits = _hyphenations.hits
+        hyphenationPoints(u'hyphenation','en')
+        self.assertEqual(_hyphenations.hits,hits+1)
+
+    @skipUnless(getLanguageHyphenater('en'),_noHyphenater)
+    def testLines(self):
+        styleSheet = getSampleStyleSheet()
+        plain = ParagraphStyle('plain',parent=styleSheet['Normal'])
+        hyph = ParagraphStyle('hyph',parent=plain,hyphenationLang='en')
+        text = ('The representation of international characters requires '
+                'considerable understanding of typographical conventions and hyphenation.')
+        for markup in 0, 1:
+            if markup: text = text.replace('of ','<i>of</i> ')
+            P = self.lines(text,plain)
+            H = self.lines(text,hyph)
+            #the lines are fuller
+            self.assert_(sum([e for e,t,b in H[:-1]])<sum([e for e,t,b in P[:-1]]))
+            self.assert_([t for e,t,b in H if t.strip().endswith('-')])
+            self.assertEqual(''.join([t.strip().endswith('-') and t.strip()[:-1] or t.strip()+' ' for e,t,b in H]).split(),
+                    ' '.join([t for e,t,b in P]).split())
+            for e,t,b in H:
+                self.assert_(e>=-1e-8 or ' ' not in t.strip(), 'overfull line %r' % t)
+
+    def testBuild(self):
+        from reportlab.lib.randomtext import randomText, PYTHON
+        styleSheet = getSampleStyleSheet()
+        normal = styleSheet['Normal']
+        story = []
+        for lang in None, 'en':
+            style = ParagraphStyle('narrow',parent=normal,alignment=TA_JUSTIFY,hyphenationLang=lang,
+                        rightIndent=300,spaceAfter=12)
+            story.append(Paragraph('hyphenationLang=%r' % lang,normal))
+            story.append(Paragraph(randomText(PYTHON,5),style))
+        doc = MyDocTemplate(outputfile('test_platypus_paragraphs_hyphenation.pdf'))
+        doc.build(story)
+
+class WrapCacheTestCase(unittest.TestCase):
+    "Test Paragraph.wrap remembers its line breaks."
+    def testWrap(self):
+        from reportlab.platypus.paragraph import wrapCacheInfo
+        styleSheet = getSampleStyleSheet()
+        style = ParagraphStyle('wc',parent=styleSheet['Normal'])
+        text = 'Some <b>bold</b> text which needs several lines at these widths. '*3
+        P = Paragraph(text,style)
+        hits, misses = wrapCacheInfo()
+        w0 = P.wrap(100,1000)
+        blPara = P.blPara
+        w1 = P.wrap(200,1000)
+        self.assertEqual(P.wrap(100,50),w0)
+        self.assert_(P.blPara is blPara)
+        self.assertEqual(wrapCacheInfo(),(hits+1,misses+2))
+        #style and frag changes are noticed
+        style.leftIndent = 20
+        self.assertNotEqual(P.wrap(100,1000),w0)
+        style.leftIndent = 0
+        P.frags = P.frags[:1]
+        self.assertNotEqual(P.wrap(100,1000),w0)
+        self.assertEqual(wrapCacheInfo(),(hits+1,misses+4))
+        self.assertEqual(Paragraph(text,style).wrap(200,1000),w1)
+
+    def testFragChanges(self):
+        "changing a frag in place or replacing it is noticed"
+        from reportlab.platypus.paragraph import wrapCacheInfo
+        styleSheet = getSampleStyleSheet()
+        text = 'Some <b>bold</b> text which needs several lines at these widths. '*3
+        P = Paragraph(text,styleSheet['Normal'])
+        w0 = P.wrap(100,1000)
+        f = P.frags[-1]
+        t = f.text
+        f.text = t*3
+        w1 = P.wrap(100,1000)
+        self.assert_(w1[1]>w0[1])
+        f.text = t
+        self.assertEqual(P.wrap(100,1000),w0)
+        f.fontSize *= 2
+        self.assert_(P.wrap(100,1000)[1]>w0[1])
+        f.fontSize /= 2
+        g = f.clone(text=t*3)
+        P.frags[-1] = g
+        self.assertEqual(P.wrap(100,1000),w1)
+        hits, misses = wrapCacheInfo()
+        P.wrap(100,1000)
+        self.assertEqual(wrapCacheInfo(),(hits+1,misses))
+
+    def testBuild(self):
+        from reportlab.platypus import Table
+        styleSheet = getSampleStyleSheet()
+        normal = styleSheet['Normal']
+        data = [[Paragraph('cell %d has a little text in it' % (i*3+j),normal) for j in xrange(3)] for i in xrange(40)]
+        doc = MyDocTemplate(outputfile('test_platypus_paragraphs_wrapcache.pdf'))
+        doc.build([Table(data,colWidths=[100]*3)])
+        hits, misses = doc.wrapCacheInfo
+        self.assert_(hits>0 and misses>=120, 'wrapCacheInfo=%r' % (doc.wrapCacheInfo,))
+
 #noruntests
 def makeSuite():
     return makeSuiteForClasses(ParagraphCorners,SplitFrameParagraphTest,FragmentTestCase, ParagraphSplitTestCase, ULTestCase, JustifyTestCase,
-            AutoLeadingTestCase)
+            AutoLeadingTestCase, KnuthPlassTestCase, HyphenationTestCase, WrapCacheTestCase)
 
 #noruntests
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+#Copyright ReportLab Europe Ltd. 2000-2008
+#see license.txt for license details
+"""Tests for BaseDocTemplate.parallelBuild and incremental multiBuild
+"""
+__version__='''$Id$'''
+from reportlab.lib.testutils import setOutDir,makeSuiteForClasses, outputfile, printLocation
+setOutDir(__name__)
+import unittest
+from reportlab.lib.units import cm
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import getStringIO
+from reportlab.platypus import Paragraph, Spacer, PageBreak, Frame, PageTemplate, \
+        BaseDocTemplate, SimpleDocTemplate, Image, NextPageTemplate
+from reportlab.platypus.flowables import DocAssign, DocPara
+from reportlab.platypus.doctemplate import LayoutError
+from reportlab.platypus import tableofcontents
+from reportlab.lib import randomtext
+from reportlab.lib.testutils import testsFolder
+import os, random
+
+def myPage(canv, doc):
+    canv.saveState()
+    canv.setFont('Times-Roman', 10)
+    canv.drawString(10*cm, cm, 'page %d' % doc.page)
+    canv.restoreState()
+
+class MyDocTemplate(BaseDocTemplate):
+    def __init__(self, filename, **kw):
+        BaseDocTemplate.__init__(self, filename, **kw)
+        F = [Frame(2*cm, 2*cm, 7.5*cm, 25*cm, id='left'), Frame(10*cm, 2*cm, 7.5*cm, 25*cm, id='right')]
+        self.addPageTemplates([PageTemplate('normal', F[:1], myPage),
+                    PageTemplate('twocol', F, myPage)])
+
+    def afterFlowable(self, flowable):
+        if isinstance(flowable,Paragraph) and flowable.style.name.startswith('Heading'):
+            text = flowable.getPlainText()
+            self.canv.bookmarkPage(text)
+            self.canv.addOutlineEntry(text, text, int(flowable.style.name[7:])-1)
+            self.notify('TOCEntry', (int(flowable.style.name[7:])-1, text, self.page, text))
+
+def makeSections(n=3, paras=12):
+    random.seed(n)
+    styles = getSampleStyleSheet()
+    sections = []
+    for i in xrange(n):
+        S = [Paragraph('Chapter %d' % i, styles['Heading1'])]
+        if i==1:
+            S.append(NextPageTemplate('twocol'))
+            S.append(DocAssign('chapter', repr('two')))
+            S.append(DocPara('chapter', 'this is chapter %(__expr__)s'))
+        for j in xrange(paras):
+            if j%5==4:
+                S.append(Paragraph('Section %d.%d' % (i,j), styles['Heading2']))
+            S.append(Paragraph(randomtext.randomText(randomtext.PYTHON, 7), styles['Normal']))
+            S.append(Spacer(0, 6))
+        sections.append(S)
+    return sections
+
+def serialStory(sections):
+    story = []
+    for S in sections:
+        if story:
+            story.append(NextPageTemplate('normal'))
+            story.append(PageBreak())
+        story.extend(S)
+    return story
+
+class PidSpacer(Spacer):
+    "a Spacer noting the processes which wrap it"
+    pids = []
+    def wrap(self, aW, aH):
+        self.pids.append(os.getpid())
+        return Spacer.wrap(self, aW, aH)
+
+class BadFlowable(Spacer):
+    def wrap(self, aW, aH):
+        raise ValueError('this flowable never fits')
+
+class ParallelBuildTestCase(unittest.TestCase):
+    "Test parallelBuild against build"
+
+    def serial(self, sections, toc=None):
+        f = getStringIO()
+        doc = MyDocTemplate(f, invariant=1)
+        story = serialStory(sections)
+        if toc:
+            doc.multiBuild([toc, PageBreak()]+story)
+        else:
+            doc.build(story)
+        return f.getvalue()
+
+    def parallel(self, sections, processes=None, toc=None):
+        f = getStringIO()
+        doc = MyDocTemplate(f, invariant=1)
+        if toc:
+            sections = [[toc]]+sections
+        passes = doc.parallelBuild(sections, processes=processes)
+        return f.getvalue(), passes
+
+    def test0(self):
+        "parallelBuild matches build"
+        ref = self.serial(makeSections())
+        for processes in 1, 3:
+            pdf, passes = self.parallel(makeSections(), processes)
+            self.assertEqual(passes,1)
+            self.assertEqual(pdf,ref)
+        open(outputfile('test_platypus_parallel.pdf'),'wb').write(pdf)
+        self.assert_(pdf.count('/Type /Page >>')>3)
+
+    def test1(self):
+        "sections which can't be pickled are laid out in process"
+        fn = os.path.join(testsFolder,'pythonpowered.gif')
+        def sections():
+            S = makeSections(2)
+            S[1].insert(2,Image(open(fn,'rb')))
+            return S
+        ref = self.serial(sections())
+        pdf, passes = self.parallel(sections(), 2)
+        self.assertEqual(pdf,ref)
+
+    def test2(self):
+        "indexing flowables get multiple passes"
+        ref = self.serial(makeSections(4), tableofcontents.TableOfContents())
+        pdf, passes = self.parallel(makeSections(4), 4, tableofcontents.TableOfContents())
+        self.assert_(passes>1)
+        self.assertEqual(pdf,ref)
+
+    def test3(self):
+        "errors laying out a section in a worker are reported"
+        S = makeSections(2)
+        S[1].insert(3,BadFlowable(10,10))
+        doc = MyDocTemplate(getStringIO())
+        try:
+            doc.parallelBuild(S, processes=2)
+        except LayoutError, e:
+            self.assert_('this flowable never fits' in str(e),str(e))
+        else:
+            self.fail('parallelBuild should have raised a LayoutError')
+
+    def test4(self):
+        "sections are laid out in process when the workers wouldn't be forked"
+        from reportlab.platypus import doctemplate
+        def sections():
+            S = makeSections(2)
+            for s in S: s.append(PidSpacer(10,10))
+            return S
+        del PidSpacer.pids[:]
+        self.parallel(sections(), 2)
+        self.assertEqual(PidSpacer.pids.count(os.getpid()),0)
+        forkedWorkers = doctemplate._forkedWorkers
+        doctemplate._forkedWorkers = lambda: 0
+        try:
+            pdf, passes = self.parallel(sections(), 2)
+        finally:
+            doctemplate._forkedWorkers = forkedWorkers
+        self.assertEqual(PidSpacer.pids.count(os.getpid()),2)
+        self.assertEqual(pdf,self.serial(sections()))
+
+class IncrementalMultiBuildTestCase(unittest.TestCase):
+    "Test multiBuild(incremental=1) against multiBuild"
+
+    def build(self, story, incremental=0):
+        f = getStringIO()
+        doc = MyDocTemplate(f, invariant=1)
+        P = []
+        def progress(typ, value):
+            if typ in ('REUSED','RELAID'): P.append((typ,value))
+        doc.setProgressCallBack(progress)
+        passes = doc.multiBuild(story, incremental=incremental)
+        return f.getvalue(), passes, P
+
+    def story(self, at, n=4, brk=1):
+        story = serialStory(makeSections(n))
+        story[at:at] = [tableofcontents.TableOfContents()]+brk*[PageBreak()]
+        return story
+
+    def check(self, story, reused):
+        ref, refPasses, P = self.build(story())
+        self.assertEqual(P,[])
+        pdf, passes, P = self.build(story(),1)
+        self.assertEqual(passes,refPasses)
+        self.assertEqual(pdf,ref)
+        npages = pdf.count('/Type /Page >>')
+        self.assertEqual(P[-1][1]+P[-2][1],npages)
+        self.assertEqual([v for t,v in P[::2]],reused)
+        return pdf
+
+    def test0(self):
+        "pages before a changed toc are kept"
+        self.check(lambda: self.story(20),[0,3])
+
+    def test1(self):
+        "a toc that keeps its size doesn't need a new layout"
+        pdf = self.check(lambda: self.story(1,8,0),[0,0,42])
+        open(outputfile('test_platypus_incremental.pdf'),'wb').write(pdf)
+
+    def test2(self):
+        "SimpleDocTemplate makes its page templates for an incremental multiBuild"
+        def build(incremental):
+            f = getStringIO()
+            doc = SimpleDocTemplate(f, invariant=1, pageCompression=0)
+            story = serialStory(makeSections(3))
+            story[1:1] = [tableofcontents.TableOfContents(), PageBreak()]
+            for i,s in enumerate(story):
+                if isinstance(s,NextPageTemplate):
+                    story[i] = Spacer(0,0)
+            passes = doc.multiBuild(story, incremental=incremental, onLaterPages=myPage)
+            return f.getvalue(), passes
+        ref, refPasses = build(0)
+        pdf, passes = build(1)
+        self.assertEqual(passes,refPasses)
+        self.assertEqual(pdf,ref)
+        self.assert_('(page 2)' in pdf)
+        doc = SimpleDocTemplate(getStringIO())
+        self.assertRaises(TypeError,doc.multiBuild,[Spacer(0,0)],incremental=1,onEveryPage=myPage)
+
+def makeSuite():
+    return makeSuiteForClasses(ParallelBuildTestCase,IncrementalMultiBuildTestCase)
+
+#noruntests
+if __name__ == "__main__":
+    unittest.TextTestRunner().run(makeSuite())
+    printLocation()
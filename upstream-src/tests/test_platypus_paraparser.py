@@ -114,8 +114,84 @@ class ParaParserTestCase(unittest.TestCase):
         from reportlab.platypus.paragraph import Paragraph
         p = Paragraph(txt, self.style)
 
+    def testStrict(self):
+        "bare & or < and entities or charrefs without ; are errors"
+        for txt, error in (
+                ('a & b','bogus < or &'),
+                ('x < y','bogus < or &'),
+                ('<b>x</b> &','bogus < or &'),
+                ('AT&T','; missing in entityref'),
+                ('Tom &amp Jerry','; missing in entityref'),
+                ('x &amp','; missing in entityref'),
+                ('&#65','; missing in charref'),
+                ):
+            for txt in txt, unicode(txt):
+                p = ParaParser()
+                self.assertEquals(p.parse(txt, self.style)[1], None, 'parse(%r)' % txt)
+                self.assertEquals(p.errors, [error], 'parse(%r)' % txt)
+        fragList = ParaParser().parse('a > b <![CDATA[x<y&z]]>', self.style)[1]
+        self.assertEquals(''.join([f.text for f in fragList]), 'a > b x<y&z')
+
+    def testLenient(self):
+        "known entities without ; are accepted, unknown ones are left alone"
+        fragList = ParaParser(lenient=1).parse(u"a &lt;br/&gt b &amp c AT&T <z &#65", self.style)[1]
+        self.assertEquals(u''.join([f.text for f in fragList]), u'a <br/> b & c AT&T <z A')
+
+    def testAttributeRefs(self):
+        fragList = ParaParser().parse(u'<a href="x?a=1&amp;b=&#233;">link</a>', self.style)[1]
+        self.assertEquals(fragList[0].link, 'x?a=1&b=\xc3\xa9')
+
+    def testParseCache(self):
+        from reportlab.rl_config import _reset
+        from reportlab.platypus.paraparser import parseCacheInfo
+        _reset()
+        txt = u"Hello <b>Bold</b> World"
+        F0 = ParaParser().parse(txt, self.style)[1]
+        F0[0].text = u'changed'
+        F1 = ParaParser().parse(txt, self.style)[1]
+        self.assertEquals([f.text for f in F1], [u'Hello ',u'Bold',u' World'])
+        self.assertEquals(parseCacheInfo(),(1,1,1))
+        self.style.fontSize = 14
+        F2 = ParaParser().parse(txt, self.style)[1]
+        self.assertEquals(F2[0].fontSize,14)
+        self.assertEquals(parseCacheInfo()[2],1)
+
+    def testParseCacheSeq(self):
+        "text with sequences can't be reused"
+        from reportlab.rl_config import _reset
+        from reportlab.platypus.paraparser import parseCacheInfo
+        from reportlab.lib.sequencer import setSequencer, Sequencer
+        _reset()
+        setSequencer(Sequencer())
+        txt = "Figure <seq id='f'/>"
+        self.assertEquals([ParaParser().parse(txt, self.style)[1][1].text for i in 0,1], ['1','2'])
+        self.assertEquals(parseCacheInfo()[2],0)
+
+    def testGreekUnicode(self):
+        fragList = ParaParser().parse(u"<greek>a</greek>&alpha;", self.style)[1]
+        self.assertEquals([f.text for f in fragList], [u'\u03b1',u'\u03b1'])
+
+class ParaTokenizeTestCase(unittest.TestCase):
+    "the compiled paragraph tokenizer should agree with the python one"
+
+    def testTokens(self):
+        from reportlab.platypus.paraparser import paraTokenize, _py_paraTokenize, PT_DATA, PT_START, PT_END, PT_ENTITY, PT_CHARREF, PT_BARE, PT_CDATA
+        self.assertEquals(_py_paraTokenize('<font size=12 color="red">a &amp; b &gt</font><br/>&#xA9;'),
+            [(PT_START,'font',{'size':'12','color':'red'}),(PT_DATA,'a '),(PT_ENTITY,'amp'),(PT_DATA,' b '),
+                (PT_BARE,'gt'),(PT_END,'font'),(PT_START,'br',{}),(PT_END,'br'),(PT_CHARREF,'xA9')])
+        self.assertEquals(_py_paraTokenize('&#X41<![CDATA[<x>]]>'),[(PT_BARE,'#x41'),(PT_CDATA,'<x>')])
+        import random
+        random.seed(0)
+        alpha = '<>/=&#;!-[]CDATA?"\' abx: \t'
+        samples = ['<img src=a/b.png />','<!-- c --><![CDATA[<x>]]>','</ b></b x>','<a b"x">','&#x;&#X1f;']
+        for i in xrange(2000):
+            samples.append(''.join([random.choice(alpha) for j in xrange(random.randint(0,25))]))
+        for t in samples:
+            for t in t, unicode(t):
+                self.assertEquals(paraTokenize(t),_py_paraTokenize(t),'paraTokenize(%r)' % t)
+
 def makeSuite():
-    return makeSuiteForClasses(ParaParserTestCase)
+    return makeSuiteForClasses(ParaParserTestCase,ParaTokenizeTestCase)
 
 #noruntests
 if __name__ == "__main__":
@@ -825,9 +825,65 @@ class TablesTestCase(unittest.TestCase):
         "Make a document full of tables"
         old_tables_test()
 
+class CountingParagraph(Paragraph):
+    wraps = 0
+    def wrap(self, availWidth, availHeight):
+        CountingParagraph.wraps += 1
+        return Paragraph.wrap(self, availWidth, availHeight)
+
+class TableSplitTestCase(unittest.TestCase):
+    "split parts of long tables shouldn't measure their cells again"
+
+    def build(self, n, repeatRows=1, longTableOptimize=0, span=0):
+        from reportlab.lib.utils import getStringIO
+        style = styleSheet['Normal']
+        data = [['#','text']]+[[str(i),CountingParagraph('row %d has some text which will wrap onto a second line' % i,style)] for i in xrange(n)]
+        cmds = [('GRID',(0,0),(-1,-1),0.5,colors.grey),
+                ('ROWBACKGROUNDS',(0,1),(-1,-1),[colors.white,colors.lightgrey])]
+        if span: cmds.append(('SPAN',(0,span),(0,span+3)))
+        t = Table(data,colWidths=[None,150],repeatRows=repeatRows,style=cmds)
+        t._longTableOptimize = longTableOptimize
+        f = getStringIO()
+        CountingParagraph.wraps = 0
+        SimpleDocTemplate(f,invariant=1).build([t])
+        return f.getvalue(), CountingParagraph.wraps/float(n)
+
+    def test0(self):
+        "splitting over N pages costs about one measurement pass"
+        for longTableOptimize in 0, 1:
+            for repeatRows in 0, 1:
+                pdf, wraps = self.build(600,repeatRows,longTableOptimize)
+                self.assert_(pdf.count('/Type /Page >>')>10)
+                self.assert_(wraps<2.5,'%s wraps per cell' % wraps)
+
+    def test1(self):
+        "the parts look the same however long the table is measured for"
+        for span in 3, 70:
+            self.assertEqual(self.build(150,span=span,longTableOptimize=0)[0],self.build(150,span=span,longTableOptimize=1)[0])
+
+class TableWidthCacheTestCase(unittest.TestCase):
+    "cell content widths are measured once per table"
+
+    def test0(self):
+        style = styleSheet['Normal']
+        inner = Table([['a','b'],[CountingParagraph('inner',style),'c']])
+        t = Table([[CountingParagraph('cell %d with some words' % i,style),inner,str(i)] for i in xrange(5)],
+                colWidths=[None,'*',None])
+        w0 = t.minWidth()
+        self.assertEqual(t.widthCacheInfo(),(15,0))
+        self.assertEqual(t.minWidth(),w0)
+        self.assertEqual(t.widthCacheInfo(),(15,15))
+        t.setStyle([('FONTSIZE',(2,0),(2,-1),20)])
+        self.assert_(t.minWidth()>w0)
+        self.assertEqual(t.widthCacheInfo(),(30,15))
+        W = t.wrap(400,800)
+        self.assertEqual(t.wrap(400,800),W)
+        self.assertEqual(t.wrap(400,500),W)
+        self.assertEqual(t.widthCacheInfo()[0],30)
+        self.assertEqual(inner.widthCacheInfo()[0],4)
 
 def makeSuite():
-    return makeSuiteForClasses(TablesTestCase)
+    return makeSuiteForClasses(TablesTestCase,TableSplitTestCase,TableWidthCacheTestCase)
 
 
 #noruntests
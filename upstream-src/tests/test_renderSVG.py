@@ -174,6 +174,40 @@ class RenderSvgSimpleTestCase(unittest.TestCase):
 
         renderSVG.drawToFile(drawing, outputfile("test_renderSVG_simple_test3.svg"))
 
+    def test4(self):
+        "Test the streamed output is well formed and handles groups, escapes and unicode."
+
+        d = Drawing(200, 100)
+        d.add(String(10, 10, u'caf\xe9 <&> "q"', hrefURL='http://x?a=1&b=2'))
+        g = Group(String(50, 50, "inner"))
+        g.translate(5, 5)
+        d.add(g)
+        d.add(Group())
+        path = outputfile("test_renderSVG_simple_test4.svg")
+        renderSVG.drawToFile(d, path)
+        data = open(path).read()
+        self.assertEqual(data, renderSVG.drawToString(d))
+
+        c = renderSVG.SVGCanvas((d.width, d.height))
+        renderSVG.draw(d, c)
+        s = renderSVG.getStringIO()
+        c.save(s)
+        self.assertEqual(s.getvalue(), data)
+
+        if not HAVE_XML_PARSER:
+            warnIgnoredRestofTest()
+            return
+
+        svg = load(path)
+        dg = svg.getElementsByTagName('g')[1]           # diagram group
+        text = dg.getElementsByTagName('text')
+        self.assertEqual(text[0].childNodes[0].nodeValue, u'caf\xe9 <&> "q"')
+        self.assertEqual(dg.getElementsByTagName('a')[0].getAttribute('xlink:href'), 'http://x?a=1&b=2')
+        groups = dg.getElementsByTagName('g')
+        self.assertEqual(len(groups), 2)
+        self.assert_('matrix(1.000000, 0.000000, 0.000000, 1.000000, 5.000000, 5.000000)' in groups[0].getAttribute('transform'))
+        self.assertEqual(text[1].parentNode, groups[0])
+
 class RenderSvgAxesTestCase(unittest.TestCase):
     "Testing renderSVG module on Axes widgets."
 
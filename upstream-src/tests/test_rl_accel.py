@@ -141,6 +141,61 @@ class RlAccelTestCase(unittest.TestCase):
             setattr(a,name,old)
             setattr(b,name,old)
 
+    def test_kpBreaks(self):
+        from reportlab.lib.textsplit import _py_Box, _py_Glue, _py_Penalty, _py_kpBreaks, INFINITY_PENALTY
+        from _rl_accel import Box, Glue, Penalty, kpBreaks
+        import random
+        R = random.Random(1)
+        for i in xrange(500):
+            #a mix of boxes too wide for a line, equal spaces giving ties and flagged penalties
+            spec = []
+            for j in xrange(R.randint(1,40)):
+                spec.append((0,R.choice([5,10,10,20,20,40,80,200])))
+                c = R.random()
+                if c<0.7: spec.append((1,R.choice([0,5,5]),R.choice([0,3,3]),R.choice([0,1,1])))
+                elif c<0.85: spec.append((2,R.choice([0,5]),R.choice([50,100]),R.randint(0,1)))
+            spec.extend([(2,0,INFINITY_PENALTY,0),(1,0,1e5,0),(2,0,-INFINITY_PENALTY,0)])
+            lineWidths = [R.choice([20,30,40,60,100,150]) for j in xrange(R.randint(1,3))]
+            c = kpBreaks([(Box,Glue,Penalty)[s[0]](*s[1:]) for s in spec],lineWidths)
+            p = _py_kpBreaks([(_py_Box,_py_Glue,_py_Penalty)[s[0]](*s[1:]) for s in spec],lineWidths)
+            assert c==p, "kpBreaks(%r,%r)-->%r != _py_kpBreaks(...)-->%r" % (spec,lineWidths,c,p)
+
+    def testContentStream(self):
+        from reportlab.lib.utils import _py_ContentStream
+        from _rl_accel import ContentStream
+        def ops(c):
+            c.append('q')
+            c.op('cm',1,0,0,1,595.275574,0.25)
+            c.op('rg',(0.1,0.2,1))
+            c.op('re',[1,2,3.5,-4])
+            c.op('h')
+            c.append(u'BT')
+            c.extend(['(a) Tj','T*'])
+            c[-1] = '0 -14 Td'
+            c[0] = 'qq'
+            del c[1]
+            c[1:1] = ['x','y']
+            del c[-2:]
+            c.append('')
+            return c
+        p = ops(_py_ContentStream(['BT']))
+        c = ops(ContentStream(['BT']))
+        self.assertEqual(list(c),list(p))
+        self.assertEqual(c,p)
+        self.assertEqual(p,c)
+        self.assertEqual(len(c),len(p))
+        self.assertEqual(c[-3],p[-3])
+        self.assertEqual(c[2:5],p[2:5])
+        self.assertEqual(c.join('\n'),p.join('\n'))
+        self.assertEqual(c.join(' '),'qq x y 1 0 0 1 595.2756 .25 cm .1 .2 1 rg 1 2 3.5 -4 re h BT ')
+        self.failIf(ContentStream())
+        self.failUnless(ContentStream()==[])
+        self.failUnless('h' in c)
+        self.assertRaises(IndexError,c.__getitem__,len(c))
+        self.assertRaises(TypeError,c.append,1)
+        import copy
+        self.assertEqual(copy.copy(c),p)
+
 def makeSuite():
     # only run the tests if _rl_accel is present
     try:
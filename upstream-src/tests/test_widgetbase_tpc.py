@@ -9,7 +9,8 @@ setOutDir(__name__)
 import os, sys, copy
 from os.path import join, basename, splitext
 import unittest
-from reportlab.graphics.widgetbase import PropHolder, TypedPropertyCollection
+from reportlab.graphics.widgetbase import PropHolder, TypedPropertyCollection, Widget
+from reportlab.graphics.shapes import Group, Line
 from reportlab.lib.attrmap import AttrMap, AttrMapValue
 from reportlab.lib.validators import isNumber
 
@@ -126,8 +127,135 @@ class TPCTestCase(unittest.TestCase):
         assert b[0].b==-1, "Class __getattr__ should return -1"
 
 
+class BadWidget(Widget):
+    _attrMap = AttrMap(
+        x = AttrMapValue(isNumber),
+        )
+    def __init__(self):
+        self.x = 1
+
+    def draw(self):
+        L = Line(self.x,0,10,10)
+        L.strokeWidth = 'wide'
+        return Group(L)
+
+class GoodWidget(BadWidget):
+    def draw(self):
+        return Group(Line(self.x,0,10,10))
+
+class TrustedDrawTestCase(unittest.TestCase):
+    "Our own widgets build their shapes without checking each assignment"
+
+    def countChecks(self, func):
+        from reportlab.lib import attrmap
+        _validateAttr = attrmap._validateAttr
+        C = []
+        def countingValidateAttr(*args):
+            C.append(args[2])
+            return _validateAttr(*args)
+        attrmap._validateAttr = countingValidateAttr
+        try:
+            func()
+        finally:
+            attrmap._validateAttr = _validateAttr
+        return len(C)
+
+    def test0(self):
+        "other widgets' draws are checked"
+        from reportlab import rl_config
+        from reportlab.lib.attrmap import trustedCall
+        w = BadWidget()
+        self.assertRaises(AttributeError,setattr,w,'x',None)
+        self.assertRaises(AttributeError,w.draw)
+        self.assertRaises(AttributeError,w.provideNode)
+        self.assertRaises(AttributeError,w.getBounds)
+        #even when one of ours draws them
+        self.assertRaises(AttributeError,trustedCall,w.provideNode)
+        self.assert_(self.countChecks(GoodWidget().provideNode))
+        shapeChecking = rl_config.shapeChecking
+        rl_config.shapeChecking = 2
+        try:
+            self.assertRaises(AttributeError,w.provideNode)
+            GoodWidget().provideNode()
+        finally:
+            rl_config.shapeChecking = shapeChecking
+        self.assertRaises(AttributeError,setattr,Line(0,0,1,1),'strokeWidth','wide')
+
+    def test1(self):
+        "our widgets' draws aren't checked, but with shapeChecking=2 the renderers check what they draw"
+        from reportlab import rl_config
+        from reportlab.lib.attrmap import trustedCall
+        from reportlab.graphics.shapes import Drawing
+        from reportlab.graphics import renderPDF, renderSVG
+        from reportlab.graphics.charts.barcharts import VerticalBarChart
+        bc = VerticalBarChart()
+        bc.data = [(1,2,3),(3,1,2)]
+        d = Drawing(400,200)
+        d.add(bc)
+        self.assertEqual(self.countChecks(bc.provideNode),0)
+        self.assertEqual(self.countChecks(lambda: renderPDF.drawToString(d)),0)
+        L = Line(0,0,10,10)
+        trustedCall(setattr,L,'strokeWidth','wide')
+        bad = Drawing(100,100)
+        bad.add(L)
+        shapeChecking = rl_config.shapeChecking
+        rl_config.shapeChecking = 2
+        try:
+            self.assertEqual(self.countChecks(bc.provideNode),0)
+            for r in renderPDF, renderSVG:
+                self.assert_(self.countChecks(lambda: r.drawToString(d)))
+                self.assertRaises(AttributeError,r.drawToString,bad)
+        finally:
+            rl_config.shapeChecking = shapeChecking
+
+    def test2(self):
+        "trust belongs to the thread which asked for it"
+        import threading
+        from reportlab.lib.attrmap import trustedCall
+        E = []
+        def assign():
+            try:
+                Line(0,0,1,1).strokeWidth = 'wide'
+            except AttributeError:
+                E.append(1)
+        def trustedThread():
+            t = threading.Thread(target=assign)
+            t.start()
+            t.join()
+            assign()
+        trustedCall(trustedThread)
+        self.assertEqual(E,[1])
+
+class ShapeDefaultsTestCase(unittest.TestCase):
+    "constant shape defaults live on the classes, not on each instance"
+
+    def test0(self):
+        from reportlab.graphics.shapes import Rect, String, LineShape
+        L = Line(0,0,1,1)
+        self.assertEqual(sorted(L.__dict__.keys()),['strokeColor','x1','x2','y1','y2'])
+        P = L.getProperties()
+        self.assertEqual((P['strokeWidth'],P['strokeMiterLimit'],P['strokeDashArray']),(1,0,None))
+        L.strokeWidth = 3
+        self.assertEqual((L.getProperties()['strokeWidth'],LineShape.strokeWidth),(3,1))
+        C = Rect(0,0,1,1,strokeWidth=2).copy()
+        self.assertEqual((C.strokeWidth,C.fillOpacity),(2,None))
+        self.assertEqual(String(0,0,'x').getProperties()['textAnchor'],'start')
+
+    def test1(self):
+        "groups share their class's attrMap until a named node is added"
+        g = Group(Line(0,0,1,1))
+        self.assert_(g._attrMap is Group._attrMap)
+        self.assertEqual(g.getProperties()['transform'],(1,0,0,1,0,0))
+        g.add(Line(0,0,2,2),name='diagonal')
+        self.assert_('diagonal' in g._attrMap.keys())
+        self.assert_('diagonal' not in Group._attrMap.keys())
+        self.assert_(g.copy()._attrMap is not g._attrMap)
+        g = Group()
+        g.asDrawing(10,10)
+        self.assert_('width' not in Group._attrMap.keys())
+
 def makeSuite():
-    return makeSuiteForClasses(TPCTestCase)
+    return makeSuiteForClasses(TPCTestCase,TrustedDrawTestCase,ShapeDefaultsTestCase)
 
 
 #noruntests